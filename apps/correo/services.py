@@ -4,11 +4,16 @@ import imaplib
 import email
 from email.header import decode_header
 import logging
+import re
+from io import BytesIO
 from django.core.files.base import ContentFile
 from django.utils import timezone
 from .models import Correo, Adjunto
 from apps.empresas.models import Empresa
+from apps.documentos.models import Documento
+from apps.documentos.ocr.engines.xml import contiene_dte, iter_dtes
 from apps.documentos.services.upload_service import handle_uploaded_file
+from apps.documentos.tasks.extract import enqueue_extract_batch
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +70,7 @@ def process_email_batch_from_ids(empresa: Empresa, email_ids: list[bytes]):
     if not email_ids: return
     
     mail = None
+    documentos = []  # el OCR de todos los adjuntos se encola en lote al final
     try:
         if empresa.email_use_ssl:
             mail = imaplib.IMAP4_SSL(empresa.email_host, empresa.email_port)
@@ -88,7 +94,7 @@ def process_email_batch_from_ids(empresa: Empresa, email_ids: list[bytes]):
                 # Si el asunto coincide, procesamos el correo completo
                 if any(keyword in subject for keyword in ALLOWED_SUBJECTS):
                     logger.info(f"  > Asunto '{subject}' coincide. Procesando...")
-                    process_single_email(mail, email_id, empresa)
+                    documentos.extend(process_single_email(mail, email_id, empresa))
                 
                 # Siempre marcamos como leído
                 mail.store(email_id, '+FLAGS', '\\Seen')
@@ -99,17 +105,24 @@ def process_email_batch_from_ids(empresa: Empresa, email_ids: list[bytes]):
         empresa.email_last_check = timezone.now()
         empresa.save(update_fields=["email_last_check"])
     finally:
+        enqueue_extract_batch(documentos)
         if mail:
             if mail.state == 'SELECTED': mail.close()
             mail.logout()
 
-def process_single_email(mail_server, email_id, empresa: Empresa):
-    # (Esta función no necesita cambios, se mantiene igual que en la respuesta anterior)
-    # ...
+def process_single_email(mail_server, email_id, empresa: Empresa) -> list:
+    """
+    Crea el Correo, sus Adjuntos y los Documentos de los DTE adjuntos.
+    Si el correo trae el XML del DTE, el Documento sale del XML y el PDF queda
+    como su copia visual. Los PDFs sin XML pasan por OCR, salvo los que son
+    la representación impresa de un DTE de un sobre XML del mismo correo.
+    No encola la extracción: devuelve los documentos creados para despacharlos en lote.
+    """
+    documentos = []
     status, msg_data = mail_server.fetch(email_id, "(RFC822)")
     if status != "OK":
         logger.warning(f"No se pudo obtener el correo con ID {email_id.decode()}.")
-        return
+        return documentos
 
     for response_part in msg_data:
         if isinstance(response_part, tuple):
@@ -118,7 +131,7 @@ def process_single_email(mail_server, email_id, empresa: Empresa):
             msg_uid = email_id.decode()
             if Correo.objects.filter(empresa=empresa, msg_uid=msg_uid).exists():
                 logger.info(f"Correo {msg_uid} ya fue procesado anteriormente. Omitiendo.")
-                return
+                return documentos
 
             correo_obj = Correo.objects.create(
                 empresa=empresa,
@@ -129,6 +142,7 @@ def process_single_email(mail_server, email_id, empresa: Empresa):
             )
             logger.info(f"Procesando correo de '{correo_obj.remitente}' con asunto '{correo_obj.asunto}'")
 
+            adjuntos_pdf, adjuntos_xml = [], []
             for part in msg.walk():
                 if part.get_content_maintype() == 'multipart' or part.get('Content-Disposition') is None:
                     continue
@@ -136,36 +150,112 @@ def process_single_email(mail_server, email_id, empresa: Empresa):
                 filename = part.get_filename()
                 if filename:
                     logger.info(f"  > Adjunto encontrado: {filename}")
-                    
-                    # =================================================================
-                    # INICIO: MODIFICACIÓN PARA LA PRESENTACIÓN
-                    # Se ha eliminado '.xml' de la condición para que solo 
-                    # los archivos PDF sean procesados.
-                    # =================================================================
-                    if filename.lower().endswith('.pdf'):
-                    # =================================================================
-                    # FIN: MODIFICACIÓN
-                    # =================================================================
-                        logger.info(f"    - Es un archivo de factura válido. Procesando...")
-                        file_data = part.get_payload(decode=True)
-                        
-                        adjunto = Adjunto.objects.create(
-                            correo=correo_obj,
-                            nombre_archivo=filename,
-                            content_type=part.get_content_type()
-                        )
-                        adjunto.archivo.save(filename, ContentFile(file_data), save=True)
-
-                        try:
-                            documento = handle_uploaded_file(adjunto.archivo, empresa, origen="email")
-                            if documento:
-                                adjunto.documento_procesado = documento
-                                adjunto.save(update_fields=["documento_procesado"])
-                                logger.info(f"    - ¡ÉXITO! Documento {documento.id} creado desde {filename}.")
-                            else:
-                                logger.warning(f"    - ADVERTENCIA: handle_uploaded_file no devolvió un documento para {filename}.")
-                        except Exception as e:
-                            logger.error(f"    - ERROR al crear Documento desde adjunto {filename}: {e}", exc_info=True)
+                    if not filename.lower().endswith(('.pdf', '.xml')):
+                        logger.info(f"    - Omitiendo adjunto (no es PDF ni XML).")
+                        continue
+
+                    adjunto = Adjunto.objects.create(
+                        correo=correo_obj,
+                        nombre_archivo=filename,
+                        content_type=part.get_content_type()
+                    )
+                    file_data = part.get_payload(decode=True)
+                    adjunto.archivo.save(filename, ContentFile(file_data), save=True)
+                    if filename.lower().endswith('.xml'):
+                        adjuntos_xml.append((adjunto, contiene_dte(BytesIO(file_data))))
                     else:
-                        # Se ha modificado el mensaje para reflejar que solo se omiten los adjuntos que no son PDF.
-                        logger.info(f"    - Omitiendo adjunto (no es PDF).")
\ No newline at end of file
+                        adjuntos_pdf.append(adjunto)
+
+            # Camino rápido: si el correo trae el XML del DTE, el documento se crea desde
+            # el XML (parser lxml, milisegundos) y el PDF queda como copia visual, sin OCR.
+            xml_docs = {}
+            for adjunto, es_dte in adjuntos_xml:
+                if not es_dte:
+                    logger.info(f"    - {adjunto.nombre_archivo} no es un DTE (acuse/respuesta). Omitiendo.")
+                    continue
+                documento = _crear_documento(adjunto, empresa)
+                if documento:
+                    documentos.append(documento)
+                    xml_docs[adjunto.nombre_archivo] = documento
+
+            pares = emparejar_adjuntos(list(xml_docs), [a.nombre_archivo for a in adjuntos_pdf]) if xml_docs else {}
+            folios_sobres = None
+            for adjunto in adjuntos_pdf:
+                xml_name = pares.get(adjunto.nombre_archivo)
+                if xml_name:
+                    Documento.objects.filter(pk=xml_docs[xml_name].pk).update(copia_visual=adjunto.archivo.name)
+                    logger.info(f"    - {adjunto.nombre_archivo} queda como copia visual del Documento {xml_docs[xml_name].id} (sin OCR).")
+                    continue
+                if xml_docs:
+                    if folios_sobres is None:
+                        folios_sobres = _folios_de_sobres(xml_docs)
+                    if _cubierto_por_sobre(adjunto.nombre_archivo, folios_sobres):
+                        # El DTE ya sale del sobre (uno más por DTE al extraerlo)
+                        logger.info(f"    - {adjunto.nombre_archivo} corresponde a un DTE del sobre XML; no se procesa.")
+                        continue
+                # Sin XML asociado: el PDF pasa por el OCR como siempre
+                documento = _crear_documento(adjunto, empresa)
+                if documento:
+                    documentos.append(documento)
+    return documentos
+
+def _crear_documento(adjunto: Adjunto, empresa: Empresa):
+    """Crea el Documento de un adjunto (sin encolar la extracción) y los vincula."""
+    try:
+        documento = handle_uploaded_file(adjunto.archivo, empresa, origen="email", encolar=False)
+        if documento:
+            adjunto.documento_procesado = documento
+            adjunto.save(update_fields=["documento_procesado"])
+            logger.info(f"    - ¡ÉXITO! Documento {documento.id} creado desde {adjunto.nombre_archivo}.")
+        else:
+            logger.warning(f"    - ADVERTENCIA: handle_uploaded_file no devolvió un documento para {adjunto.nombre_archivo}.")
+        return documento
+    except Exception as e:
+        logger.error(f"    - ERROR al crear Documento desde adjunto {adjunto.nombre_archivo}: {e}", exc_info=True)
+        return None
+
+def _folios_de_sobres(xml_docs: dict) -> set[str]:
+    """
+    Folios (sin ceros a la izquierda) de los DTE de los sobres XML del correo:
+    solo de los archivos con más de un DTE, los que no se emparejan 1 a 1 con un PDF.
+    """
+    folios = set()
+    for documento in xml_docs.values():
+        try:
+            with documento.archivo.open("rb") as fh:
+                del_archivo = {d["folio"].lstrip("0") for d in iter_dtes(fh) if d.get("folio")}
+        except Exception as e:
+            logger.warning(f"    - No se pudieron leer los DTE de {documento.archivo.name}: {e}")
+            continue
+        if len(del_archivo) > 1:
+            folios |= del_archivo
+    return folios
+
+def _cubierto_por_sobre(nombre_pdf: str, folios: set[str]) -> bool:
+    """
+    True si el nombre del PDF trae el folio de un DTE de un sobre del correo
+    (p. ej. 'F1234T33.pdf' o 'factura_1234.pdf'). Ante la duda el PDF va a OCR:
+    omitirlo sin estar cubierto perdería la factura.
+    """
+    base = nombre_pdf.rsplit(".", 1)[0]
+    return any(n.lstrip("0") in folios for n in re.findall(r"\d+", base))
+
+def emparejar_adjuntos(xmls: list[str], pdfs: list[str]) -> dict[str, str]:
+    """
+    Asocia cada PDF con el XML del mismo DTE: primero por nombre de archivo
+    (mismo nombre sin extensión, sin distinguir mayúsculas) y, si queda un
+    solo XML y un solo PDF sin pareja, entre ellos. Devuelve {pdf: xml}.
+    """
+    def base(nombre):
+        return nombre.rsplit(".", 1)[0].strip().lower()
+
+    por_base = {base(x): x for x in xmls}
+    pares = {}
+    for pdf in pdfs:
+        xml = por_base.pop(base(pdf), None)
+        if xml:
+            pares[pdf] = xml
+    libres_pdf = [p for p in pdfs if p not in pares]
+    if len(por_base) == 1 and len(libres_pdf) == 1:
+        pares[libres_pdf[0]] = next(iter(por_base.values()))
+    return pares
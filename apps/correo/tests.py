@@ -1,3 +1,74 @@
-from django.test import TestCase
+from email.message import EmailMessage
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from apps.correo.services import emparejar_adjuntos, process_single_email
+from apps.documentos.models import Documento
+from apps.documentos.tests.helpers import MediaTemporal, crear_empresa, dte_suelto, sobre
+
+PDF = b"%PDF-1.4\n%%EOF\n"
+
+class EmparejarAdjuntosTests(SimpleTestCase):
+    def test_por_nombre_sin_distinguir_mayusculas(self):
+        pares = emparejar_adjuntos(["F101T33.xml", "F102T33.XML"], ["f102t33.pdf", "F101T33.PDF"])
+        self.assertEqual(pares, {"f102t33.pdf": "F102T33.XML", "F101T33.PDF": "F101T33.xml"})
+
+    def test_un_xml_y_un_pdf_sin_pareja(self):
+        self.assertEqual(emparejar_adjuntos(["dte.xml"], ["factura.pdf"]), {"factura.pdf": "dte.xml"})
+
+    def test_sin_pareja_posible(self):
+        self.assertEqual(emparejar_adjuntos(["sobre.xml"], ["a.pdf", "b.pdf"]), {})
+        # Tras emparejar por nombre queda uno de cada lado
+        self.assertEqual(emparejar_adjuntos(["F1.xml", "otro.xml"], ["F1.pdf", "b.pdf"]), {"F1.pdf": "F1.xml", "b.pdf": "otro.xml"})
+        self.assertEqual(emparejar_adjuntos([], ["a.pdf"]), {})
+
+class _ServidorFalso:
+    def __init__(self, mensaje: EmailMessage):
+        self.mensaje = mensaje
+
+    def fetch(self, email_id, _partes):
+        return "OK", [(b"1 (RFC822)", self.mensaje.as_bytes())]
+
+@mock.patch("apps.documentos.signals.check_and_kickoff_sii")
+@mock.patch("apps.documentos.services.upload_service.probe_pdf_kind", return_value="digital")
+class ProcessSingleEmailTests(MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa()
+
+    def _procesar(self, adjuntos: dict[str, bytes]) -> list[Documento]:
+        msg = EmailMessage()
+        msg["Subject"] = "Factura electrónica"
+        msg["From"] = "facturacion@proveedor.cl"
+        msg.set_content("Adjuntamos sus documentos.")
+        for nombre, contenido in adjuntos.items():
+            subtipo = "xml" if nombre.lower().endswith(".xml") else "pdf"
+            msg.add_attachment(contenido, maintype="application", subtype=subtipo, filename=nombre)
+        return process_single_email(_ServidorFalso(msg), b"1", self.empresa)
+
+    def test_pdf_sin_xml_va_a_ocr_aunque_el_correo_traiga_xml(self, _sonda, _kickoff):
+        docs = self._procesar({"F101T33.xml": dte_suelto(101), "F101T33.pdf": PDF, "F555T33.pdf": PDF + b" "})
+
+        self.assertEqual(sorted(d.extension for d in docs), ["pdf", "xml"])
+        xml = next(d for d in docs if d.extension == "xml")
+        xml.refresh_from_db()
+        self.assertTrue(xml.copia_visual.name.endswith("F101T33.pdf"))
+        pdf = next(d for d in docs if d.extension == "pdf")
+        self.assertTrue(pdf.nombre_archivo_original.endswith("F555T33.pdf"))
+
+    def test_pdfs_de_un_sobre_no_se_procesan(self, _sonda, _kickoff):
+        docs = self._procesar({
+            "EnvioDTE.xml": sobre(101, 102),
+            "F101T33.pdf": PDF,
+            "factura_00102.pdf": PDF + b" ",
+            "F555T33.pdf": PDF + b"  ",
+        })
+
+        # El sobre (sus DTE se crean al extraerlo) y el PDF de un DTE que no viene en él
+        self.assertEqual(sorted(d.nombre_archivo_original.rsplit("/", 1)[-1] for d in docs),
+                         ["EnvioDTE.xml", "F555T33.pdf"])
+
+    def test_correo_sin_xml(self, _sonda, _kickoff):
+        docs = self._procesar({"a.pdf": PDF, "b.pdf": PDF + b" "})
+        self.assertEqual(len(docs), 2)
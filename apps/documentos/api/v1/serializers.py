@@ -33,6 +33,7 @@ class DocumentoSerializer(serializers.ModelSerializer):
             # —— fechas/archivos ——
             "fecha_emision",
             "archivo",
+            "copia_visual",
             "creado_en",
         ]
         read_only_fields = [
@@ -48,6 +49,7 @@ class DocumentoSerializer(serializers.ModelSerializer):
             # timestamps/archivo cargado por flujo de upload
             "creado_en",
             "archivo",
+            "copia_visual",
         ]
 
     # (Opcional) si quieres normalizar salida de fechas/None → "" para el front:
@@ -1,12 +1,15 @@
 # apps/documentos/api/v1/urls.py
 from rest_framework.routers import SimpleRouter
 from django.urls import path
-from .views import DocumentoViewSet, presign_upload
+from .views import CargaViewSet, DocumentoViewSet, presign_upload, presign_finalize
 
 router = SimpleRouter()
+# Antes que el de documentos: su ruta de detalle ({pk}/) también calzaría con "cargas/"
+router.register(r"cargas", CargaViewSet, basename="cargas")
 router.register(r"", DocumentoViewSet, basename="documentos")
 
 urlpatterns = [
     path("presign-upload/", presign_upload, name="presign_upload"),
+    path("presign-upload/<uuid:sesion_id>/finalizar/", presign_finalize, name="presign_finalize"),
 ]
 urlpatterns += router.urls
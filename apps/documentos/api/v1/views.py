@@ -10,13 +10,15 @@ from .filters import apply_document_filters
 from .pagination import DefaultPagination
 
 from ...selectors import documentos_de_empresas
-from ...services.upload_service import create_documents_from_files
-from ...services.storage_service import make_presigned_url
+from ...services.upload_service import create_documents_from_files, _empresa_del_usuario
+from ...services import chunked_upload_service as cargas
+from ...services.storage_service import make_presigned_url, finalize_presigned_upload
+from ... import uploadhandler
 from apps.empresas.models import EmpresaUsuario
 from apps.sii.services.sii_integration import validar_documento_con_sii, refrescar_estado_sii
 # ajusta si tu módulo difiere
 from apps.documentos.models import Documento
-from apps.sii.tasks import start_sii_validation_core, refresh_sii_estado_documento
+from apps.sii.tasks import refresh_sii_estado_documento
 
 class DocumentoViewSet(viewsets.ModelViewSet):
     """
@@ -38,39 +40,20 @@ class DocumentoViewSet(viewsets.ModelViewSet):
         qs = apply_document_filters(self.request, qs)
         return qs.order_by("-creado_en")
 
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        # Upload: hashear mientras llegan los bytes (antes de que DRF parsee el multipart)
+        if self.action == "create":
+            uploadhandler.instalar_en(request)
+        return drf_request
+
     def create(self, request, *args, **kwargs):
         """
-        Upload multipart: files[] o files. Encola OCR con Celery.
-        Además: deja SII en EN_PROCESO y dispara validación automática por cada doc creado.
+        Upload multipart: files[] o files. Carga masiva (un INSERT por lote) y
+        OCR encolado en un group; los documentos quedan en SII EN_PROCESO y la
+        validación la lanza la extracción cuando están los campos mínimos.
         """
         result = create_documents_from_files(request.user, request.FILES)
-
-        # robustez: detectar ids creados en diferentes formatos de respuesta
-        created_ids = []
-        for key in ("created_ids", "ids", "created"):
-            val = result.get(key)
-            if isinstance(val, list):
-                for x in val:
-                    if isinstance(x, int):
-                        created_ids.append(x)
-                    elif isinstance(x, dict) and "id" in x:
-                        created_ids.append(int(x["id"]))
-        created_ids = list(dict.fromkeys(created_ids))  # únicos manteniendo orden
-
-        if created_ids:
-            # marcar EN_PROCESO y disparar validación SII con escalados realistas
-            docs = Documento.objects.filter(id__in=created_ids)
-            for doc in docs:
-                if (doc.sii_estado or "") != "EN_PROCESO":
-                    doc.sii_estado = "EN_PROCESO"
-                    doc.validado_sii = False
-                    doc.save(update_fields=["sii_estado", "validado_sii"])
-                try:
-                    # corre en background si tienes worker; en dev eager=True igual funciona
-                    start_sii_validation_core.delay(doc.id)
-                except Exception:
-                    start_sii_validation_core.apply_async(args=[doc.id])
-
         status_code = status.HTTP_201_CREATED if result.get("created") else status.HTTP_200_OK
         return Response(result, status=status_code)
 
@@ -165,12 +148,109 @@ class DocumentoViewSet(viewsets.ModelViewSet):
         ok = bool(res.get("ok", True))
         return Response({"ok": ok, "result": res, "documento_id": doc.id}, status=200)
 
+class CargaViewSet(viewsets.ViewSet):
+    """
+    Subida reanudable por partes (ver services/chunked_upload_service.py):
+    /api/v1/documentos/cargas/                 -> POST {nombre, tamano, sha256}: abre la sesión
+    /api/v1/documentos/cargas/{id}/            -> PUT trozo (Content-Range), GET estado, DELETE cancela
+    /api/v1/documentos/cargas/{id}/finalizar/  -> POST: 202, un worker verifica el hash y crea el Documento
+    """
+    permission_classes = [IsAuthenticated, IsCompanyMember]
+    lookup_value_regex = "[0-9a-f-]{36}"
+
+    def _empresa_ids(self):
+        return EmpresaUsuario.objects.filter(usuario=self.request.user).values_list("empresa_id", flat=True)
+
+    def _responder(self, fn, *args):
+        try:
+            return Response(fn(*args))
+        except cargas.CargaError as e:
+            return Response({"detail": str(e), **e.extra}, status=e.status)
+
+    def create(self, request):
+        empresa = _empresa_del_usuario(request.user)
+        if not empresa:
+            return Response({"detail": "Debes crear primero una empresa o no tienes permisos en ninguna."}, status=400)
+        try:
+            tamano = int(request.data.get("tamano"))
+        except (TypeError, ValueError):
+            return Response({"detail": "tamano requerido (bytes)"}, status=400)
+        try:
+            data = cargas.iniciar_carga(
+                empresa, request.user, request.data.get("nombre"), tamano,
+                request.data.get("sha256"), request.data.get("origen") or "api",
+            )
+        except cargas.CargaError as e:
+            return Response({"detail": str(e), **e.extra}, status=e.status)
+        # Ya cargado: no se abre sesión y el cliente no sube nada
+        return Response(data, status=status.HTTP_200_OK if data["estado"] == "duplicado" else status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        sesion = cargas.SesionCarga.objects.filter(pk=pk, empresa_id__in=self._empresa_ids()).first()
+        if not sesion:
+            return Response({"detail": "Sesión de carga no encontrada."}, status=404)
+        return Response(cargas.estado_carga(sesion))
+
+    def update(self, request, pk=None):
+        # Content-Range: bytes <inicio>-<fin>/<total>; el cuerpo se lee como stream, sin request.data
+        rango = request.headers.get("Content-Range", "")
+        try:
+            unidad, _, resto = rango.partition(" ")
+            inicio, fin = (int(x) for x in resto.split("/")[0].split("-"))
+            total = int(resto.split("/")[1])
+            if unidad != "bytes":
+                raise ValueError(unidad)
+        except (ValueError, IndexError):
+            return Response({"detail": "Content-Range requerido: bytes <inicio>-<fin>/<total>"}, status=400)
+        longitud = request.META.get("CONTENT_LENGTH")
+        try:
+            if longitud and int(longitud) != fin - inicio + 1:
+                raise ValueError(longitud)
+        except ValueError:
+            return Response({"detail": "Content-Length no coincide con Content-Range."}, status=400)
+        if request.stream is None:
+            return Response({"detail": "Trozo vacío."}, status=400)
+        return self._responder(cargas.recibir_trozo, pk, self._empresa_ids(), inicio, fin, total, request.stream)
+
+    def destroy(self, request, pk=None):
+        return self._responder(cargas.cancelar_carga, pk, self._empresa_ids())
+
+    @action(detail=True, methods=["post"], url_path="finalizar")
+    def finalizar(self, request, pk=None):
+        try:
+            data = cargas.finalizar_carga(pk, self._empresa_ids())
+        except cargas.CargaError as e:
+            return Response({"detail": str(e), **e.extra}, status=e.status)
+        # El archivo se arma en un worker: el cliente consulta GET cargas/<id>/ hasta "finalizada"
+        return Response(data, status=status.HTTP_202_ACCEPTED if data["estado"] == "ensamblando" else status.HTTP_200_OK)
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def presign_upload(request):
+    """
+    URL de PUT firmada para subir directo al object storage; después el cliente
+    llama a finalize_url. Body: {filename, content_type, tamano, sha256}.
+    """
     filename = request.data.get("filename")
     content_type = request.data.get("content_type", "application/octet-stream")
     if not filename:
         return Response({"detail": "filename requerido"}, status=400)
-    data = make_presigned_url(request.user, filename, content_type)
+    try:
+        tamano = int(request.data.get("tamano"))
+    except (TypeError, ValueError):
+        return Response({"detail": "tamano requerido (bytes)"}, status=400)
+    try:
+        data = make_presigned_url(request.user, filename, content_type, tamano, request.data.get("sha256"))
+    except cargas.CargaError as e:
+        return Response({"detail": str(e), **e.extra}, status=e.status)
     return Response(data, status=200)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def presign_finalize(request, sesion_id):
+    """Verifica el objeto subido (tamaño y sha256) y crea el Documento; encola el OCR."""
+    empresa_ids = EmpresaUsuario.objects.filter(usuario=request.user).values_list("empresa_id", flat=True)
+    try:
+        return Response(finalize_presigned_upload(sesion_id, empresa_ids), status=200)
+    except cargas.CargaError as e:
+        return Response({"detail": str(e), **e.extra}, status=e.status)
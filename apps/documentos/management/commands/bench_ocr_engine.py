@@ -0,0 +1,177 @@
+import difflib
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from pdf2image import convert_from_path
+from PIL import Image
+
+from apps.documentos.ocr.config import settings
+from apps.documentos.ocr.engines import tesseract
+from apps.documentos.ocr.engines.image import ocr_from_image_path
+from apps.documentos.ocr.preprocess.image import PREPROCESS_MODES, preprocess
+
+def _expected_text(path: str) -> str | None:
+    """Transcripción de referencia: mismo nombre con extensión .txt, junto al fixture."""
+    ref = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(ref):
+        with open(ref, encoding="utf-8") as fh:
+            return fh.read()
+    return None
+
+def _load_images(paths, max_pages: int):
+    """Devuelve [(nombre, imagen en gris, texto esperado o None)]."""
+    images = []
+    for path in paths:
+        if not os.path.exists(path):
+            raise CommandError(f"No existe: {path}")
+        if os.path.isdir(path):
+            images.extend(_load_images(
+                sorted(os.path.join(path, f) for f in os.listdir(path)
+                       if f.lower().endswith((".pdf", ".png", ".jpg", ".jpeg"))),
+                max_pages,
+            ))
+            continue
+        expected = _expected_text(path)
+        if path.lower().endswith(".pdf"):
+            pages = convert_from_path(
+                path, dpi=settings.OCR_PDF_DPI, first_page=1, last_page=max_pages,
+                grayscale=True, poppler_path=settings.POPPLER_PATH,
+            )
+            # La referencia de un PDF es por documento: se compara solo contra la primera página
+            images.extend(
+                (f"{os.path.basename(path)}#{i}", img, expected if i == 1 else None)
+                for i, img in enumerate(pages, 1)
+            )
+        else:
+            gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                raise CommandError(f"No se pudo leer la imagen: {path}")
+            images.append((os.path.basename(path), Image.fromarray(gray), expected))
+    return images
+
+def _image_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _image_files(sorted(os.path.join(path, f) for f in os.listdir(path)))
+        elif path.lower().endswith((".png", ".jpg", ".jpeg")):
+            yield path
+
+def _similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(a.split()), " ".join(b.split()), autojunk=False).ratio()
+
+def _percentile(values, p: float) -> float:
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+class Command(BaseCommand):
+    help = (
+        "Compara motores de Tesseract (pytesseract vs tesserocr persistente) y modos de "
+        "preprocesamiento sobre un corpus de imágenes/PDFs. Si junto a un fixture hay un "
+        ".txt con el mismo nombre, informa además la similitud con esa transcripción."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Imágenes, PDFs o directorios de fixtures.")
+        parser.add_argument("--repeat", type=int, default=3, help="Pasadas sobre todas las páginas.")
+        parser.add_argument("--max-pages", type=int, default=5, help="Páginas por PDF.")
+        parser.add_argument("--lang", default="spa")
+        parser.add_argument("--psm", type=int, default=3)
+        parser.add_argument(
+            "--preprocess", action="append", choices=PREPROCESS_MODES,
+            help=f"Modo(s) de preprocesamiento a medir (por defecto: {settings.OCR_PREPROCESS}).",
+        )
+        parser.add_argument(
+            "--roi", action="store_true",
+            help="Compara además, en las imágenes, el OCR por zonas del DTE contra la página completa.",
+        )
+        parser.add_argument(
+            "--engine", action="append", choices=[tesseract.BACKEND_PYTESSERACT, tesseract.BACKEND_TESSEROCR],
+            help="Motor(es) a medir (por defecto: todos los disponibles).",
+        )
+
+    def handle(self, *args, **opts):
+        images = _load_images(opts["paths"], opts["max_pages"])
+        if not images:
+            raise CommandError("No hay páginas que procesar.")
+
+        engines = opts["engine"] or [tesseract.BACKEND_PYTESSERACT, tesseract.BACKEND_TESSEROCR]
+        if tesseract.tesserocr is None and tesseract.BACKEND_TESSEROCR in engines:
+            engines = [e for e in engines if e != tesseract.BACKEND_TESSEROCR]
+            self.stdout.write(self.style.WARNING("tesserocr no está instalado: se omite."))
+        if not engines:
+            raise CommandError("No hay motores disponibles.")
+        modes = opts["preprocess"] or [settings.OCR_PREPROCESS]
+
+        self.stdout.write(f"{len(images)} páginas x {opts['repeat']} pasadas, lang={opts['lang']} psm={opts['psm']}")
+        textos = {}
+        for mode in modes:
+            # El preprocesamiento no depende del motor: se mide una vez por modo
+            pre_ms, prepared, pixeles = [], [], 0
+            for name, img, expected in images:
+                t0 = time.perf_counter()
+                out = preprocess(img, mode)
+                pre_ms.append((time.perf_counter() - t0) * 1000)
+                pixeles += out.size if isinstance(out, np.ndarray) else out.width * out.height
+                prepared.append((name, out, expected))
+
+            for engine in engines:
+                tesseract.close_all()
+                tiempos, primera = [], None
+                for _ in range(opts["repeat"]):
+                    for name, img, _expected in prepared:
+                        t0 = time.perf_counter()
+                        text = tesseract.image_to_string(img, lang=opts["lang"], psm=opts["psm"], engine=engine)
+                        ms = (time.perf_counter() - t0) * 1000
+                        if primera is None:
+                            primera = ms  # incluye la carga del modelo de idioma
+                        else:
+                            tiempos.append(ms)
+                        textos.setdefault((engine, mode), {})[name] = text
+                tiempos = tiempos or [primera]
+
+                refs = [(textos[(engine, mode)][name], exp) for name, _img, exp in prepared if exp]
+                precision = f"  similitud={statistics.mean(_similarity(t, e) for t, e in refs):.3f}" if refs else ""
+                self.stdout.write(
+                    f"{engine:12s} {mode:9s} pre={statistics.mean(pre_ms):7.1f} ms  "
+                    f"primera={primera:8.1f} ms  media={statistics.mean(tiempos):8.1f} ms  "
+                    f"p50={_percentile(tiempos, 50):8.1f} ms  p95={_percentile(tiempos, 95):8.1f} ms  "
+                    f"Mpx={pixeles / 1e6:6.1f}{precision}"
+                )
+        tesseract.close_all()
+
+        if len(engines) == 2:
+            for mode in modes:
+                a, b = (textos[(e, mode)] for e in engines)
+                distintos = [name for name in a if a[name].strip() != b[name].strip()]
+                if distintos:
+                    self.stdout.write(self.style.WARNING(f"[{mode}] Texto distinto entre motores en: {', '.join(distintos)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"[{mode}] Ambos motores producen el mismo texto."))
+
+        if opts["roi"]:
+            self._bench_roi(list(_image_files(opts["paths"])), opts["repeat"])
+
+    def _bench_roi(self, files, repeat: int):
+        if not files:
+            self.stdout.write(self.style.WARNING("--roi: no hay imágenes (PNG/JPG) en el corpus."))
+            return
+        for path in files:
+            expected = _expected_text(path)
+            fila = []
+            for roi in (False, True):
+                meta, tiempos = {}, []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    text = ocr_from_image_path(path, meta=meta, roi=roi)
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                etiqueta = "zonas" if roi else "completa"
+                if roi and not (meta.get("roi") or {}).get("regiones"):
+                    etiqueta = "zonas(sin layout)"
+                extra = f" sim={_similarity(text, expected):.3f}" if expected else ""
+                fila.append(f"{etiqueta}={statistics.median(tiempos):7.1f} ms{extra}")
+            self.stdout.write(f"{os.path.basename(path):30s} " + "  ".join(fila))
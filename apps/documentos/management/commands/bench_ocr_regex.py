@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documentos.ocr.utils import dates, patterns
+from apps.documentos.ocr.utils.text_norm import preprocess_text
+from .bench_parse_text import _text_files
+
+def _cpu_us(pattern, textos, repeat: int) -> list[float]:
+    """CPU (µs) de recorrer cada texto completo con `pattern`, una muestra por documento y pasada."""
+    muestras = []
+    for _ in range(repeat):
+        for text in textos:
+            t0 = time.process_time()
+            for _m in pattern.finditer(text):
+                pass
+            muestras.append((time.process_time() - t0) * 1e6)
+    return muestras
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark de las regex del OCR: CPU por documento de cada patrón del "
+        "registro (utils/patterns.py) recorriendo el texto completo, y de la alternancia "
+        "ANCHORS frente a las anclas por separado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Archivos .txt o directorios con ellos.")
+        parser.add_argument("--repeat", type=int, default=10, help="Pasadas sobre todo el corpus.")
+
+    def handle(self, *args, **opts):
+        textos = []
+        for path in _text_files(opts["paths"]):
+            with open(path, encoding="utf-8") as fh:
+                textos.append(preprocess_text(fh.read()))
+        if not textos:
+            raise CommandError("No hay textos que procesar.")
+
+        registro = patterns.registry()
+        registro.update({"dates.RE_FECHA_TXT": dates.RE_FECHA_TXT, "dates.RE_FECHA_NUM": dates.RE_FECHA_NUM})
+        medias = {
+            name: statistics.mean(_cpu_us(p, textos, opts["repeat"]))
+            for name, p in registro.items()
+        }
+
+        self.stdout.write(f"{len(textos)} textos x {opts['repeat']} pasadas (CPU media por documento):")
+        for name, us in sorted(medias.items(), key=lambda kv: kv[1], reverse=True):
+            self.stdout.write(f"  {name:22s} {us:9.1f} µs")
+        self.stdout.write(f"  {'(suma)':22s} {sum(medias.values()):9.1f} µs")
+
+        separadas = sum(medias[f"ANCHOR_{name.upper()}"] for name in patterns.ANCHOR_PATTERNS)
+        self.stdout.write(
+            f"Anclas: ANCHORS (un recorrido)={medias['ANCHORS']:.1f} µs  "
+            f"por separado={separadas:.1f} µs"
+        )
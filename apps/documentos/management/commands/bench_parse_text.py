@@ -0,0 +1,90 @@
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documentos.ocr.parsing import parse_text
+
+def _text_files(paths):
+    for path in paths:
+        if not os.path.exists(path):
+            raise CommandError(f"No existe: {path}")
+        if os.path.isdir(path):
+            yield from _text_files(sorted(os.path.join(path, f) for f in os.listdir(path)))
+        elif path.lower().endswith(".txt"):
+            yield path
+
+def _snapshot(result) -> dict:
+    """Campos extraídos (sin raw_text, meta ni TED) en forma comparable con JSON."""
+    data = result.to_dict()
+    for campo in ("raw_text", "meta", "ted"):
+        data.pop(campo, None)
+    if data.get("fecha_emision") is not None:
+        data["fecha_emision"] = str(data["fecha_emision"])
+    return data
+
+class Command(BaseCommand):
+    help = (
+        "Mide la CPU de parse_text sobre un corpus de textos (.txt) ya extraídos y, como "
+        "regresión, compara los campos contra el <nombre>.parse.json guardado junto a cada texto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Archivos .txt o directorios con ellos.")
+        parser.add_argument("--repeat", type=int, default=20, help="Pasadas sobre todo el corpus.")
+        parser.add_argument(
+            "--save", action="store_true",
+            help="Guarda el resultado actual como <nombre>.parse.json (referencia de regresión).",
+        )
+
+    def handle(self, *args, **opts):
+        files = list(_text_files(opts["paths"]))
+        if not files:
+            raise CommandError("No hay textos que procesar.")
+        textos = []
+        for path in files:
+            with open(path, encoding="utf-8") as fh:
+                textos.append((path, fh.read()))
+
+        if not os.environ.get("PYTHONHASHSEED"):
+            # El fallback del RUT emisor elige desde un set: su orden depende del hash de str
+            self.stdout.write(self.style.WARNING(
+                "PYTHONHASHSEED no está fijo: el RUT emisor de fallback puede variar entre ejecuciones."
+            ))
+        distintos, sin_referencia = [], 0
+        for path, text in textos:
+            actual = _snapshot(parse_text(text))
+            ref_path = os.path.splitext(path)[0] + ".parse.json"
+            if opts["save"]:
+                with open(ref_path, "w", encoding="utf-8") as fh:
+                    json.dump(actual, fh, ensure_ascii=False, indent=2, sort_keys=True)
+            elif os.path.exists(ref_path):
+                with open(ref_path, encoding="utf-8") as fh:
+                    if json.load(fh) != actual:
+                        distintos.append(os.path.basename(path))
+            else:
+                sin_referencia += 1
+
+        # process_time: CPU del proceso, no afectada por otras cargas de la máquina
+        por_doc = []
+        for _ in range(opts["repeat"]):
+            for _path, text in textos:
+                t0 = time.process_time()
+                parse_text(text)
+                por_doc.append((time.process_time() - t0) * 1000)
+
+        caracteres = sum(len(t) for _p, t in textos)
+        self.stdout.write(
+            f"{len(textos)} textos ({caracteres / len(textos):.0f} caracteres promedio) x {opts['repeat']} pasadas: "
+            f"CPU media={statistics.mean(por_doc):.3f} ms/doc  mediana={statistics.median(por_doc):.3f} ms/doc"
+        )
+        if opts["save"]:
+            self.stdout.write(self.style.SUCCESS(f"Referencias guardadas para {len(textos)} textos."))
+            return
+        if sin_referencia:
+            self.stdout.write(self.style.WARNING(f"{sin_referencia} textos sin .parse.json (use --save)."))
+        if distintos:
+            raise CommandError(f"Resultado distinto a la referencia en: {', '.join(distintos)}")
+        self.stdout.write(self.style.SUCCESS("Sin diferencias contra las referencias."))
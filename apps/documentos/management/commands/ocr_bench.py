@@ -0,0 +1,216 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documentos.ocr import cache, parse_document
+from apps.documentos.ocr.config import PARSER_VERSION
+from apps.documentos.ocr.debug.trace import Trace
+from apps.documentos.ocr.engines.xml import extract_data_from_xml
+from apps.documentos.ocr.utils.memory import MemoryPeak, current_rss_kb
+from apps.documentos.ocr.utils.rut import clean_rut
+from .bench_ocr_engine import _percentile
+
+EXTENSIONES = (".pdf", ".png", ".jpg", ".jpeg", ".xml")
+CAMPOS_MONTO = ("monto_neto", "monto_exento", "iva", "total", "iva_tasa")
+# Etapas de parse_text que se informan juntas como "parse"
+ETAPAS_PARSE = ("normalizacion", "tipo_documento", "folio", "fecha", "proveedor", "montos")
+ETAPAS = ("sonda_pdf", "pdfminer", "rasterizar", "preproceso", "layout", "ted", "tesseract", "xml",
+          "parse", "reconciliacion", "total")
+
+def _fixtures(paths):
+    """Fixtures con su archivo de valores esperados (<nombre>.esperado.json)."""
+    for path in paths:
+        if not os.path.exists(path):
+            raise CommandError(f"No existe: {path}")
+        if os.path.isdir(path):
+            yield from _fixtures(sorted(os.path.join(path, f) for f in os.listdir(path)))
+        elif path.lower().endswith(EXTENSIONES):
+            esperado = os.path.splitext(path)[0] + ".esperado.json"
+            yield path, esperado if os.path.exists(esperado) else None
+
+def _normalizar(campo: str, valor):
+    if valor in (None, ""):
+        return None
+    if campo in CAMPOS_MONTO:
+        try:
+            return Decimal(str(valor)).normalize()
+        except InvalidOperation:
+            return str(valor)
+    if campo == "rut_proveedor":
+        return clean_rut(str(valor))
+    if campo == "fecha_emision":
+        return valor.isoformat() if isinstance(valor, date) else str(valor)[:10]
+    return str(valor).strip()
+
+def _procesar(path: str, esperado_path: str | None) -> dict:
+    """Extrae un fixture con la traza activa y lo compara con lo esperado. Corre en el worker."""
+    memoria = MemoryPeak()
+    trace = Trace(enabled=True)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        if path.lower().endswith(".xml"):
+            with trace.stage("xml"):
+                datos = extract_data_from_xml(path) or {}
+            meta = {}
+        else:
+            result, _raw = parse_document(path, trace=trace, usar_cache=False)
+            datos, meta = result.to_dict(), result.meta
+    except Exception as e:  # un fixture roto no detiene el benchmark
+        datos, meta, error = {}, {}, f"{type(e).__name__}: {e}"
+    total_ms = (time.perf_counter() - t0) * 1000
+    memoria.sample()
+
+    tiempos = dict(trace.tiempos_ms)
+    tiempos["parse"] = round(sum(tiempos.pop(k, 0.0) for k in ETAPAS_PARSE), 2)
+    tiempos["total"] = round(total_ms, 2)
+    rss_pico = max(filter(None, [memoria.rss_pico_kb, (meta.get("memoria") or {}).get("rss_pico_kb")]), default=None)
+
+    campos = {}
+    if esperado_path:
+        with open(esperado_path, encoding="utf-8") as fh:
+            esperado = json.load(fh)
+        for campo, valor in esperado.items():
+            obtenido = datos.get(campo)
+            campos[campo] = {
+                "ok": _normalizar(campo, valor) == _normalizar(campo, obtenido),
+                "esperado": valor,
+                "obtenido": None if obtenido is None else str(obtenido),
+            }
+    return {
+        "archivo": os.path.basename(path),
+        "fuente": datos.get("fuente_texto"),
+        "nivel": meta.get("ocr_nivel") or ("xml" if path.lower().endswith(".xml") else None),
+        "ted": bool(datos.get("ted")),
+        "tiempos_ms": {k: v for k, v in tiempos.items() if v},
+        "rss_pico_kb": rss_pico,
+        "campos": campos,
+        "error": error,
+    }
+
+def _init_worker():
+    import django
+    django.setup()
+
+def _resumen(docs: list[dict]) -> dict:
+    etapas = {}
+    for etapa in ETAPAS:
+        valores = [d["tiempos_ms"][etapa] for d in docs if etapa in d["tiempos_ms"]]
+        if valores:
+            etapas[etapa] = {
+                "n": len(valores),
+                "p50": round(_percentile(valores, 50), 2),
+                "p90": round(_percentile(valores, 90), 2),
+                "p99": round(_percentile(valores, 99), 2),
+            }
+    campos = {}
+    for d in docs:
+        for campo, r in d["campos"].items():
+            ok, n = campos.get(campo, (0, 0))
+            campos[campo] = (ok + r["ok"], n + 1)
+    evaluados = [r["ok"] for d in docs for r in d["campos"].values()]
+    return {
+        "documentos": len(docs),
+        "errores": sum(1 for d in docs if d["error"]),
+        "etapas_ms": etapas,
+        "rss_pico_kb": max((d["rss_pico_kb"] for d in docs if d["rss_pico_kb"]), default=None),
+        "precision_campos": {c: round(ok / n, 4) for c, (ok, n) in sorted(campos.items())},
+        "precision_global": round(sum(evaluados) / len(evaluados), 4) if evaluados else None,
+    }
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+class Command(BaseCommand):
+    help = (
+        "Corre parse_document sobre un corpus de fixtures (PDF, imágenes y XML) con sus valores "
+        "esperados (<nombre>.esperado.json) e informa percentiles de latencia por etapa, pico de "
+        "memoria y precisión por campo. Con --json guarda el resultado para comparar entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Fixtures o directorios de fixtures.")
+        parser.add_argument("--workers", type=int, default=1, help="Documentos en paralelo (procesos).")
+        parser.add_argument("--json", dest="salida", help="Guarda el resultado completo en este archivo JSON.")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior: muestra las diferencias.")
+        parser.add_argument("--detalle", action="store_true", help="Lista los campos que no coinciden.")
+
+    def handle(self, *args, **opts):
+        fixtures = list(_fixtures(opts["paths"]))
+        if not fixtures:
+            raise CommandError("No hay fixtures que procesar.")
+        sin_esperado = sum(1 for _p, e in fixtures if e is None)
+        if sin_esperado:
+            self.stdout.write(self.style.WARNING(f"{sin_esperado} fixtures sin .esperado.json: solo se miden tiempos."))
+
+        rss_inicio = current_rss_kb()
+        if opts["workers"] > 1:
+            with ProcessPoolExecutor(max_workers=opts["workers"], initializer=_init_worker) as pool:
+                docs = list(pool.map(_procesar, *zip(*fixtures)))
+        else:
+            docs = [_procesar(path, esperado) for path, esperado in fixtures]
+
+        resumen = _resumen(docs)
+        resultado = {
+            "commit": _commit(),
+            "parser_version": PARSER_VERSION,
+            "motores": cache.engine_version(),
+            "workers": opts["workers"],
+            "rss_inicio_kb": rss_inicio,
+            "resumen": resumen,
+            "documentos": docs,
+        }
+        self._imprimir(resumen, docs, opts["detalle"])
+
+        if opts["comparar"]:
+            with open(opts["comparar"], encoding="utf-8") as fh:
+                self._comparar(json.load(fh), resultado)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as fh:
+                json.dump(resultado, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {opts['salida']}"))
+
+    def _imprimir(self, resumen: dict, docs: list[dict], detalle: bool):
+        self.stdout.write(f"{resumen['documentos']} documentos, {resumen['errores']} con error")
+        for etapa, p in resumen["etapas_ms"].items():
+            self.stdout.write(
+                f"  {etapa:15s} n={p['n']:4d}  p50={p['p50']:9.1f} ms  p90={p['p90']:9.1f} ms  p99={p['p99']:9.1f} ms"
+            )
+        if resumen["rss_pico_kb"]:
+            self.stdout.write(f"  memoria: pico RSS {resumen['rss_pico_kb'] / 1024:.1f} MB")
+        for campo, precision in resumen["precision_campos"].items():
+            self.stdout.write(f"  {campo:18s} {precision:7.1%}")
+        if resumen["precision_global"] is not None:
+            self.stdout.write(f"  {'(global)':18s} {resumen['precision_global']:7.1%}")
+        for d in docs:
+            if d["error"]:
+                self.stdout.write(self.style.ERROR(f"  {d['archivo']}: {d['error']}"))
+            elif detalle:
+                for campo, r in d["campos"].items():
+                    if not r["ok"]:
+                        self.stdout.write(f"  {d['archivo']}: {campo} esperado={r['esperado']!r} obtenido={r['obtenido']!r}")
+
+    def _comparar(self, antes: dict, ahora: dict):
+        a, b = antes.get("resumen") or {}, ahora["resumen"]
+        self.stdout.write(f"Comparado con {antes.get('commit') or 'corrida anterior'} (parser v{antes.get('parser_version')}):")
+        for etapa, p in b["etapas_ms"].items():
+            previo = (a.get("etapas_ms") or {}).get(etapa)
+            if previo and previo["p50"]:
+                cambio = (p["p50"] - previo["p50"]) / previo["p50"]
+                self.stdout.write(f"  {etapa:15s} p50 {previo['p50']:9.1f} -> {p['p50']:9.1f} ms ({cambio:+.1%})")
+        for campo, precision in b["precision_campos"].items():
+            previo = (a.get("precision_campos") or {}).get(campo)
+            if previo is not None and previo != precision:
+                estilo = self.style.SUCCESS if precision > previo else self.style.ERROR
+                self.stdout.write(estilo(f"  {campo:18s} {previo:7.1%} -> {precision:7.1%}"))
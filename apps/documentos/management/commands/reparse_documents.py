@@ -0,0 +1,81 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documentos.ocr.config import PARSER_VERSION
+from apps.documentos.services.reparse_service import TAMANO_LOTE, documentos_a_reparsear, reparsear
+from apps.documentos.tasks.reparse import reparse_documents
+from apps.empresas.models import Empresa
+
+def _fecha(valor: str) -> date:
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Fecha inválida (AAAA-MM-DD): {valor}")
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a correr parse_text y la reconciliación de montos sobre el texto ya extraído "
+        "(Documento.texto_plano), sin OCR. Por defecto solo los documentos parseados con una "
+        "versión anterior a PARSER_VERSION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", help="RUT o id de la empresa.")
+        parser.add_argument("--desde", type=_fecha, help="Cargados desde esta fecha (AAAA-MM-DD).")
+        parser.add_argument("--hasta", type=_fecha, help="Cargados hasta esta fecha (AAAA-MM-DD).")
+        parser.add_argument(
+            "--version-menor", type=int, default=PARSER_VERSION,
+            help=f"Solo parseados con una versión menor a esta (por defecto {PARSER_VERSION}).",
+        )
+        parser.add_argument(
+            "--confianza-menor", type=float,
+            help="Incluye además los de folio o fecha con confianza menor a esta (p. ej. 0.7).",
+        )
+        parser.add_argument("--todas", action="store_true", help="Ignora versión y confianza: re-parsea todo el filtro.")
+        parser.add_argument("--workers", type=int, default=1, help="Procesos de parseo en paralelo.")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Documentos por lote (lectura y bulk_update).")
+        parser.add_argument("--despues-de", type=int, default=0, help="Retoma desde este id (exclusivo).")
+        parser.add_argument("--celery", action="store_true", help="Encola la tarea reparse_documents en vez de correr aquí.")
+
+    def handle(self, *args, **opts):
+        empresa_id = None
+        if opts["empresa"]:
+            empresa = (
+                Empresa.objects.filter(rut=opts["empresa"]).first()
+                or (Empresa.objects.filter(pk=opts["empresa"]).first() if opts["empresa"].isdigit() else None)
+            )
+            if not empresa:
+                raise CommandError(f"No existe la empresa {opts['empresa']}")
+            empresa_id = empresa.pk
+        version_menor = None if opts["todas"] else opts["version_menor"]
+        confianza_menor = None if opts["todas"] else opts["confianza_menor"]
+
+        if opts["celery"]:
+            reparse_documents.delay(
+                empresa_id=empresa_id,
+                desde=opts["desde"].isoformat() if opts["desde"] else None,
+                hasta=opts["hasta"].isoformat() if opts["hasta"] else None,
+                version_menor=version_menor, confianza_menor=confianza_menor,
+                todas=opts["todas"], despues_de=opts["despues_de"],
+            )
+            self.stdout.write(self.style.SUCCESS("Tarea reparse_documents encolada."))
+            return
+
+        qs = documentos_a_reparsear(empresa_id, opts["desde"], opts["hasta"], version_menor, confianza_menor)
+        t0 = time.perf_counter()
+
+        def progreso(stats):
+            segundos = time.perf_counter() - t0
+            self.stdout.write(
+                f"  {stats['leidos']} leídos, {stats['actualizados']} actualizados "
+                f"(hasta id {stats['ultimo_id']}, {stats['leidos'] / segundos:.0f} docs/s)"
+            )
+
+        stats = reparsear(qs, workers=opts["workers"], tamano=opts["lote"],
+                          despues_de=opts["despues_de"], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-parseo terminado: {stats['actualizados']} de {stats['leidos']} documentos "
+            f"en {time.perf_counter() - t0:.1f} s (parser v{PARSER_VERSION})."
+        ))
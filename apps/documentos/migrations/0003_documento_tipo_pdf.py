@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0002_documento_origen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='tipo_pdf',
+            field=models.CharField(blank=True, choices=[('digital', 'Digital'), ('escaneado', 'Escaneado'), ('mixto', 'Mixto')], max_length=10),
+        ),
+    ]
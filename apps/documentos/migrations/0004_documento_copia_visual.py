@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:40
+
+import apps.documentos.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0003_documento_tipo_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='copia_visual',
+            field=models.FileField(blank=True, null=True, upload_to=apps.documentos.models.doc_upload_to),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0004_documento_copia_visual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='ted_xml',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
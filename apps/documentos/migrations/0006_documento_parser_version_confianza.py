@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0005_documento_ted_xml'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='confianza_fecha',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='confianza_folio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='parser_version',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['parser_version'], name='documentos__parser__802f01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['confianza_folio'], name='documentos__confian_89014e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['confianza_fecha'], name='documentos__confian_9d69af_idx'),
+        ),
+    ]
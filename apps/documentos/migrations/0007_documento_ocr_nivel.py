@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0006_documento_parser_version_confianza'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='ocr_nivel',
+            field=models.CharField(blank=True, choices=[('xml', 'XML'), ('pdfminer', 'Capa de texto'), ('ted', 'Timbre electrónico'), ('ocr_bajo', 'OCR rápido'), ('ocr_alto', 'OCR alta resolución')], max_length=10),
+        ),
+    ]
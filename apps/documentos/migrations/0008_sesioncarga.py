@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0007_documento_ocr_nivel'),
+        ('empresas', '0002_empresa_email_host_empresa_email_last_check_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionCarga',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('origen', models.CharField(default='api', max_length=20)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('tamano_bytes', models.BigIntegerField()),
+                ('hash_sha256', models.CharField(max_length=64)),
+                ('recibido_bytes', models.BigIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('abierta', 'Abierta'), ('finalizada', 'Finalizada'), ('cancelada', 'Cancelada')], default='abierta', max_length=20)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('documento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documentos.documento')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones_carga', to='empresas.empresa')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sesiones_carga', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'actualizado_en'], name='documentos__estado_7a5323_idx')],
+            },
+        ),
+    ]
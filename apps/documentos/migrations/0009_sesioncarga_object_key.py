@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0008_sesioncarga'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesioncarga',
+            name='object_key',
+            field=models.CharField(blank=True, max_length=512),
+        ),
+    ]
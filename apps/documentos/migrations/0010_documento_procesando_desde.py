@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0009_sesioncarga_object_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='procesando_desde',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
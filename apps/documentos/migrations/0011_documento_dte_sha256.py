@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0010_documento_procesando_desde'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='dte_sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='documento',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('procesado', 'Procesado'), ('error', 'Error'), ('duplicado', 'Duplicado')], default='pendiente', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='documento',
+            constraint=models.UniqueConstraint(condition=models.Q(('dte_sha256__gt', '')), fields=('empresa', 'dte_sha256'), name='uniq_doc_dte_empresa'),
+        ),
+    ]
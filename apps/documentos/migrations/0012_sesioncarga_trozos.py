@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0011_documento_dte_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesioncarga',
+            name='trozos',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='sesioncarga',
+            name='estado',
+            field=models.CharField(choices=[('abierta', 'Abierta'), ('ensamblando', 'Ensamblando'), ('finalizada', 'Finalizada'), ('cancelada', 'Cancelada')], default='abierta', max_length=20),
+        ),
+    ]
@@ -0,0 +1,35 @@
+import hashlib
+
+from django.db import migrations
+from django.db.models import F
+
+
+def derivar_hashes(apps, schema_editor):
+    # Los DTE creados desde un sobre guardaban su dte_sha256 como hash_sha256;
+    # pasan al hash derivado del archivo del sobre (tasks.extract.hash_dte_en_sobre)
+    Documento = apps.get_model("documentos", "Documento")
+    for doc in Documento.objects.filter(dte_sha256__gt="", hash_sha256=F("dte_sha256")).iterator():
+        xml = (doc.ocr_json or {}).get("xml") or {}
+        archivo_sha256 = (
+            Documento.objects.filter(empresa_id=doc.empresa_id, archivo=doc.archivo)
+            .exclude(hash_sha256=F("dte_sha256"))
+            .values_list("hash_sha256", flat=True)
+            .first()
+        )
+        if archivo_sha256 is None or "indice" not in xml:
+            continue
+        Documento.objects.filter(pk=doc.pk).update(
+            hash_sha256=hashlib.sha256(f"{archivo_sha256}:{xml['indice']}".encode()).hexdigest(),
+            ocr_json={**doc.ocr_json, "xml": {**xml, "archivo_sha256": archivo_sha256}},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0012_sesioncarga_trozos'),
+    ]
+
+    operations = [
+        migrations.RunPython(derivar_hashes, migrations.RunPython.noop),
+    ]
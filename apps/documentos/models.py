@@ -4,6 +4,7 @@ from django.db.models import Q
 from apps.empresas.models import Empresa
 import hashlib
 import mimetypes
+import uuid
 from datetime import date
 
 ESTADOS = (
@@ -11,6 +12,7 @@ ESTADOS = (
     ("procesando", "Procesando"),
     ("procesado", "Procesado"),
     ("error", "Error"),
+    ("duplicado", "Duplicado"),
 )
 
 TIPOS = (
@@ -22,6 +24,21 @@ TIPOS = (
     ("desconocido", "Desconocido"),
 )
 
+TIPOS_PDF = (
+    ("digital", "Digital"),
+    ("escaneado", "Escaneado"),
+    ("mixto", "Mixto"),
+)
+
+# Nivel de la extracción escalonada en que terminó el documento (ver ocr/escalation.py)
+NIVELES_OCR = (
+    ("xml", "XML"),
+    ("pdfminer", "Capa de texto"),
+    ("ted", "Timbre electrónico"),
+    ("ocr_bajo", "OCR rápido"),
+    ("ocr_alto", "OCR alta resolución"),
+)
+
 def doc_upload_to(instance, filename):
     # media/documentos/<rut_empresa>/<año>/<mes>/<filename>
     today = date.today()
@@ -36,6 +53,8 @@ class Documento(models.Model):
     subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="docs_subidos")
 
     archivo = models.FileField(upload_to=doc_upload_to)
+    # PDF que llegó junto al XML del DTE (mismo correo): solo para visualizar, no pasa por OCR
+    copia_visual = models.FileField(upload_to=doc_upload_to, null=True, blank=True)
     nombre_archivo_original = models.CharField(max_length=255, blank=True)
     extension = models.CharField(max_length=10, blank=True)
     es_pdf = models.BooleanField(default=False)
@@ -43,13 +62,22 @@ class Documento(models.Model):
 
     mime_type = models.CharField(max_length=120, blank=True)
     tamano_bytes = models.BigIntegerField(default=0)
+    # SHA-256 del archivo. Los DTE creados desde un sobre comparten el archivo del
+    # Documento del sobre: llevan uno derivado (tasks.extract.hash_dte_en_sobre)
     hash_sha256 = models.CharField(max_length=64, editable=False)
+    # SHA-256 de la forma canónica (C14N) del DTE, para los XML: identifica al DTE venga
+    # suelto o dentro de un sobre EnvioDTE (hash_sha256 es el del archivo completo)
+    dte_sha256 = models.CharField(max_length=64, blank=True, default="", editable=False)
 
     paginas = models.PositiveIntegerField(null=True, blank=True)  # para PDFs
+    tipo_pdf = models.CharField(max_length=10, choices=TIPOS_PDF, blank=True)  # sonda de primeras páginas; elige motor/cola
     texto_plano = models.TextField(blank=True, default="")
 
     # --- Extracción (OCR/parse) ---
     estado = models.CharField(max_length=20, choices=ESTADOS, default="pendiente")
+    # Cuándo un worker lo pasó a 'procesando'; si el worker muere (límite de tiempo, OOM,
+    # deploy) el barrido de pendientes lo vuelve a tomar pasado un plazo (tasks/extract.py)
+    procesando_desde = models.DateTimeField(null=True, blank=True)
     tipo_documento = models.CharField(max_length=50, choices=TIPOS, default="desconocido")
 
     folio = models.CharField(max_length=30, blank=True)
@@ -73,13 +101,22 @@ class Documento(models.Model):
     sii_estado = models.CharField(max_length=50, blank=True)     # p.ej. 'ACEPTADO', 'RECHAZADO', 'PENDIENTE'
     sii_glosa = models.CharField(max_length=255, blank=True)
     sii_validado_en = models.DateTimeField(null=True, blank=True)
+    # Timbre electrónico (XML del TED) leído del PDF417 o del XML del DTE; se envía al validar
+    ted_xml = models.TextField(blank=True, default="")
 
     # Auditoría OCR
-    ocr_fuente = models.CharField(max_length=20, blank=True)     # 'pdf_text', 'pdf_ocr', 'image_ocr'
+    ocr_fuente = models.CharField(max_length=20, blank=True)     # 'pdf_text', 'pdf_ocr', 'pdf_mixto', 'image_ocr'
     ocr_lang = models.CharField(max_length=30, blank=True)       # 'spa+eng'
     ocr_engine = models.CharField(max_length=50, blank=True)     # 'tesseract'
     ocr_version = models.CharField(max_length=20, blank=True)    # '5.3.0'
+    ocr_nivel = models.CharField(max_length=10, choices=NIVELES_OCR, blank=True)
     ocr_json = models.JSONField(null=True, blank=True)
+    # Versión del parser que produjo los campos (null = anterior a registrarla) y confianza
+    # (0 a 1) de folio y fecha; el detalle por campo queda en ocr_json["confianza"].
+    # Indexados para elegir qué re-extraer (ver services/reparse_service.py).
+    parser_version = models.PositiveSmallIntegerField(null=True, blank=True)
+    confianza_folio = models.FloatField(null=True, blank=True)
+    confianza_fecha = models.FloatField(null=True, blank=True)
 
     creado_en = models.DateTimeField(auto_now_add=True)
 
@@ -95,6 +132,13 @@ class Documento(models.Model):
                 name="uniq_doc_folio_empresa_proveedor_tipo",
                 condition=Q(folio__gt="")  # solo aplica si viene folio
             ),
+
+            # Un mismo DTE (XML) una sola vez por empresa
+            models.UniqueConstraint(
+                fields=("empresa", "dte_sha256"),
+                name="uniq_doc_dte_empresa",
+                condition=Q(dte_sha256__gt=""),
+            ),
         ]
         indexes = [
             models.Index(fields=["empresa", "rut_proveedor", "folio"]),
@@ -102,22 +146,77 @@ class Documento(models.Model):
             models.Index(fields=["empresa", "tipo_documento"]),
             models.Index(fields=["estado"]),
             models.Index(fields=["creado_en"]),
+            models.Index(fields=["parser_version"]),
+            models.Index(fields=["confianza_folio"]),
+            models.Index(fields=["confianza_fecha"]),
         ]
 
     def __str__(self):
         return f"{self.id} - {self.empresa} - {self.archivo.name}"
 
-    def save(self, *args, **kwargs):
-        # calcular hash/mime/tamaño/extension/es_pdf al cargar o cambiar archivo
-        if self.archivo and (not self.hash_sha256 or not self.tamano_bytes or not self.mime_type):
+    def completar_metadatos(self):
+        """
+        Calcula hash/mime/tamaño/extension/es_pdf del archivo. Lo llama save();
+        quien inserta con bulk_create (que no pasa por save) lo llama a mano.
+        """
+        # Las subidas web ya traen el hash (uploadhandler.py): no se relee el archivo
+        if not self.hash_sha256:
             sha = hashlib.sha256()
             for chunk in self.archivo.chunks():
                 sha.update(chunk)
             self.hash_sha256 = sha.hexdigest()
+        if not self.tamano_bytes:
             self.tamano_bytes = self.archivo.size or 0
-            self.mime_type = mimetypes.guess_type(self.archivo.name)[0] or ""
-            self.extension = (self.archivo.name.split(".")[-1] or "").lower()
-            self.es_pdf = self.extension == "pdf"
-            if not self.nombre_archivo_original:
-                self.nombre_archivo_original = self.archivo.name
+        self.mime_type = mimetypes.guess_type(self.archivo.name)[0] or ""
+        self.extension = (self.archivo.name.split(".")[-1] or "").lower()
+        self.es_pdf = self.extension == "pdf"
+        if not self.nombre_archivo_original:
+            self.nombre_archivo_original = self.archivo.name
+
+    def save(self, *args, **kwargs):
+        # calcular hash/mime/tamaño/extension/es_pdf al cargar o cambiar archivo
+        if self.archivo and (not self.hash_sha256 or not self.tamano_bytes or not self.mime_type):
+            self.completar_metadatos()
         super().save(*args, **kwargs)
+
+ESTADOS_CARGA = (
+    ("abierta", "Abierta"),
+    ("ensamblando", "Ensamblando"),  # finalizada por el cliente; el worker arma el archivo
+    ("finalizada", "Finalizada"),
+    ("cancelada", "Cancelada"),
+)
+
+class SesionCarga(models.Model):
+    """
+    Subida reanudable por partes (services/chunked_upload_service.py): el
+    archivo llega en trozos y aquí queda cuánto se recibió, para retomar
+    tras un corte. Al finalizar, una tarea arma el archivo y crea el Documento.
+    También registra las subidas directas con URL firmada (object_key).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="sesiones_carga")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="sesiones_carga")
+    origen = models.CharField(max_length=20, default="api")
+
+    nombre_archivo = models.CharField(max_length=255)
+    tamano_bytes = models.BigIntegerField()
+    hash_sha256 = models.CharField(max_length=64)  # declarado por el cliente; se verifica al finalizar
+    recibido_bytes = models.BigIntegerField(default=0)  # trozos contiguos desde el byte 0
+    trozos = models.JSONField(default=list, blank=True)  # trozos recibidos en orden: {inicio, ruta, sha256}
+    # Subida directa al object storage con URL firmada (services/storage_service.py):
+    # clave del objeto, que pasa a ser Documento.archivo. Vacío = subida por partes.
+    object_key = models.CharField(max_length=512, blank=True)
+
+    estado = models.CharField(max_length=20, choices=ESTADOS_CARGA, default="abierta")
+    documento = models.ForeignKey(Documento, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "actualizado_en"]),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.nombre_archivo} ({self.recibido_bytes}/{self.tamano_bytes})"
@@ -0,0 +1,117 @@
+# apps/documentos/ocr/cache.py
+"""
+Caché persistente de resultados de extracción, direccionado por contenido.
+
+La clave es (SHA-256 del archivo, versión de los motores OCR, versión del
+parser): el mismo archivo subido por otra empresa, reenviado por correo o
+reprocesado no vuelve a pasar por pdfminer/Tesseract. Las entradas son JSON
+en disco y se desalojan por tamaño (LRU por mtime).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import lru_cache
+
+from .config import settings, PARSER_VERSION
+from .schema import OCRResult
+from .utils import disk_lru
+
+log = logging.getLogger(__name__)
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+@lru_cache(maxsize=1)
+def _tesseract_version() -> str:
+    from .engines import tesseract as tesseract_engine
+    try:
+        return tesseract_engine.version()
+    except Exception:
+        return "desconocido"
+
+@lru_cache(maxsize=1)
+def _pdfminer_version() -> str:
+    try:
+        import pdfminer
+        return getattr(pdfminer, "__version__", "desconocido")
+    except Exception:
+        return "desconocido"
+
+@lru_cache(maxsize=1)
+def engine_version() -> str:
+    """
+    Identifica todo lo que cambia el texto crudo: motor y versión de Tesseract,
+    versión de pdfminer, idioma, DPI de rasterización, preprocesamiento, OCR por
+    zonas, lector del timbre electrónico y niveles de la extracción escalonada.
+    """
+    from .engines import ted as ted_engine
+    from .engines import tesseract as tesseract_engine
+    tesseract = f"{tesseract_engine.backend()}-{_tesseract_version()}"
+    return (f"tesseract-{tesseract}|pdfminer-{_pdfminer_version()}|spa|dpi{settings.OCR_PDF_DPI}"
+            f"|pre-{settings.OCR_PREPROCESS}|roi{int(settings.OCR_ROI)}"
+            f"|ted-{ted_engine.version() if settings.OCR_TED else 'no'}-dpi{settings.OCR_TED_DPI}"
+            f"|bajo-dpi{settings.OCR_PDF_DPI_BAJO}-pre-{settings.OCR_PREPROCESS_BAJO}|conf{settings.OCR_CONFIANZA_MIN}")
+
+def engine_stamp(fuente: str) -> tuple[str, str, str]:
+    """
+    (motor, versión, idioma) con que se obtuvo el texto según su fuente, para
+    Documento.ocr_engine / ocr_version / ocr_lang.
+    """
+    if fuente == "xml":
+        from lxml import etree
+        return "lxml", ".".join(map(str, etree.LXML_VERSION[:3])), ""
+    if fuente == "pdf_text":
+        return "pdfminer", _pdfminer_version(), ""
+    # El OCR usa 'spa' en imágenes y PDFs (ver engines/image.py y engines/pdf.py)
+    motor = "pdfminer+tesseract" if fuente == "pdf_mixto" else "tesseract"
+    return motor, _tesseract_version(), "spa"
+
+def _entry_path(sha256: str) -> str:
+    engine_tag = hashlib.md5(engine_version().encode("utf-8")).hexdigest()[:12]
+    name = f"{sha256}-{engine_tag}-p{PARSER_VERSION}.json"
+    return os.path.join(settings.OCR_CACHE_DIR, sha256[:2], name)
+
+def enabled() -> bool:
+    return bool(settings.OCR_CACHE_DIR)
+
+def get(sha256: str) -> OCRResult | None:
+    if not enabled() or not sha256:
+        return None
+    path = _entry_path(sha256)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            payload = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("Entrada de caché OCR ilegible %s: %s", path, e)
+        return None
+    disk_lru.touch(path)
+    return OCRResult.from_dict(payload["result"])
+
+def put(sha256: str, result: OCRResult):
+    if not enabled() or not sha256:
+        return
+    path = _entry_path(sha256)
+    payload = {
+        "sha256": sha256,
+        "engine": engine_version(),
+        "parser_version": PARSER_VERSION,
+        "result": result.to_dict(),
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: varios workers pueden compartir el directorio
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        disk_lru.record_write(settings.OCR_CACHE_DIR, os.path.getsize(path), settings.OCR_CACHE_MAX_MB * 1024 * 1024)
+    except Exception as e:
+        log.warning("No se pudo guardar el resultado OCR en caché (%s): %s", path, e)
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import os
+import tempfile
 from dataclasses import dataclass
 
+# Versión del parser (extractores + reconciliación). Subirla cada vez que un cambio
+# altere los campos que produce parse_text: invalida el caché de resultados OCR.
+PARSER_VERSION = 2
+
 @dataclass(frozen=True)
 class Settings:
     TESSERACT_CMD: str | None = os.getenv("TESSERACT_CMD")
@@ -10,5 +15,37 @@ class Settings:
     TESSERACT_PSM: str = os.getenv("TESSERACT_PSM", "6")
     TESSERACT_OEM: str = os.getenv("TESSERACT_OEM", "3")
     TESSERACT_PSM_IMAGE: str = os.getenv("TESSERACT_PSM_IMAGE", "4")
+    TESSDATA_PREFIX: str | None = os.getenv("TESSDATA_PREFIX")
+    # 'auto' usa tesserocr (instancia persistente por proceso) si está instalado;
+    # 'pytesseract' fuerza un proceso tesseract por llamada.
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "auto")
+    # OCR de PDFs escaneados: páginas procesadas en paralelo (1 = secuencial).
+    # Conviene dejar OMP_THREAD_LIMIT=1 en el worker para que cada tesseract use un solo núcleo.
+    OCR_PDF_WORKERS: int = int(os.getenv("OCR_PDF_WORKERS", str(os.cpu_count() or 1)))
+    OCR_PDF_DPI: int = int(os.getenv("OCR_PDF_DPI", "200"))
+    # Nivel "ocr_bajo" de la extracción escalonada (ver ocr/escalation.py): menos DPI y sin
+    # preprocesar; OCR_PDF_DPI y OCR_PREPROCESS quedan para el nivel "ocr_alto"
+    OCR_PDF_DPI_BAJO: int = int(os.getenv("OCR_PDF_DPI_BAJO", "150"))
+    OCR_PREPROCESS_BAJO: str = os.getenv("OCR_PREPROCESS_BAJO", "none")
+    # Confianza mínima de cada campo obligatorio para no escalar al nivel siguiente
+    OCR_CONFIANZA_MIN: float = float(os.getenv("OCR_CONFIANZA_MIN", "0.7"))
+    # Preprocesamiento antes de Tesseract (imágenes y PDFs): 'adaptive', 'legacy' o 'none'
+    OCR_PREPROCESS: str = os.getenv("OCR_PREPROCESS", "adaptive")
+    # Imágenes: OCR solo de encabezado, folio y totales si el layout es el estándar SII;
+    # página completa si faltan campos obligatorios
+    OCR_ROI: bool = os.getenv("OCR_ROI", "1") == "1"
+    # Timbre electrónico (PDF417) con zxing-cpp: si se decodifica, fija RUT emisor, tipo,
+    # folio, fecha y total. DPI con que se rasterizan las páginas que no pasan por OCR.
+    OCR_TED: bool = os.getenv("OCR_TED", "1") == "1"
+    OCR_TED_DPI: int = int(os.getenv("OCR_TED_DPI", "300"))
+    # Traza por etapa (tiempos y decisiones) en Documento.ocr_json["trace"]; ver debug/trace.py
+    OCR_TRACE: bool = os.getenv("OCR_TRACE", "0") == "1"
+    # Caché de resultados por SHA-256 del archivo (vacío = desactivado)
+    OCR_CACHE_DIR: str = os.getenv("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sgidt-ocr-cache"))
+    OCR_CACHE_MAX_MB: int = int(os.getenv("OCR_CACHE_MAX_MB", "512"))
+    # Copias locales de archivos de un storage remoto (S3/MinIO), por SHA-256; ver ocr/file_cache.py.
+    # Conviene un directorio compartido por todos los workers del host.
+    OCR_FILE_CACHE_DIR: str = os.getenv("OCR_FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sgidt-file-cache"))
+    OCR_FILE_CACHE_MAX_MB: int = int(os.getenv("OCR_FILE_CACHE_MAX_MB", "2048"))
 
 settings = Settings()
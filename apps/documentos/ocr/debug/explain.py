@@ -1,4 +1,37 @@
 # -*- coding: utf-8 -*-
-def explain_amount_choice(text: str) -> dict:
-    # TODO: retornar líneas cercanas a etiquetas y montos detectados
-    return {}
+from .trace import Trace
+
+def explain_amount_choice(source) -> dict:
+    """
+    Explica cómo se eligieron los montos de un documento a partir de su traza.
+
+    `source` puede ser el `ocr_json` de un Documento (o su clave "trace"), o
+    un texto plano: en ese caso se parsea con la traza activada. Devuelve las
+    líneas del pie con montos, los candidatos, las etiquetas encontradas, la
+    asignación por magnitud, la corrección aplicada y el escenario de
+    reconciliación.
+    """
+    if isinstance(source, str):
+        from ..parsing import parse_text  # evita import circular
+        trace = Trace(enabled=True)
+        parse_text(source, trace=trace)
+        source = trace.as_dict()
+
+    trace = (source or {}).get("trace", source) or {}
+    decisiones = trace.get("decisiones") or {}
+    montos = decisiones.get("montos") or {}
+    reconciliacion = decisiones.get("reconciliacion") or {}
+    if not montos and not reconciliacion:
+        return {}
+
+    return {
+        "lineas": montos.get("lineas", []),
+        "candidatos": montos.get("candidatos", []),
+        "etiquetas": montos.get("etiquetas", {}),
+        "por_magnitud": montos.get("por_magnitud", {}),
+        "correccion": montos.get("correccion"),
+        "extraidos": montos.get("extraidos", {}),
+        "reconciliacion": reconciliacion.get("escenario"),
+        "resultado": reconciliacion.get("resultado", {}),
+        "tiempos_ms": {k: v for k, v in (trace.get("tiempos_ms") or {}).items() if k in ("montos", "reconciliacion")},
+    }
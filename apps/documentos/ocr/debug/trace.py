@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Traza opcional de la extracción (OCR_TRACE=1).
+
+Registra, por etapa, el tiempo y las decisiones tomadas (salida de los
+detectores, montos candidatos, elección de la reconciliación) en un dict
+compacto que parse_document guarda en Documento.ocr_json["trace"]. Con la
+traza desactivada todas las llamadas son no-ops y no se guarda nada.
+
+    trace = Trace(enabled=True)
+    with trace.stage("folio"):
+        folio, conf = extract_folio(text)
+        trace.record("folio", valor=folio, conf=conf)
+
+Una etapa que se repite (p.ej. "tesseract" en cada página) acumula su tiempo;
+con páginas en paralelo es la suma de los hilos, no el tiempo de reloj.
+`debug/explain.py` y el comando ocr_bench son los lectores de esta estructura.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(v) for v in value]
+    return value
+
+class Trace:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.tiempos_ms: dict[str, float] = {}
+        self.decisiones: dict[str, dict] = {}
+        # Las páginas de un PDF escaneado se procesan en hilos (engines/pdf.py)
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return self.enabled
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self.tiempos_ms[name] = round(self.tiempos_ms.get(name, 0.0) + ms, 2)
+
+    def record(self, name: str, **data):
+        """Agrega datos a la decisión `name` (se fusionan si se llama varias veces)."""
+        if self.enabled:
+            self.decisiones.setdefault(name, {}).update(_jsonable(data))
+
+    def as_dict(self) -> dict:
+        return {"tiempos_ms": dict(self.tiempos_ms), "decisiones": dict(self.decisiones)}
+
+# Traza desactivada compartida: evita `if trace:` en cada extractor
+NULL_TRACE = Trace(enabled=False)
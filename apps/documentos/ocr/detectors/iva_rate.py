@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
-import re
 from ..utils.numbers import clean_and_parse_amount
+from ..utils.patterns import IVA_WORD
 
 def detect_iva_rate(text: str) -> float | None:
     r = clean_and_parse_amount(text)
     if r: return r
-    if re.search(r"\bIVA\b", text, re.I): return 0.19
+    if IVA_WORD.search(text): return 0.19
     return None
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Detección barata (OpenCV, sin OCR) de las zonas de un DTE con formato SII:
+
+- 'folio':    recuadro del folio (rojo en el original) con RUT emisor, tipo y N°.
+- 'emisor':   franja superior a la izquierda del recuadro (razón social, giro).
+- 'receptor': bloque bajo el recuadro (SEÑOR(ES), RUT receptor, fecha de emisión).
+- 'totales':  tabla de totales (NETO / EXENTO / IVA / TOTAL) al pie, a la derecha.
+
+Las cajas son (x0, y0, x1, y1) en pixeles de la imagen original. Si no se
+encuentra el recuadro del folio el documento no sigue el formato estándar y
+se devuelve None: el llamador hace OCR de la página completa.
+"""
+import cv2
+import numpy as np
+
+# El recuadro del folio ocupa ~1-10% de la página y es más ancho que alto
+FOLIO_AREA_RANGE = (0.005, 0.12)
+FOLIO_ASPECT_RANGE = (1.1, 4.5)
+# ...y está en el tercio superior, hacia la derecha
+FOLIO_MAX_TOP = 0.35
+FOLIO_MIN_CENTER_X = 0.45
+
+# Alto del bloque del receptor bajo el recuadro (fracción de la página)
+RECEPTOR_HEIGHT = 0.22
+# Si no hay tabla de totales con bordes, se toma este pie de página
+TOTALES_FALLBACK_TOP = 0.62
+PAD = 0.01
+
+def _red_mask(bgr: np.ndarray) -> np.ndarray:
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    low = cv2.inRange(hsv, (0, 80, 60), (10, 255, 255))
+    high = cv2.inRange(hsv, (165, 80, 60), (180, 255, 255))
+    return cv2.bitwise_or(low, high)
+
+def _dark_mask(gray: np.ndarray) -> np.ndarray:
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return binary
+
+def _rectangles(mask: np.ndarray):
+    """Contornos aproximables por un cuadrilátero, como (x, y, w, h)."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    for c in contours:
+        peri = cv2.arcLength(c, True)
+        approx = cv2.approxPolyDP(c, 0.02 * peri, True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            yield cv2.boundingRect(approx)
+
+def _find_folio_box(bgr: np.ndarray, gray: np.ndarray):
+    h, w = gray.shape
+    page_area = float(h * w)
+
+    def is_folio(rect) -> bool:
+        x, y, rw, rh = rect
+        area = rw * rh / page_area
+        return (
+            FOLIO_AREA_RANGE[0] <= area <= FOLIO_AREA_RANGE[1]
+            and FOLIO_ASPECT_RANGE[0] <= rw / max(rh, 1) <= FOLIO_ASPECT_RANGE[1]
+            and y <= FOLIO_MAX_TOP * h
+            and (x + rw / 2) >= FOLIO_MIN_CENTER_X * w
+        )
+
+    # 1. Recuadro rojo (impresión/foto a color)
+    red = _red_mask(bgr) if bgr.ndim == 3 else None
+    if red is not None and cv2.countNonZero(red) > 0.0005 * page_area:
+        red = cv2.morphologyEx(red, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+        candidates = [r for r in _rectangles(red) if is_folio(r)]
+        if candidates:
+            return max(candidates, key=lambda r: r[2] * r[3])
+
+    # 2. Escaneo en grises: el recuadro con borde grueso en la esquina superior derecha
+    top = _dark_mask(gray[: int(FOLIO_MAX_TOP * h * 1.5)])
+    # Solo líneas largas (bordes), sin letras
+    k = max(15, w // 40)
+    lines = cv2.bitwise_or(
+        cv2.morphologyEx(top, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (k, 1))),
+        cv2.morphologyEx(top, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, k))),
+    )
+    candidates = [r for r in _rectangles(lines) if is_folio(r)]
+    if candidates:
+        return max(candidates, key=lambda r: r[2] * r[3])
+    return None
+
+def _find_totales_box(gray: np.ndarray, below: int):
+    """Tabla de totales: unión de los recuadros de la mitad derecha del pie."""
+    h, w = gray.shape
+    y_start = max(below, int(h * 0.45))
+    region = _dark_mask(gray[y_start:, w // 2:])
+    k = max(15, w // 30)
+    lines = cv2.bitwise_or(
+        cv2.morphologyEx(region, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (k, 1))),
+        cv2.morphologyEx(region, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, k))),
+    )
+    rects = [
+        (x + w // 2, y + y_start, rw, rh) for x, y, rw, rh in _rectangles(lines)
+        if rw * rh >= 0.002 * h * w and rw < w * 0.5
+    ]
+    if not rects:
+        return None
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0] + r[2] for r in rects)
+    y1 = max(r[1] + r[3] for r in rects)
+    return x0, y0, x1, y1
+
+def detect_dte_regions(image: np.ndarray) -> dict[str, tuple[int, int, int, int]] | None:
+    """Zonas del DTE en `image` (BGR o gris). None si no calza con el formato SII."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape
+    folio = _find_folio_box(image, gray)
+    if folio is None:
+        return None
+
+    pad_x, pad_y = int(PAD * w), int(PAD * h)
+    fx, fy, fw, fh = folio
+    folio_bottom = min(h, fy + fh + pad_y)
+    receptor_bottom = min(h, folio_bottom + int(RECEPTOR_HEIGHT * h))
+
+    regions = {
+        "emisor": (0, 0, max(1, fx - pad_x), folio_bottom),
+        "folio": (max(0, fx - pad_x), max(0, fy - pad_y), min(w, fx + fw + pad_x), folio_bottom),
+        "receptor": (0, folio_bottom, w, receptor_bottom),
+    }
+    totales = _find_totales_box(gray, receptor_bottom)
+    if totales:
+        x0, y0, x1, y1 = totales
+        # Las etiquetas (MONTO NETO, I.V.A.) pueden quedar fuera de los bordes, a la izquierda
+        regions["totales"] = (max(0, x0 - (x1 - x0) // 2), max(0, y0 - pad_y), min(w, x1 + pad_x), min(h, y1 + pad_y))
+    else:
+        regions["totales"] = (0, max(receptor_bottom, int(TOTALES_FALLBACK_TOP * h)), w, h)
+    return regions
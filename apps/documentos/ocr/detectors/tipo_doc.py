@@ -1,15 +1,17 @@
 # -*- coding: utf-8 -*-
-import re
 from ..utils.text_norm import normalize_text
+from ..utils.text_index import TextIndex
+from ..utils.patterns import (
+    TIPO_FACTURA as _RE_FACTURA,
+    TIPO_BOLETA as _RE_BOLETA,
+    TIPO_NC as _RE_NC,
+    TIPO_EXENTA as _RE_EXENTA,
+    TIPO_IVA as _RE_IVA,
+)
 
-_RE_FACTURA = re.compile(r"\bFACTURA\b", re.I)
-_RE_BOLETA  = re.compile(r"\bBOLETA\b", re.I)
-_RE_NC      = re.compile(r"NOTA\s+DE\s+CR[EÉ]DITO", re.I)
-_RE_EXENTA  = re.compile(r"\bEXENTA?\b", re.I)
-_RE_IVA     = re.compile(r"\bI\.?V\.?A\.?\b|\bIVA\b", re.I)
-
-def detect_tipo_dte(text: str):
-    t = normalize_text(text or "")
+def detect_tipo_dte(text):
+    """`text` puede ser un str o el TextIndex compartido (reusa su texto normalizado)."""
+    t = text.normalized if isinstance(text, TextIndex) else normalize_text(text or "")
     if not t: return "desconocido", "Documento Desconocido"
 
     if _RE_NC.search(t):
@@ -0,0 +1,85 @@
+# apps/documentos/ocr/detectors/tipo_pdf.py
+"""
+Sonda rápida que clasifica un PDF como digital, escaneado o mixto mirando
+solo la estructura de sus primeras páginas (fuentes y operadores de texto),
+sin renderizar ni extraer el texto completo.
+"""
+import logging
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1, stream_value
+from pdfminer.psparser import LIT
+
+log = logging.getLogger(__name__)
+
+TIPO_PDF_DIGITAL = "digital"
+TIPO_PDF_ESCANEADO = "escaneado"
+TIPO_PDF_MIXTO = "mixto"
+
+PROBE_MAX_PAGES = 2
+
+_LIT_FORM = LIT("Form")
+_TEXT_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
+
+def _stream_has_text(data: bytes) -> bool:
+    return b"BT" in data and any(op in data for op in _TEXT_OPERATORS)
+
+def _page_has_text(page: PDFPage) -> bool:
+    resources = resolve1(page.resources) or {}
+    page_fonts = resolve1(resources.get("Font"))
+    if page_fonts:
+        for stream in page.contents:
+            try:
+                if _stream_has_text(stream_value(stream).get_data()):
+                    return True
+            except Exception:
+                continue
+
+    # El texto también puede venir dentro de un Form XObject (plantillas, sellos)
+    xobjects = resolve1(resources.get("XObject")) or {}
+    for xobj in xobjects.values():
+        try:
+            xobj = stream_value(xobj)
+            if xobj.get("Subtype") is not _LIT_FORM:
+                continue
+            form_resources = resolve1(xobj.get("Resources")) or {}
+            if (resolve1(form_resources.get("Font")) or page_fonts) and _stream_has_text(xobj.get_data()):
+                return True
+        except Exception:
+            continue
+    return False
+
+def probe_pdf_kind(source, max_pages: int = PROBE_MAX_PAGES) -> str:
+    """
+    Devuelve 'digital', 'escaneado' o 'mixto' según si las primeras
+    `max_pages` páginas tienen capa de texto. `source` es una ruta o un
+    archivo binario con seek(). Devuelve "" si el PDF no se puede leer.
+    """
+    fp = open(source, "rb") if isinstance(source, str) else source
+    try:
+        doc = PDFDocument(PDFParser(fp))
+        results = []
+        for i, page in enumerate(PDFPage.create_pages(doc)):
+            if i >= max_pages:
+                break
+            results.append(_page_has_text(page))
+    except Exception as e:
+        log.warning("No se pudo sondear el PDF: %s", e)
+        return ""
+    finally:
+        if isinstance(source, str):
+            fp.close()
+        else:
+            try:
+                fp.seek(0)
+            except Exception:
+                pass
+
+    if not results:
+        return ""
+    if all(results):
+        return TIPO_PDF_DIGITAL
+    if not any(results):
+        return TIPO_PDF_ESCANEADO
+    return TIPO_PDF_MIXTO
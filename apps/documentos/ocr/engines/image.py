@@ -1,15 +1,46 @@
 # apps/documentos/ocr/engines/image.py
 import cv2
-import numpy as np
 import logging
 from PIL import Image
-import pytesseract
+
+from ..config import settings
+from ..debug.trace import Trace, NULL_TRACE
+from ..detectors.layout import detect_dte_regions
+from ..preprocess.image import preprocess
+from . import ted as ted_engine
+from . import tesseract
 
 logger = logging.getLogger(__name__)
 
-def ocr_from_image_path(image_path: str) -> str:
+# Zonas del DTE en orden de lectura, con el modo de segmentación de Tesseract
+# que mejor les va: bloques libres (3) o texto uniforme línea a línea (6).
+ROI_PSM = (("emisor", 3), ("folio", 6), ("receptor", 3), ("totales", 6))
+
+def _ocr_regions(image, regions: dict, trace: Trace = NULL_TRACE) -> str:
+    """OCR solo de las zonas detectadas; el texto se une en orden de lectura."""
+    parts = []
+    for name, psm in ROI_PSM:
+        x0, y0, x1, y1 = regions[name]
+        crop = image[y0:y1, x0:x1]
+        if crop.size == 0:
+            continue
+        with trace.stage("preproceso"):
+            binary_img = preprocess(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), settings.OCR_PREPROCESS)
+        with trace.stage("tesseract"):
+            parts.append(tesseract.image_to_string(binary_img, lang='spa', psm=psm).strip())
+    return "\n".join(p for p in parts if p)
+
+def ocr_from_image_path(image_path: str, meta: dict | None = None, roi: bool = False, trace: Trace = NULL_TRACE) -> str:
     """
     Realiza OCR en una imagen utilizando un pipeline de pre-procesamiento profesional.
+
+    Con `roi=True` intenta el modo rápido: si la imagen tiene el formato SII
+    (recuadro del folio), solo se leen el encabezado, el recuadro, el receptor
+    y los totales. Si no calza, se lee la página completa. `meta["roi"]`
+    registra las zonas usadas; `trace` acumula el tiempo de cada etapa.
+
+    Con OCR_TED, si `meta` aún no tiene "ted", se busca el timbre (PDF417) en
+    la imagen original y se deja en `meta["ted"]`.
     """
     try:
         # 1. Cargar la imagen con OpenCV
@@ -18,33 +49,31 @@ def ocr_from_image_path(image_path: str) -> str:
             logger.error(f"Error al cargar la imagen desde la ruta: {image_path}")
             return ""
 
-        # --- Pipeline de Pre-procesamiento ---
+        if meta is not None and "ted" not in meta and settings.OCR_TED and ted_engine.disponible():
+            with trace.stage("ted"):
+                ted_xml = ted_engine.decode_ted(image)
+            meta["ted"] = {"pagina": 1, "xml": ted_xml} if ted_xml else None
 
-        # 2. Convertir a escala de grises
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if roi:
+            with trace.stage("layout"):
+                regions = detect_dte_regions(image)
+            if meta is not None:
+                meta["roi"] = {"regiones": {k: list(map(int, v)) for k, v in regions.items()} if regions else None}
+            if regions:
+                return _ocr_regions(image, regions, trace)
+            logger.info(f"Sin recuadro de folio en {image_path}; OCR de la página completa.")
 
-        # 3. Redimensionar para mejorar la resolución (opcional pero recomendado)
-        # Apuntamos a una altura de ~1000-1200px que suele funcionar bien
-        scale_factor = 1200 / gray.shape[0]
-        if scale_factor > 1:
-            gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_CUBIC)
+        # 2. Pre-procesamiento compartido con los PDFs escaneados (ver preprocess/image.py):
+        # escala según la altura del texto (también reduce fotos enormes), enderezado,
+        # recorte de márgenes y binarización adaptativa.
+        with trace.stage("preproceso"):
+            binary_img = preprocess(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), settings.OCR_PREPROCESS)
 
-        # 4. Eliminar ruido con un filtro de mediana
-        # Es muy efectivo contra el ruido "sal y pimienta" de las fotos
-        denoised = cv2.medianBlur(gray, 3)
-
-        # 5. Binarización de Otsu: La clave para un buen contraste
-        # Calcula automáticamente el umbral óptimo para separar texto y fondo.
-        _, binary_img = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # --- Fin del Pipeline ---
-
-        # 6. Configuración de Tesseract optimizada para facturas
-        # --psm 3: Totalmente automático, deja que Tesseract decida la estructura. Es el más robusto.
-        custom_config = r'-l spa --oem 3 --psm 3'
-        
-        # 7. Extraer texto usando Tesseract
-        text = pytesseract.image_to_string(binary_img, config=custom_config)
+        # 3. Extraer texto con Tesseract (-l spa --oem 3; instancia persistente si hay
+        # tesserocr, ver engines/tesseract.py). --psm 3: totalmente automático, deja que
+        # Tesseract decida la estructura; es el más robusto para facturas.
+        with trace.stage("tesseract"):
+            text = tesseract.image_to_string(binary_img, lang='spa', psm=3)
         
         return text
 
@@ -52,7 +81,7 @@ def ocr_from_image_path(image_path: str) -> str:
         logger.error(f"Error inesperado durante el OCR de la imagen: {e}", exc_info=True)
         # Fallback por si OpenCV falla por alguna razón
         try:
-            return pytesseract.image_to_string(Image.open(image_path), lang='spa')
+            return tesseract.image_to_string(Image.open(image_path), lang='spa')
         except Exception as e_fallback:
             logger.error(f"El OCR de fallback también falló: {e_fallback}")
             return ""
\ No newline at end of file
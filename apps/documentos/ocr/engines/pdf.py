@@ -1,78 +1,221 @@
 # -*- coding: utf-8 -*-
-from pdfminer.high_level import extract_text
-import pytesseract
-from pdf2image import convert_from_path
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdf2image import convert_from_path, pdfinfo_from_path
 import logging
 
+from ..config import settings
+from ..debug.trace import Trace, NULL_TRACE
+from ..detectors.tipo_pdf import TIPO_PDF_ESCANEADO
+from ..preprocess.image import preprocess
+from ..utils.memory import MemoryPeak
+from . import ted as ted_engine
+from . import tesseract
+
 # Configura un logger para ver qué motor se está usando
 logger = logging.getLogger(__name__)
 
-# Umbral de caracteres para decidir si el texto de pdfminer es útil.
-# Si es menor, probablemente es un PDF escaneado o fallido.
+# Umbral de caracteres (por página) para decidir si el texto de pdfminer es útil.
+# Si es menor, probablemente es una página escaneada o fallida.
 MIN_PDFMINER_TEXT_LENGTH = 150 
 
-def _ocr_pdf_with_tesseract(path: str) -> str | None:
+FUENTE_PDFMINER = "pdfminer"
+FUENTE_TESSERACT = "tesseract"
+
+def _pdf_page_count(path: str) -> int:
+    info = pdfinfo_from_path(path, poppler_path=settings.POPPLER_PATH)
+    return int(info.get("Pages") or 0)
+
+def _iter_pdfminer_pages(path: str):
     """
-    Función 'extra' (fallback) para leer el PDF convirtiéndolo a 
-    imágenes y usando Tesseract.
+    Entrega el texto incrustado de cada página, en orden. Usa el mismo render
+    que `pdfminer.high_level.extract_text`, pero página por página.
     """
+    rsrcmgr = PDFResourceManager()
+    output = StringIO()
+    device = TextConverter(rsrcmgr, output, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
     try:
-        # 1. Convertir el PDF (o sus páginas) a una lista de imágenes PIL
-        images = convert_from_path(path)
-        full_text = []
-        
-        # 2. Iterar por cada página/imagen y aplicar OCR
-        for img in images:
-            # Asumimos 'spa' (español) por el contexto de tu proyecto (Chile)
-            # y las facturas.
-            text_chunk = pytesseract.image_to_string(img, lang='spa') 
-            full_text.append(text_chunk)
-        
-        return "\n".join(full_text) if full_text else None
-    
-    except Exception as e:
-        logger.error(f"Error en el fallback de Tesseract-OCR para {path}: {e}")
-        return None
+        with open(path, "rb") as fp:
+            for page in PDFPage.get_pages(fp):
+                interpreter.process_page(page)
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+    finally:
+        device.close()
 
-def read_pdf_text(path: str) -> str | None:
+def _ocr_pdf_page(path: str, page: int, memory: MemoryPeak | None = None, trace: Trace = NULL_TRACE,
+                  teds: dict | None = None, dpi: int | None = None, preproceso: str | None = None) -> str:
     """
-    Lee texto de PDF usando una estrategia híbrida (Híbrido PDFMiner + Tesseract):
-    
-    1. Intenta con PDFMiner (rápido, basado en texto incrustado).
-    2. Si falla, o da muy poco texto, usa el fallback ("extra") con 
-       Tesseract OCR (lento, pero basado en la imagen visual).
+    Rasteriza una sola página (1-indexada) del PDF, la preprocesa y le aplica Tesseract.
+    La imagen se libera apenas termina el OCR, así que en memoria nunca hay
+    más páginas que workers activos. Si se entrega `teds`, antes del OCR se
+    busca el timbre en la página y, si está, queda en `teds[page]`.
+    `dpi` y `preproceso` (por defecto OCR_PDF_DPI y OCR_PREPROCESS) los elige
+    el nivel de escalamiento (ver ocr/escalation.py).
     """
-    pdfminer_text = None
+    with trace.stage("rasterizar"):
+        images = convert_from_path(
+            path,
+            dpi=dpi or settings.OCR_PDF_DPI,
+            first_page=page,
+            last_page=page,
+            grayscale=True,  # 1 byte por pixel en vez de 3; Tesseract trabaja en grises igual
+            poppler_path=settings.POPPLER_PATH,
+        )
+    if not images:
+        return ""
+    img = images[0]
     try:
-        # --- 1. Intento principal con PDFMiner ---
-        pdfminer_text = extract_text(path)
-        
-        if pdfminer_text and len(pdfminer_text.strip()) > MIN_PDFMINER_TEXT_LENGTH:
-            # El texto de PDFMiner parece bueno y suficiente
-            logger.info(f"Lectura exitosa con PDFMiner para: {path}")
-            return pdfminer_text.strip()
-            
-    except Exception as e:
-        # PDFMiner falló (ej. PDF protegido o corrupto)
-        logger.warning(f"PDFMiner falló para {path}. Error: {e}. Intentando Tesseract.")
-        pass # Caerá al fallback de Tesseract
-
-    # --- 2. Fallback ("Extra") con Tesseract-OCR ---
-    # Esto se activa si pdfminer_text es None, está vacío, o tiene muy 
-    # poco contenido (es decir, menor a MIN_PDFMINER_TEXT_LENGTH).
-    
-    if pdfminer_text:
-        logger.warning(f"PDFMiner solo extrajo {len(pdfminer_text.strip())} caracteres. "
-                       f"Cambiando a Tesseract-OCR para: {path}")
+        if memory is not None:
+            memory.sample(img.width * img.height * len(img.getbands()))
+        if teds is not None:
+            with trace.stage("ted"):
+                ted_xml = ted_engine.decode_ted(img)
+            if ted_xml:
+                teds[page] = ted_xml
+        # Misma limpieza que las fotos: escala según el texto, enderezado, recorte y umbral adaptativo
+        with trace.stage("preproceso"):
+            page_img = preprocess(img, preproceso or settings.OCR_PREPROCESS)
+        # Asumimos 'spa' (español) por el contexto del proyecto (Chile) y las facturas.
+        with trace.stage("tesseract"):
+            return tesseract.image_to_string(page_img, lang='spa')
+    finally:
+        img.close()
+
+def ocr_pdf_with_tesseract(path: str, pages: list[int], memory: MemoryPeak | None = None, trace: Trace = NULL_TRACE,
+                            teds: dict | None = None, dpi: int | None = None, preproceso: str | None = None) -> dict[int, str]:
+    """
+    Función 'extra' (fallback) que lee las páginas indicadas convirtiéndolas
+    a imágenes y usando Tesseract.
+
+    Las páginas se rasterizan de a una y se procesan en paralelo (hasta
+    OCR_PDF_WORKERS a la vez). Devuelve {número de página: texto}; las
+    páginas que fallan quedan fuera.
+    """
+    if not pages:
+        return {}
+
+    def leer(page: int) -> str | None:
+        # Un error (rasterizar, Tesseract) deja fuera solo esa página, no el resto
+        try:
+            return _ocr_pdf_page(path, page, memory, trace, teds, dpi, preproceso)
+        except Exception as e:
+            logger.error(f"Error de Tesseract-OCR en la página {page} de {path}: {e}")
+            return None
+
+    workers = max(1, min(settings.OCR_PDF_WORKERS, len(pages)))
+    if workers == 1:
+        texts = [leer(page) for page in pages]
     else:
-        logger.warning(f"PDFMiner no extrajo texto. "
-                       f"Cambiando a Tesseract-OCR para: {path}")
-
-    tesseract_text = _ocr_pdf_with_tesseract(path)
-    
-    if tesseract_text and tesseract_text.strip():
-        logger.info(f"Lectura exitosa con Fallback de Tesseract para: {path}")
-        return tesseract_text.strip()
-    
-    logger.error(f"Ambos motores (PDFMiner y Tesseract) fallaron para: {path}")
-    return None
\ No newline at end of file
+        # Cada hilo coordina pdftoppm y Tesseract (proceso externo, o tesserocr, que
+        # libera el GIL al reconocer), así que el paralelismo es real. Los hijos prefork de Celery son daemon
+        # y no pueden abrir un Pool de procesos propio.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-pdf") as pool:
+            # map() conserva el orden de las páginas
+            texts = list(pool.map(leer, pages))
+
+    logger.info(f"Tesseract procesó {len(pages)} páginas con {workers} workers para: {path}")
+    return {page: text for page, text in zip(pages, texts) if text is not None}
+
+def _ted_from_pages(path: str, pages: list[int], trace: Trace = NULL_TRACE) -> tuple[int, str] | None:
+    """
+    Rasteriza las páginas indicadas a OCR_TED_DPI solo para buscar el timbre
+    (PDF digital, o páginas que el OCR leyó a una resolución menor).
+    Devuelve (página, XML del TED) de la primera que lo tenga.
+    """
+    for page in pages:
+        try:
+            with trace.stage("rasterizar"):
+                images = convert_from_path(
+                    path, dpi=settings.OCR_TED_DPI, first_page=page, last_page=page,
+                    grayscale=True, poppler_path=settings.POPPLER_PATH,
+                )
+        except Exception as e:
+            logger.warning(f"No se pudo rasterizar la página {page} de {path} para el timbre: {e}")
+            return None
+        for img in images:
+            try:
+                with trace.stage("ted"):
+                    ted_xml = ted_engine.decode_ted(img)
+            finally:
+                img.close()
+            if ted_xml:
+                return page, ted_xml
+    return None
+
+def pdf_source(pages: list[dict]) -> str:
+    """'pdf_text' si todo vino de la capa de texto, 'pdf_ocr' si todo fue OCR, 'pdf_mixto' si hubo de ambos."""
+    fuentes = {p.get("fuente") for p in pages}
+    if fuentes == {FUENTE_TESSERACT}:
+        return "pdf_ocr"
+    if FUENTE_TESSERACT in fuentes:
+        return "pdf_mixto"
+    return "pdf_text"
+
+def find_ted(path: str, n_pages: int, revisadas=(), trace: Trace = NULL_TRACE) -> tuple[int, str] | None:
+    """
+    Timbre en la primera o la última página (donde lo imprimen los DTE),
+    salvo las `revisadas` (ya rasterizadas a OCR_TED_DPI o más).
+    """
+    if not n_pages:
+        return None
+    candidatas = [p for p in dict.fromkeys((1, n_pages)) if p not in revisadas]
+    return _ted_from_pages(path, candidatas, trace)
+
+def read_pdfminer_pages(path: str, tipo_pdf: str | None = None, memory: MemoryPeak | None = None,
+                        trace: Trace = NULL_TRACE) -> tuple[list[str], int]:
+    """
+    Texto incrustado de cada página (PDFMiner) y el total de páginas del PDF.
+    Si la sonda dijo que es escaneado no se lee la capa de texto.
+    """
+    pdfminer_pages = []
+    pdfminer_ok = tipo_pdf != TIPO_PDF_ESCANEADO
+    if pdfminer_ok:
+        try:
+            with trace.stage("pdfminer"):
+                for page_text in _iter_pdfminer_pages(path):
+                    pdfminer_pages.append(page_text)
+        except Exception as e:
+            # PDFMiner falló (ej. PDF protegido o corrupto): lo leído hasta ahí se conserva
+            pdfminer_ok = False
+            logger.warning(f"PDFMiner falló para {path} tras {len(pdfminer_pages)} páginas. "
+                           f"Error: {e}. Se usará Tesseract en el resto.")
+        if memory is not None:
+            memory.sample()
+
+    n_pages = len(pdfminer_pages)
+    if not pdfminer_ok or not n_pages:
+        try:
+            n_pages = max(n_pages, _pdf_page_count(path))
+        except Exception as e:
+            logger.error(f"No se pudo contar las páginas de {path}: {e}")
+    return pdfminer_pages, n_pages
+
+def pages_without_text(pdfminer_pages: list[str], n_pages: int) -> list[int]:
+    """Páginas (1-indexadas) sin capa de texto o con muy poco texto: las que necesitan OCR."""
+    return [
+        page for page in range(1, n_pages + 1)
+        if page > len(pdfminer_pages) or len(pdfminer_pages[page - 1].strip()) <= MIN_PDFMINER_TEXT_LENGTH
+    ]
+
+def join_pages(pdfminer_pages: list[str], ocr_texts: dict[int, str], n_pages: int) -> tuple[str, list[dict]]:
+    """Une las páginas en orden, quedándose con la mejor lectura de cada una. Devuelve (texto, meta de páginas)."""
+    parts, pages_meta = [], []
+    for page in range(1, n_pages + 1):
+        text = pdfminer_pages[page - 1] if page <= len(pdfminer_pages) else ""
+        source = FUENTE_PDFMINER
+        ocr_text = ocr_texts.get(page)
+        if ocr_text is not None and len(ocr_text.strip()) >= len(text.strip()):
+            text, source = ocr_text, FUENTE_TESSERACT
+        # pdfminer ya cierra cada página con '\f'; las de Tesseract se separan con salto de línea
+        if source == FUENTE_TESSERACT and page < n_pages:
+            text += "\n"
+        parts.append(text)
+        pages_meta.append({"pagina": page, "fuente": source, "caracteres": len(text.strip())})
+    return "".join(parts).strip(), pages_meta
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Timbre Electrónico (TED) de los DTE impresos.
+
+Todo DTE impreso o en PDF lleva al pie un código PDF417 con el TED: un XML
+firmado por el SII con RUT emisor (RE), tipo (TD), folio (F), fecha de
+emisión (FE), RUT receptor (RR) y monto total (MNT). Si se logra leer, esos
+campos son exactos y no hace falta deducirlos del texto.
+
+El decodificador es zxing-cpp (local, sin red). Es una dependencia opcional:
+sin ella `decode_ted` devuelve None y el pipeline sigue solo con el texto.
+"""
+import logging
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from importlib import metadata
+
+import numpy as np
+from lxml import etree
+from PIL import Image
+
+from ..utils.rut import format_rut
+from .xml import TIPO_DTE_MAP
+
+try:
+    import zxingcpp
+except ImportError:  # dependencia opcional
+    zxingcpp = None
+
+logger = logging.getLogger(__name__)
+
+_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, remove_blank_text=True)
+
+def disponible() -> bool:
+    return zxingcpp is not None
+
+def version() -> str:
+    if zxingcpp is None:
+        return "no"
+    try:
+        return metadata.version("zxing-cpp")
+    except metadata.PackageNotFoundError:
+        return "desconocido"
+
+def parse_ted(ted_xml: str) -> dict | None:
+    """
+    Campos del DTE desde el XML del TED, en el formato del resultado del OCR.
+    Devuelve None si el XML no es un TED o le faltan el RUT emisor o el folio.
+    """
+    try:
+        root = etree.fromstring(ted_xml.strip().encode("utf-8"), _PARSER)
+    except (etree.XMLSyntaxError, ValueError) as e:
+        logger.debug("TED ilegible: %s", e)
+        return None
+    if etree.QName(root).localname != "TED":
+        return None
+    # El TED del código de barras viene sin namespace; el de un XML del SII, con él
+    dd = {etree.QName(el).localname: (el.text or "").strip() for el in root.iterfind("{*}DD/*")}
+
+    rut_emisor = format_rut(dd.get("RE", ""))
+    folio = dd.get("F", "")
+    if not rut_emisor or not folio.isdigit():
+        return None
+    try:
+        fecha = date.fromisoformat(dd.get("FE", ""))
+    except ValueError:
+        fecha = None
+    try:
+        total = Decimal(dd["MNT"]) if dd.get("MNT") else None
+    except InvalidOperation:
+        total = None
+    return {
+        "rut_proveedor": rut_emisor,
+        "tipo_documento": TIPO_DTE_MAP.get(dd.get("TD", ""), "desconocido"),
+        "folio": folio,
+        "fecha_emision": fecha,
+        "total": total,
+        "rut_receptor": format_rut(dd.get("RR", "")),
+    }
+
+def decode_ted(image) -> str | None:
+    """
+    Busca el PDF417 del timbre en una imagen (PIL o arreglo numpy, gris o BGR)
+    y devuelve el XML del TED tal como viene en el código, o None.
+    """
+    if zxingcpp is None:
+        return None
+    if isinstance(image, np.ndarray) and image.ndim == 3:
+        image = image[:, :, ::-1]  # BGR (OpenCV) -> RGB
+    elif isinstance(image, Image.Image) and image.mode not in ("L", "RGB"):
+        image = image.convert("L")
+    try:
+        barcodes = zxingcpp.read_barcodes(image, formats=zxingcpp.BarcodeFormat.PDF417)
+    except Exception as e:
+        logger.warning("Falló la lectura del PDF417: %s", e)
+        return None
+    for barcode in barcodes:
+        text = (barcode.text or "").strip()
+        if text.startswith("<TED"):
+            return text
+    return None
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptador único para llamar a Tesseract.
+
+Con `tesserocr` instalado (binding a la C-API) se mantiene un pool de
+instancias `PyTessBaseAPI` por proceso: el modelo de idioma se carga una vez
+y se reutiliza entre páginas y documentos, en vez de lanzar un binario
+`tesseract` (y releer `spa.traineddata`) por cada llamada. tesserocr libera
+el GIL mientras reconoce, así que los hilos de `ocr_pdf_with_tesseract`
+siguen trabajando en paralelo.
+
+Sin tesserocr se usa pytesseract, con el comportamiento de siempre.
+"""
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from ..config import settings
+
+try:
+    import tesserocr
+except ImportError:  # dependencia opcional
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TESSEROCR = "tesserocr"
+BACKEND_PYTESSERACT = "pytesseract"
+
+if settings.TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+
+# Pools de instancias por (idioma, psm). Cada instancia la usa un hilo a la vez.
+_pools: dict[tuple[str, int], queue.LifoQueue] = {}
+_pools_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def backend() -> str:
+    """Motor efectivo según OCR_ENGINE ('auto', 'tesserocr' o 'pytesseract')."""
+    wanted = settings.OCR_ENGINE
+    if wanted == BACKEND_PYTESSERACT or tesserocr is None:
+        if wanted == BACKEND_TESSEROCR:
+            logger.warning("OCR_ENGINE=tesserocr pero tesserocr no está instalado; se usa pytesseract.")
+        return BACKEND_PYTESSERACT
+    return BACKEND_TESSEROCR
+
+def version() -> str:
+    if backend() == BACKEND_TESSEROCR:
+        # "tesseract 5.3.0\n leptonica-1.82.0 ..."
+        return tesserocr.tesseract_version().split()[1]
+    return str(pytesseract.get_tesseract_version())
+
+def _new_api(lang: str, psm: int):
+    kwargs = {"lang": lang, "psm": psm, "oem": int(settings.TESSERACT_OEM)}
+    if settings.TESSDATA_PREFIX:
+        kwargs["path"] = settings.TESSDATA_PREFIX
+    return tesserocr.PyTessBaseAPI(**kwargs)
+
+@contextmanager
+def _api(lang: str, psm: int):
+    """Presta una instancia del pool; si no hay libres crea otra (una por hilo activo como máximo)."""
+    key = (lang, psm)
+    with _pools_lock:
+        pool = _pools.setdefault(key, queue.LifoQueue())
+    try:
+        api = pool.get_nowait()
+    except queue.Empty:
+        api = _new_api(lang, psm)
+        logger.info("Nueva instancia de Tesseract (lang=%s, psm=%s) en %s", lang, psm, threading.current_thread().name)
+    try:
+        yield api
+    finally:
+        api.Clear()
+        pool.put(api)
+
+def image_to_string(image, lang: str = "spa", psm: int = 3, engine: str | None = None) -> str:
+    """
+    OCR de una imagen PIL o de un arreglo numpy (gris, BGR o binario).
+    Equivale a `pytesseract.image_to_string(image, config=f"-l {lang} --oem 3 --psm {psm}")`.
+    `engine` fuerza un motor (lo usa el benchmark); por defecto, `backend()`.
+    """
+    engine = engine or backend()
+    if engine == BACKEND_PYTESSERACT:
+        config = f"-l {lang} --oem {settings.TESSERACT_OEM} --psm {psm}"
+        return pytesseract.image_to_string(image, config=config)
+
+    if isinstance(image, np.ndarray):
+        if image.ndim == 3:
+            image = image[:, :, ::-1]  # BGR (OpenCV) -> RGB
+        image = Image.fromarray(image)
+    with _api(lang, psm) as api:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+def close_all():
+    """Libera las instancias cargadas (p. ej. al apagar el worker o entre corridas del benchmark)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().End()
+            except queue.Empty:
+                break
@@ -1,56 +1,133 @@
 # apps/documentos/ocr/engines/xml.py
 
 from lxml import etree
+import copy
+import hashlib
 import logging
 from decimal import Decimal
 
 log = logging.getLogger(__name__)
 
+# El namespace es crucial para encontrar los elementos en XML del SII
+SII_NS = "http://www.sii.cl/SiiDte"
+NS = {'sii': SII_NS}
+
+# Mapeo de TipoDTE a nuestro tipo_documento
+TIPO_DTE_MAP = {
+    '33': 'factura_afecta',
+    '34': 'factura_exenta',
+    '39': 'boleta_afecta',
+    '41': 'boleta_exenta',
+    '61': 'nota_credito',
+    # Añade más mapeos según necesites
+}
+
+def _ted_sin_namespace(ted) -> str:
+    """
+    El <TED> del DTE tal como va en el PDF417 impreso: sin el namespace del
+    sobre (SiiDte), que hereda al serializarse desde el documento.
+    """
+    ted = copy.deepcopy(ted)
+    for el in ted.iter(tag=etree.Element):
+        el.tag = etree.QName(el).localname
+    etree.cleanup_namespaces(ted)
+    return etree.tostring(ted, encoding="unicode")
+
+def _datos_dte(dte) -> dict:
+    """Datos principales de un elemento <DTE>, en el formato del resultado del OCR."""
+    tipo_dte_code = dte.findtext('.//sii:TipoDTE', namespaces=NS)
+    documento = dte.find('sii:Documento', namespaces=NS)
+    data = {
+        "tipo_documento": TIPO_DTE_MAP.get(tipo_dte_code, 'desconocido'),
+        "folio": dte.findtext('.//sii:Folio', namespaces=NS),
+        "fecha_emision": dte.findtext('.//sii:FchEmis', namespaces=NS),
+        "rut_proveedor": dte.findtext('.//sii:RUTEmisor', namespaces=NS),
+        # Las boletas (EnvioBOLETA) usan RznSocEmisor
+        "proveedor_nombre": dte.findtext('.//sii:RznSoc', namespaces=NS) or dte.findtext('.//sii:RznSocEmisor', namespaces=NS),
+        "monto_neto": Decimal(dte.findtext('.//sii:MntNeto', default='0', namespaces=NS)),
+        "monto_exento": Decimal(dte.findtext('.//sii:MntExe', namespaces=NS) or dte.findtext('.//sii:MntExento', default='0', namespaces=NS)),
+        "iva": Decimal(dte.findtext('.//sii:IVA', default='0', namespaces=NS)),
+        "total": Decimal(dte.findtext('.//sii:MntTotal', default='0', namespaces=NS)),
+        "iva_tasa": None, # El XML no siempre tiene la tasa explícita, se puede calcular
+        "fuente_texto": "xml",
+        # El XML original queda en el archivo; no se re-serializa como texto
+        "raw_text": "",
+        "ted": "",
+        # Los campos vienen tal cual del DTE
+        "confianza": dict.fromkeys(("tipo_documento", "folio", "fecha_emision", "rut_proveedor", "total"), 1.0),
+    }
+    ted = dte.find('.//sii:TED', namespaces=NS)
+    if ted is not None:
+        data["ted"] = _ted_sin_namespace(ted)
+    tasa = dte.findtext('.//sii:TasaIVA', namespaces=NS)
+    if tasa:
+        data["iva_tasa"] = Decimal(tasa)
+    # Calcular tasa de IVA si es posible
+    elif data["monto_neto"] and data["iva"]:
+        try:
+            tasa = (data["iva"] / data["monto_neto"]) * 100
+            data["iva_tasa"] = Decimal(f"{tasa:.2f}")
+        except Exception:
+            pass # No se pudo calcular
+
+    # Referencia al DTE dentro del archivo (un EnvioDTE trae muchos) y hash de su
+    # forma canónica: identifica al DTE, no al sobre en que vino. C14N exclusiva: la
+    # inclusiva de un subárbol depende de las declaraciones de namespace de los
+    # ancestros (libxml2 agrega xmlns="" a los hijos) y el mismo DTE suelto daría otro hash.
+    data["xml"] = {
+        "id": documento.get("ID") if documento is not None else None,
+        "sha256": hashlib.sha256(etree.tostring(dte, method="c14n", exclusive=True)).hexdigest(),
+    }
+    return data
+
+def iter_dtes(file_path):
+    """
+    Recorre un XML del SII (un DTE suelto, EnvioDTE o EnvioBOLETA) en streaming
+    y entrega los datos de cada <DTE>, en orden, con `xml["indice"]`.
+
+    Usa iterparse y libera cada DTE (y sus hermanos ya leídos) apenas se
+    procesa, así un sobre con cientos de documentos no se carga entero en memoria.
+    """
+    context = etree.iterparse(
+        file_path, events=("end",), tag=(f"{{{SII_NS}}}DTE", "DTE"),
+        resolve_entities=False, no_network=True, huge_tree=True,
+    )
+    indice = 0
+    for _event, dte in context:
+        data = _datos_dte(dte)
+        data["xml"]["indice"] = indice
+        indice += 1
+        # Libera el DTE y los nodos anteriores que el parser mantiene colgando de la raíz
+        dte.clear(keep_tail=True)
+        while dte.getprevious() is not None:
+            del dte.getparent()[0]
+        yield data
+    del context
+
+def contiene_dte(source) -> bool:
+    """
+    True si el XML (ruta o archivo abierto) trae al menos un <DTE>. Distingue
+    los DTE de otros XML del SII que llegan por correo (acuses, RespuestaDTE).
+    Solo lee hasta el primer DTE.
+    """
+    try:
+        for _event, _dte in etree.iterparse(
+            source, events=("end",), tag=(f"{{{SII_NS}}}DTE", "DTE"),
+            resolve_entities=False, no_network=True,
+        ):
+            return True
+    except etree.XMLSyntaxError as e:
+        log.warning("XML inválido: %s", e)
+    return False
+
 def extract_data_from_xml(file_path):
     """
     Parsea un XML de DTE y extrae los datos principales en un formato
-    consistente con el resultado del OCR.
+    consistente con el resultado del OCR. Si el archivo es un sobre con
+    varios DTE devuelve el primero (ver `iter_dtes` para recorrerlos todos).
     """
     try:
-        tree = etree.parse(file_path)
-        
-        # El namespace es crucial para encontrar los elementos en XML del SII
-        ns = {'sii': 'http://www.sii.cl/SiiDte'}
-
-        # Mapeo de TipoDTE a nuestro tipo_documento
-        tipo_dte_map = {
-            '33': 'factura_afecta',
-            '34': 'factura_exenta',
-            '61': 'nota_credito',
-            # Añade más mapeos según necesites
-        }
-        tipo_dte_code = tree.findtext('.//sii:TipoDTE', namespaces=ns)
-        
-        data = {
-            "tipo_documento": tipo_dte_map.get(tipo_dte_code, 'desconocido'),
-            "folio": tree.findtext('.//sii:Folio', namespaces=ns),
-            "fecha_emision": tree.findtext('.//sii:FchEmis', namespaces=ns),
-            "rut_proveedor": tree.findtext('.//sii:RUTEmisor', namespaces=ns),
-            "proveedor_nombre": tree.findtext('.//sii:RznSoc', namespaces=ns),
-            "monto_neto": Decimal(tree.findtext('.//sii:MntNeto', default='0', namespaces=ns)),
-            "monto_exento": Decimal(tree.findtext('.//sii:MntExento', default='0', namespaces=ns)),
-            "iva": Decimal(tree.findtext('.//sii:IVA', default='0', namespaces=ns)),
-            "total": Decimal(tree.findtext('.//sii:MntTotal', default='0', namespaces=ns)),
-            "iva_tasa": None, # El XML no siempre tiene la tasa explícita, se puede calcular
-            "fuente_texto": "xml",
-            "raw_text": etree.tostring(tree, pretty_print=True).decode('utf-8'),
-        }
-
-        # Calcular tasa de IVA si es posible
-        if data["monto_neto"] and data["iva"]:
-            try:
-                tasa = (data["iva"] / data["monto_neto"]) * 100
-                data["iva_tasa"] = Decimal(f"{tasa:.2f}")
-            except Exception:
-                pass # No se pudo calcular
-
-        return data
-
+        return next(iter_dtes(file_path), None)
     except Exception as e:
         log.error("Error crítico al parsear el archivo XML %s: %s", file_path, e)
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción por niveles: primero el motor barato y el caro solo si hace falta.
+
+Después de cada nivel se corre el parser sobre el texto obtenido y se para
+apenas están todos los REQUIRED_FIELDS con confianza >= OCR_CONFIANZA_MIN.
+Como la confianza del total solo pasa el umbral si neto + exento + IVA lo
+suman (o si viene del timbre), eso exige también que los montos cuadren.
+
+PDF:
+  1. pdfminer   capa de texto (se omite si la sonda dijo que es escaneado).
+  2. ted        timbre PDF417 de la primera/última página; sus campos se
+                usan en este y en los niveles siguientes.
+  3. ocr_bajo   Tesseract a OCR_PDF_DPI_BAJO con OCR_PREPROCESS_BAJO.
+  4. ocr_alto   Tesseract a OCR_PDF_DPI con OCR_PREPROCESS.
+  El OCR solo se aplica a las páginas sin capa de texto suficiente: si todas
+  la tienen, leerlas con Tesseract no mejora lo que ya dio pdfminer.
+
+Imagen (el timbre se busca en la imagen antes de leerla):
+  ocr_bajo = OCR por zonas (OCR_ROI) y ocr_alto = página completa.
+
+Los XML no pasan por aquí: su nivel es "xml" (tasks/extract.py).
+Se devuelve el mejor resultado de los niveles corridos; `meta["niveles"]`
+registra cada uno y `meta["ocr_nivel"]` el último al que se llegó.
+"""
+import logging
+from typing import Callable
+
+from .config import settings
+from .debug.trace import Trace, NULL_TRACE
+from .engines import pdf as pdf_engine
+from .engines import ted as ted_engine
+from .engines.image import ocr_from_image_path
+from .schema import OCRResult, REQUIRED_FIELDS
+from .utils.memory import MemoryPeak
+
+logger = logging.getLogger(__name__)
+
+NIVEL_XML = "xml"
+NIVEL_PDFMINER = "pdfminer"
+NIVEL_TED = "ted"
+NIVEL_OCR_BAJO = "ocr_bajo"
+NIVEL_OCR_ALTO = "ocr_alto"
+
+# parse_text(texto, ted=...) sin el trace, que lo agrega cada llamador
+Parser = Callable[[str, dict | None], OCRResult]
+
+def suficiente(result: OCRResult) -> bool:
+    """Todos los campos obligatorios, cada uno con confianza suficiente."""
+    return not result.missing_fields() and all(
+        result.confianza.get(f, 0.0) >= settings.OCR_CONFIANZA_MIN for f in REQUIRED_FIELDS
+    )
+
+def _puntaje(result: OCRResult) -> float:
+    return sum(result.confianza.get(f, 0.0) for f in REQUIRED_FIELDS)
+
+def _ted_de_meta(meta: dict) -> tuple[str, dict | None]:
+    """
+    Saca de `meta["ted"]` el XML del timbre que dejó el motor (no se guarda dos
+    veces en ocr_json) y lo interpreta. Deja en meta la página y si era válido.
+    """
+    info = meta.get("ted")
+    if not info:
+        return "", None
+    ted_xml = info.pop("xml", "")
+    ted = ted_engine.parse_ted(ted_xml) if ted_xml else None
+    info["valido"] = ted is not None
+    if ted:
+        info["rut_receptor"] = ted["rut_receptor"]
+    return ted_xml, ted
+
+class _Niveles:
+    """Corre el parser tras cada nivel y guarda el mejor resultado."""
+
+    def __init__(self, parse: Parser, meta: dict):
+        self.parse = parse
+        self.meta = meta
+        self.registro = meta["niveles"] = []
+        self.ted_xml, self.ted = "", None
+        self.mejor = None  # (result, texto, fuente, páginas)
+
+    def probar(self, nivel: str, texto: str, fuente: str, paginas: list | None = None) -> bool:
+        result = self.parse(texto, self.ted)
+        ok = suficiente(result)
+        self.registro.append({
+            "nivel": nivel,
+            "faltantes": [f for f in REQUIRED_FIELDS if result.confianza.get(f, 0.0) < settings.OCR_CONFIANZA_MIN],
+        })
+        self.meta["ocr_nivel"] = nivel
+        # A igual puntaje gana el nivel más alto (lectura más cuidadosa)
+        if self.mejor is None or _puntaje(result) >= _puntaje(self.mejor[0]):
+            self.mejor = (result, texto, fuente, paginas)
+        return ok
+
+    def resultado(self) -> tuple[OCRResult, str]:
+        result, texto, fuente, paginas = self.mejor
+        if paginas is not None:
+            self.meta["paginas"] = paginas
+        result.fuente_texto = fuente
+        result.ted = self.ted_xml if self.ted else ""
+        return result, texto
+
+def extract_pdf(path: str, meta: dict, parse: Parser, tipo_pdf: str | None = None,
+                trace: Trace = NULL_TRACE) -> tuple[OCRResult, str]:
+    """Niveles de un PDF (ver el docstring del módulo). Devuelve (resultado, texto crudo)."""
+    memory = MemoryPeak()
+    niveles = _Niveles(parse, meta)
+    try:
+        pdfminer_pages, n_pages = pdf_engine.read_pdfminer_pages(path, tipo_pdf, memory, trace)
+        sin_texto = pdf_engine.pages_without_text(pdfminer_pages, n_pages)
+
+        # --- 1. Capa de texto ---
+        texto_pdf, paginas_pdf = pdf_engine.join_pages(pdfminer_pages, {}, n_pages)
+        if texto_pdf and niveles.probar(NIVEL_PDFMINER, texto_pdf, "pdf_text", paginas_pdf):
+            return niveles.resultado()
+
+        # --- 2. Timbre electrónico ---
+        if settings.OCR_TED and ted_engine.disponible():
+            encontrado = pdf_engine.find_ted(path, n_pages, trace=trace)
+            meta["ted"] = {"pagina": encontrado[0], "xml": encontrado[1]} if encontrado else None
+            niveles.ted_xml, niveles.ted = _ted_de_meta(meta)
+            if niveles.ted and texto_pdf and niveles.probar(NIVEL_TED, texto_pdf, "pdf_text", paginas_pdf):
+                return niveles.resultado()
+
+        # --- 3 y 4. OCR de las páginas sin texto, de menor a mayor costo ---
+        if not sin_texto:
+            if niveles.mejor is None:
+                niveles.probar(NIVEL_PDFMINER, texto_pdf, "pdf_text", paginas_pdf)
+            return niveles.resultado()
+        logger.info(f"{len(sin_texto)} de {n_pages} páginas sin texto suficiente en {path}; OCR por niveles.")
+        for nivel, dpi, preproceso in (
+            (NIVEL_OCR_BAJO, settings.OCR_PDF_DPI_BAJO, settings.OCR_PREPROCESS_BAJO),
+            (NIVEL_OCR_ALTO, settings.OCR_PDF_DPI, settings.OCR_PREPROCESS),
+        ):
+            ocr_texts = pdf_engine.ocr_pdf_with_tesseract(path, sin_texto, memory, trace, dpi=dpi, preproceso=preproceso)
+            texto, paginas = pdf_engine.join_pages(pdfminer_pages, ocr_texts, n_pages)
+            if niveles.probar(nivel, texto, pdf_engine.pdf_source(paginas), paginas):
+                break
+        return niveles.resultado()
+    finally:
+        meta["memoria"] = memory.as_dict()
+
+def extract_image(path: str, meta: dict, parse: Parser, trace: Trace = NULL_TRACE) -> tuple[OCRResult, str]:
+    """Niveles de una imagen: zonas del formato SII y, si no alcanza, página completa."""
+    niveles = _Niveles(parse, meta)
+    texto = ocr_from_image_path(path, meta=meta, roi=settings.OCR_ROI, trace=trace) or ""
+    niveles.ted_xml, niveles.ted = _ted_de_meta(meta)
+
+    roi_meta = meta.get("roi")
+    por_zonas = bool(roi_meta and roi_meta.get("regiones"))
+    if niveles.probar(NIVEL_OCR_BAJO if por_zonas else NIVEL_OCR_ALTO, texto, "image_ocr") or not por_zonas:
+        return niveles.resultado()
+
+    # OCR por zonas insuficiente: se repite con la página completa
+    roi_meta["faltantes"] = niveles.registro[-1]["faltantes"]
+    with trace.stage("texto_pagina_completa"):
+        texto = ocr_from_image_path(path, meta=meta, roi=False, trace=trace) or ""
+    roi_meta["pagina_completa"] = True
+    niveles.probar(NIVEL_OCR_ALTO, texto, "image_ocr")
+    return niveles.resultado()
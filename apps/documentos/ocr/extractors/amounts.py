@@ -1,38 +1,55 @@
 # apps/documentos/ocr/extractors/amounts.py
 import re
+from bisect import bisect_right
 from decimal import Decimal
 from ..utils import patterns
 from ..utils.numbers import clean_and_parse_amount, extract_iva_rate
+from ..utils.text_index import TextIndex
+from ..debug.trace import NULL_TRACE
 
-def extract_amounts(text: str) -> dict:
+def extract_amounts(text, trace=NULL_TRACE) -> dict:
     """
     Extrae los montos de forma contextual, funcionando para múltiples diseños de factura.
     Utiliza una heurística basada en la magnitud de los montos.
+    `text` puede ser un str o el TextIndex compartido de parse_text.
+    Con una traza activa registra en "montos" los candidatos y cada asignación.
     """
+    idx = TextIndex.of(text)
     results = {
         'monto_neto': None, 'monto_exento': None, 'iva': None,
         'total': None, 'iva_tasa': None
     }
 
-    # 1. Aislar la sección de totales del documento y buscar todos los montos.
-    summary_lines = text.split('\n')[-20:]
-    summary_text = '\n'.join(summary_lines)
+    # 1. Aislar la sección de totales (últimas 20 líneas) y buscar todos los montos.
+    summary_lines = idx.nl_lines[-20:]
+    summary_start = idx.nl_line_starts[-len(summary_lines)]
     
+    amount_matches = idx.scan(patterns.AMOUNT, summary_start)
     all_amounts = [
-        amount for match in patterns.AMOUNT.finditer(summary_text)
+        amount for match in amount_matches
         if (amount := clean_and_parse_amount(match.group(0)))
     ]
     
     # Ordenar montos únicos de mayor a menor.
     unique_amounts = sorted(list(set(all_amounts)), reverse=True)
+    # Líneas de los montos a partir de los aciertos ya encontrados (sin volver a buscar)
+    amount_lines = sorted({bisect_right(idx.nl_line_starts, m.start()) - 1 for m in amount_matches})
+    trace.record(
+        "montos",
+        candidatos=unique_amounts,
+        lineas=[idx.nl_lines[i].strip() for i in amount_lines],
+    )
     
     if not unique_amounts:
         return results
 
     # 2. Buscar la presencia de etiquetas para guiar la asignación.
-    has_neto_label = bool(patterns.ANCHOR_NETO.search(summary_text))
-    has_iva_label = bool(patterns.ANCHOR_IVA.search(summary_text))
-    has_total_label = bool(patterns.ANCHOR_TOTAL.search(summary_text))
+    #    Un solo recorrido de la sección con todas las anclas (patterns.ANCHORS).
+    labels = {m.lastgroup for m in idx.scan(patterns.ANCHORS, summary_start)}
+    has_neto_label = "neto" in labels
+    has_iva_label = "iva" in labels
+    has_total_label = "total" in labels
+    trace.record("montos", etiquetas={"neto": has_neto_label, "iva": has_iva_label, "total": has_total_label})
 
     # 3. Asignar montos por magnitud (Total > Neto > IVA).
     # Asignar Total (casi siempre el más grande).
@@ -48,12 +65,13 @@ def extract_amounts(text: str) -> dict:
         results['iva'] = unique_amounts.pop(0)
 
     # 4. Extraer la tasa de IVA de cualquier parte del documento.
-    results['iva_tasa'] = extract_iva_rate(text)
+    results['iva_tasa'] = extract_iva_rate(idx.text)
 
     # 5. Reconciliación final para asegurar consistencia (esta parte es clave).
     neto, iva, total = results.get('monto_neto'), results.get('iva'), results.get('total')
     
     # Si después de la asignación, la suma no cuadra, podemos intentar corregirla.
+    trace.record("montos", por_magnitud={"total": total, "monto_neto": neto, "iva": iva})
     if neto and iva and total and abs((neto + iva) - total) > 2: # Tolerancia de 2
          # La heurística pudo fallar. Si tenemos 3 montos, los reasignamos forzando la suma.
          amounts = sorted([neto, iva, total], reverse=True)
@@ -61,15 +79,19 @@ def extract_amounts(text: str) -> dict:
               results['total'] = amounts[0]
               results['monto_neto'] = amounts[1]
               results['iva'] = amounts[2]
+              trace.record("montos", correccion="reasignados por suma neto + iva = total")
     
     # Calcular valores faltantes si es posible
     elif neto and iva and not total:
         results['total'] = neto + iva
+        trace.record("montos", correccion="total = neto + iva")
     elif neto and total and not iva:
         if total > neto:
             results['iva'] = total - neto
+            trace.record("montos", correccion="iva = total - neto")
     elif total and iva and not neto:
         if total > iva:
             results['monto_neto'] = total - iva
+            trace.record("montos", correccion="neto = total - iva")
             
     return results
\ No newline at end of file
@@ -1,34 +1,48 @@
 # apps/documentos/ocr/extractors/proveedor.py
-import re
 from ..utils.rut import is_valid, clean_rut, format_rut
+from ..utils.patterns import RUT_PATTERNS, COMPANY_KEYWORDS
+from ..utils.text_index import TextIndex
 
-RUT_PATTERNS = [
-    re.compile(r'(?:R\.?U\.?T\.?|RUT|ROL)[\s:.]*(\d{1,2}\.\d{3}\.\d{3}-\s*[\dkK])'),
-    re.compile(r'(\d{1,2}\.\d{3}\.\d{3}-\s*[\dkK])')
-]
-RECEPTOR_KEYWORDS = re.compile(r'SEÑOR\(ES\)|RECEPTOR|CLIENTE', re.I)
-COMPANY_KEYWORDS = re.compile(r'\b(SpA|Spa|LTDA|Ltda|EIRL|S\.A\.)\b', re.I)
+def _ruts(idx: TextIndex, validos: dict, start: int = 0, end: int | None = None) -> list[str]:
+    """
+    RUTs válidos de la sección, en el orden de RUT_PATTERNS (como el recorrido
+    original). `validos` memoriza la validación/formato de cada candidato.
+    """
+    ruts = []
+    for p in RUT_PATTERNS:
+        for m in idx.matches(p, start, end):
+            raw = m.group(1)
+            if raw not in validos:
+                validos[raw] = format_rut(raw) if is_valid(raw) else None
+            if validos[raw] is not None:
+                ruts.append(validos[raw])
+    return ruts
 
-def extract_emisor_receptor(texto_general: str) -> tuple[dict, dict]:
+def extract_emisor_receptor(texto_general) -> tuple[dict, dict]:
+    """`texto_general` puede ser un str o el TextIndex compartido de parse_text."""
+    idx = TextIndex.of(texto_general)
     emisor, receptor = {}, {}
-    lines = texto_general.split('\n')
+    validos = {}
+    lines = idx.nl_lines
     
     # 1. Dividir el documento en sección de emisor y receptor
-    receptor_section_start = -1
-    for i, line in enumerate(lines):
-        if RECEPTOR_KEYWORDS.search(line):
-            receptor_section_start = i
-            break
-            
-    emisor_text = "\n".join(lines[:receptor_section_start]) if receptor_section_start != -1 else texto_general
-    receptor_text = "\n".join(lines[receptor_section_start:]) if receptor_section_start != -1 else ""
+    receptor_section_start = idx.first_nl_line("receptor")
+    if receptor_section_start != -1:
+        # Offsets de "\n".join(lines[:i]) y "\n".join(lines[i:]) dentro del texto
+        receptor_offset = idx.nl_line_starts[receptor_section_start]
+        emisor_end = max(0, receptor_offset - 1)
+        emisor_lines = lines[:receptor_section_start]
+    else:
+        receptor_offset = None
+        emisor_end = None
+        emisor_lines = lines
 
     # 2. Buscar el RUT y nombre del EMISOR solo en su sección
-    emisor_ruts = [format_rut(m.group(1)) for p in RUT_PATTERNS for m in p.finditer(emisor_text) if is_valid(m.group(1))]
+    emisor_ruts = _ruts(idx, validos, 0, emisor_end)
     if emisor_ruts:
         emisor['rut'] = emisor_ruts[0]
 
-    for line in emisor_text.split('\n')[:7]: # Buscar en las primeras 7 líneas de la sección del emisor
+    for line in emisor_lines[:7]: # Buscar en las primeras 7 líneas de la sección del emisor
         line = line.strip()
         if len(line) > 5 and not is_valid(line) and "GIRO" not in line.upper() and "DIRECCION" not in line.upper():
              if COMPANY_KEYWORDS.search(line) or (line.isupper() and len(line.split()) > 1 and not any(char.isdigit() for char in line)):
@@ -36,17 +50,17 @@ def extract_emisor_receptor(texto_general: str) -> tuple[dict, dict]:
                 break
     
     # 3. Buscar el RUT del RECEPTOR solo en su sección
-    if receptor_text:
-        receptor_ruts = [format_rut(m.group(1)) for p in RUT_PATTERNS for m in p.finditer(receptor_text) if is_valid(m.group(1))]
+    if receptor_offset is not None:
+        receptor_ruts = _ruts(idx, validos, receptor_offset)
         if receptor_ruts:
             receptor['rut'] = receptor_ruts[0]
             
     # 4. Fallback por si la división falló o el RUT estaba en un lugar inesperado
     if not emisor.get('rut'):
-        all_ruts_on_doc = {format_rut(m.group(1)) for p in RUT_PATTERNS for m in p.finditer(texto_general) if is_valid(m.group(1))}
+        all_ruts_on_doc = set(_ruts(idx, validos))
         receptor_rut_set = {receptor.get('rut')}
         possible_emisor_ruts = all_ruts_on_doc - receptor_rut_set
         if possible_emisor_ruts:
             emisor['rut'] = possible_emisor_ruts.pop()
             
-    return emisor, receptor
\ No newline at end of file
+    return emisor, receptor
@@ -0,0 +1,94 @@
+# apps/documentos/ocr/file_cache.py
+"""
+Copia local de los archivos de Documento para los workers.
+
+Los motores (pdfminer, poppler, Tesseract, lxml) necesitan una ruta en disco.
+Con el storage local (FileSystemStorage) es la del propio archivo; con uno
+remoto (S3/MinIO) el archivo se descarga una vez a OCR_FILE_CACHE_DIR,
+nombrado por su SHA-256, y las extracciones siguientes del mismo contenido
+(reintentos, re-extracción, el mismo archivo en otra empresa) lo reutilizan.
+
+El directorio se comparte entre todos los procesos del host: las descargas
+se escriben a un temporal y se renombran (atómico), y se desaloja por tamaño
+con LRU por mtime (utils/disk_lru), igual que el caché de resultados.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from .config import settings
+from .utils import disk_lru, object_storage
+
+log = logging.getLogger(__name__)
+
+LECTURA = 1024 * 1024
+
+class _Hasheando:
+    """Archivo de escritura que va calculando el SHA-256 de lo escrito."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.sha = hashlib.sha256()
+
+    def write(self, data):
+        self.sha.update(data)
+        return self.fh.write(data)
+
+def _entry_path(sha256: str, ext: str) -> str:
+    # La extensión se conserva: los motores eligen el lector por ella
+    return os.path.join(settings.OCR_FILE_CACHE_DIR, sha256[:2], f"{sha256}{ext}")
+
+def _descargar(field_file, destino):
+    storage = field_file.storage
+    if object_storage.es_s3(storage):
+        # S3Storage: streaming directo del objeto (storage.open lo bajaría entero a un spool)
+        object_storage.cliente(storage).download_fileobj(
+            storage.bucket_name, object_storage.clave(storage, field_file.name), destino
+        )
+        return
+    with storage.open(field_file.name, "rb") as fh:
+        while data := fh.read(LECTURA):
+            destino.write(data)
+
+def local_path(field_file, sha256: str = "") -> str:
+    """
+    Ruta local del archivo de un FileField. Si el storage no tiene rutas
+    locales, la del caché (descargándolo si no está). `sha256` es el
+    Documento.hash_sha256; si no coincide con lo descargado se avisa y la
+    copia queda bajo el hash real.
+    """
+    try:
+        return field_file.path
+    except NotImplementedError:
+        pass
+
+    ext = os.path.splitext(field_file.name)[1].lower()
+    if sha256:
+        path = _entry_path(sha256, ext)
+        if os.path.exists(path):
+            disk_lru.touch(path)
+            return path
+
+    os.makedirs(settings.OCR_FILE_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.OCR_FILE_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            destino = _Hasheando(fh)
+            _descargar(field_file, destino)
+        real = destino.sha.hexdigest()
+        if sha256 and real != sha256:
+            log.warning("El archivo %s no coincide con su hash registrado (%s != %s).", field_file.name, real, sha256)
+        path = _entry_path(real, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    tamano = os.path.getsize(path)
+    log.info("Archivo %s descargado al caché local (%s bytes).", field_file.name, tamano)
+    disk_lru.record_write(settings.OCR_FILE_CACHE_DIR, tamano, settings.OCR_FILE_CACHE_MAX_MB * 1024 * 1024)
+    return path
@@ -1,77 +1,101 @@
 # apps/documentos/ocr/parsing.py
 
+import logging
 from pathlib import Path
-from pprint import pprint # Usaremos pprint para que se vea más ordenado
 from .schema import OCRResult
-# --- Usando los nombres correctos de TUS archivos ---
-from .engines.pdf import read_pdf_text
-from .engines.image import ocr_from_image_path
-# ---------------------------------------------------
 from .utils.text_norm import preprocess_text
+from .utils.text_index import TextIndex
 from .detectors.tipo_doc import detect_tipo_dte
+from .detectors.tipo_pdf import probe_pdf_kind
 from .extractors.folio_fecha import extract_folio, extract_fecha
 from .extractors.proveedor import extract_emisor_receptor
 from .extractors.amounts import extract_amounts
-from .postprocess.reconcile import reconcile_amounts
+from .postprocess.reconcile import reconcile_amounts, amounts_balance
+from . import escalation
+from .debug.trace import Trace, NULL_TRACE
+from . import cache
+from .config import PARSER_VERSION, settings
 
-def get_text_from_file(path: str) -> tuple[str, str]:
+logger = logging.getLogger(__name__)
+
+# Confianza de los campos que el texto entrega sin puntaje propio (tipo, RUT validado
+# por su dígito verificador) y del total según cuadre o no con neto + exento + IVA
+CONF_TEXTO = 0.8
+CONF_MONTOS_CUADRAN = 0.9
+CONF_MONTOS_SIN_CUADRE = 0.5
+
+def parse_text(raw_text: str, trace: Trace = NULL_TRACE, ted: dict | None = None) -> OCRResult:
     """
-    Lee el texto de un PDF o una imagen y devuelve el texto y la fuente.
+    Procesa el texto plano extraído para obtener los datos estructurados.
+    Con una traza activa (OCR_TRACE) registra tiempo y resultado de cada etapa.
+
+    `ted` son los campos del timbre electrónico (ver engines/ted.py): si viene,
+    tipo, folio, fecha, RUT emisor y total se toman de ahí y no se buscan en el
+    texto. La razón social y el desglose de montos siguen saliendo del texto.
     """
-    fpath = Path(path)
-    raw_text = ""
+    ted = ted or {}
+    # Confianza por campo: 1.0 si viene del timbre; si no, la que informa cada extractor
+    confianza = {}
+    with trace.stage("normalizacion"):
+        text = preprocess_text(raw_text or "")
+        # Índice compartido: líneas, anclas y candidatos se calculan una sola vez
+        idx = TextIndex(text)
+    trace.record("texto", caracteres=len(raw_text or ""), lineas=text.count("\n") + 1 if text else 0)
 
-    if fpath.suffix.lower() == ".pdf":
-        raw_text = read_pdf_text(path)
-        return raw_text or "", "pdf_text"
+    if ted.get("tipo_documento", "desconocido") != "desconocido":
+        tipo_doc = ted["tipo_documento"]
+        confianza["tipo_documento"] = 1.0
+        trace.record("tipo_documento", valor=tipo_doc, fuente="ted")
     else:
-        raw_text = ocr_from_image_path(path)
-        return raw_text or "", "image_ocr"
+        with trace.stage("tipo_documento"):
+            tipo_doc_tuple = detect_tipo_dte(idx)
+            tipo_doc = tipo_doc_tuple[0] if isinstance(tipo_doc_tuple, tuple) else tipo_doc_tuple
+        confianza["tipo_documento"] = 0.0 if tipo_doc == "desconocido" else CONF_TEXTO
+        trace.record("tipo_documento", valor=tipo_doc)
 
+    if ted.get("folio"):
+        folio = ted["folio"]
+        confianza["folio"] = 1.0
+        trace.record("folio", valor=folio, fuente="ted")
+    else:
+        with trace.stage("folio"):
+            folio, folio_conf = extract_folio(idx)
+        confianza["folio"] = folio_conf if folio else 0.0
+        trace.record("folio", valor=folio, conf=folio_conf)
 
-def parse_text(raw_text: str) -> OCRResult:
-    """
-    Procesa el texto plano extraído para obtener los datos estructurados.
-    """
-    print("\n" + "="*50)
-    print("INICIANDO MODO DE DIAGNÓSTICO OCR")
-    print("="*50)
-    
-    # Imprime una parte del texto crudo para verificar que se leyó bien
-    print("\n--- 1. TEXTO CRUDO EXTRAÍDO DEL DOCUMENTO ---")
-    # Usamos repr() para ver caracteres invisibles como saltos de línea (\n)
-    print(repr(raw_text or ""))
-    print("-"*(50))
+    if ted.get("fecha_emision"):
+        fecha = ted["fecha_emision"]
+        confianza["fecha_emision"] = 1.0
+        trace.record("fecha", valor=fecha, fuente="ted")
+    else:
+        with trace.stage("fecha"):
+            fecha, fecha_conf = extract_fecha(idx)
+        confianza["fecha_emision"] = fecha_conf if fecha else 0.0
+        trace.record("fecha", valor=fecha, conf=fecha_conf)
 
-    text = preprocess_text(raw_text or "")
-    
-    print("\n--- 2. EXTRACCIONES INDIVIDUALES ---")
-    tipo_doc_tuple = detect_tipo_dte(text)
-    tipo_doc = tipo_doc_tuple[0] if isinstance(tipo_doc_tuple, tuple) else tipo_doc_tuple
-    print(f"Tipo DTE detectado: {tipo_doc}")
+    with trace.stage("proveedor"):
+        emisor, receptor = extract_emisor_receptor(idx)
+        rut_proveedor = ted.get("rut_proveedor") or emisor.get('rut', '')
+        nombre_proveedor = emisor.get('razon_social', '')
+    confianza["rut_proveedor"] = 1.0 if ted.get("rut_proveedor") else CONF_TEXTO if rut_proveedor else 0.0
+    trace.record("proveedor", emisor=emisor, receptor=receptor)
 
-    folio, _ = extract_folio(text)
-    print(f"Folio extraído: {folio}")
+    with trace.stage("montos"):
+        extracted_montos = extract_amounts(idx, trace=trace)
+        if ted.get("total") is not None:
+            # El total del timbre manda; la reconciliación completa lo que falte con él
+            extracted_montos["total"] = ted["total"]
+    trace.record("montos", extraidos=extracted_montos)
 
-    fecha, _ = extract_fecha(text)
-    print(f"Fecha extraída: {fecha}")
-    
-    emisor, _ = extract_emisor_receptor(text)
-    rut_proveedor = emisor.get('rut', '')
-    nombre_proveedor = emisor.get('razon_social', '')
-    print(f"Proveedor extraído: RUT='{rut_proveedor}', Nombre='{nombre_proveedor}'")
-    print("-"*(50))
-
-    # --- ¡EL PUNTO MÁS IMPORTANTE! ---
-    print("\n--- 3. EXTRACCIÓN DE MONTOS (ANTES DE CORREGIR) ---")
-    extracted_montos = extract_amounts(text)
-    pprint(extracted_montos)
-    print("-"*(50))
-    
-    print("\n--- 4. RECONCILIACIÓN DE MONTOS (DESPUÉS DE CORREGIR) ---")
-    reconciled_montos = reconcile_amounts(extracted_montos)
-    pprint(reconciled_montos)
-    print("-"*(50))
+    with trace.stage("reconciliacion"):
+        reconciled_montos = reconcile_amounts(extracted_montos, trace=trace)
+    trace.record("reconciliacion", resultado=reconciled_montos)
+    if ted.get("total") is not None:
+        confianza["total"] = 1.0
+    elif reconciled_montos.get("total") is not None:
+        confianza["total"] = CONF_MONTOS_CUADRAN if amounts_balance(reconciled_montos) else CONF_MONTOS_SIN_CUADRE
+    else:
+        confianza["total"] = 0.0
 
     final_result = OCRResult(
         raw_text=raw_text,
@@ -80,23 +104,62 @@ def parse_text(raw_text: str) -> OCRResult:
         folio=str(folio) if folio else "",
         fecha_emision=fecha,
         tipo_documento=tipo_doc,
+        confianza=confianza,
         **reconciled_montos
     )
-
-    print("\n--- 5. RESULTADO FINAL ANTES DE GUARDAR EN BD ---")
-    pprint(vars(final_result)) # Usamos vars() para ver el contenido del objeto
-    print("="*50)
-    print("FIN DE DIAGNÓSTICO")
-    print("="*50 + "\n")
-    
+    logger.debug(
+        "parse_text: tipo=%s folio=%s fecha=%s rut=%s total=%s",
+        final_result.tipo_documento, final_result.folio, final_result.fecha_emision,
+        final_result.rut_proveedor, final_result.total,
+    )
     return final_result
 
-def parse_document(path: str) -> tuple[OCRResult, str]:
+def parse_document(path: str, sha256: str | None = None, tipo_pdf: str | None = None,
+                   trace: Trace | None = None, usar_cache: bool = True) -> tuple[OCRResult, str]:
     """
     Orquestador principal: recibe la ruta de un archivo, extrae el texto y lo parsea.
+    Si el mismo contenido (SHA-256) ya se procesó con los mismos motores y la
+    misma versión del parser, devuelve el resultado guardado en caché.
+
+    Sin `trace` se traza según OCR_TRACE; el comando ocr_bench pasa su propia
+    traza y `usar_cache=False` para medir siempre la extracción completa.
+
+    La extracción va por niveles (ver escalation.py): pdfminer, timbre, OCR
+    rápido y OCR cuidadoso, hasta que los campos obligatorios alcanzan la
+    confianza mínima; `meta["ocr_nivel"]` dice dónde terminó. Si se encontró
+    el timbre electrónico (PDF417), sus campos reemplazan a los del texto y
+    el XML del TED queda en `result.ted`.
     """
-    raw_text, source = get_text_from_file(path)
-    result = parse_text(raw_text)
-    result.fuente_texto = source
+    usar_cache = usar_cache and cache.enabled()
+    if usar_cache:
+        sha256 = sha256 or cache.file_sha256(path)
+        cached = cache.get(sha256)
+        if cached is not None:
+            cached.meta["cache"] = "hit"
+            return cached, cached.raw_text
+
+    meta = {"parser_version": PARSER_VERSION}
+    if trace is None:
+        trace = Trace(enabled=settings.OCR_TRACE)
+
+    def parse(texto: str, ted: dict | None) -> OCRResult:
+        return parse_text(texto, trace=trace, ted=ted)
+
+    with trace.stage("texto"):
+        if Path(path).suffix.lower() == ".pdf":
+            if not tipo_pdf:
+                with trace.stage("sonda_pdf"):
+                    tipo_pdf = probe_pdf_kind(path)
+            meta["tipo_pdf"] = tipo_pdf
+            result, raw_text = escalation.extract_pdf(path, meta, parse, tipo_pdf=tipo_pdf, trace=trace)
+        else:
+            result, raw_text = escalation.extract_image(path, meta, parse, trace=trace)
+
+    if trace:
+        meta["trace"] = trace.as_dict()
+    result.meta = meta
+
+    if usar_cache:
+        cache.put(sha256, result)
     
-    return result, raw_text
\ No newline at end of file
+    return result, raw_text
@@ -1,12 +1,26 @@
 # apps/documentos/ocr/postprocess/reconcile.py
 from decimal import Decimal
+from ..debug.trace import NULL_TRACE
 
 DEFAULT_IVA_RATE = Decimal('19.00')
+# Diferencia (en pesos) aceptada entre neto + exento + IVA y el total, por redondeo
+TOLERANCIA_CUADRE = Decimal('1')
 
-def reconcile_amounts(extracted_data: dict) -> dict:
+def amounts_balance(montos: dict) -> bool:
+    """True si hay total y neto + exento + IVA lo suman (o, sin neto ni IVA, el exento es el total)."""
+    total = montos.get('total')
+    if total is None:
+        return False
+    partes = [montos.get(k) for k in ('monto_neto', 'monto_exento', 'iva')]
+    if all(p is None for p in partes):
+        return False
+    return abs(sum(p for p in partes if p is not None) - total) <= TOLERANCIA_CUADRE
+
+def reconcile_amounts(extracted_data: dict, trace=NULL_TRACE) -> dict:
     """
     Valida y reconcilia los montos extraídos.
     Infiere valores faltantes solo si es lógicamente posible.
+    Con una traza activa registra en "reconciliacion" el escenario aplicado.
     """
     neto = extracted_data.get('monto_neto')
     exento = extracted_data.get('monto_exento') or Decimal('0')
@@ -15,10 +29,12 @@ def reconcile_amounts(extracted_data: dict) -> dict:
     iva_tasa = extracted_data.get('iva_tasa')
 
     # --- Lógica de Inferencia ---
+    escenario = None
 
     # Escenario 1: Falta el TOTAL, pero tenemos NETO e IVA.
     if total is None and neto is not None and iva is not None:
         total = neto + exento + iva
+        escenario = "total = neto + exento + iva"
         
     # Escenario 2: Falta el IVA, pero tenemos NETO y TOTAL.
     elif iva is None and neto is not None and total is not None:
@@ -28,10 +44,16 @@ def reconcile_amounts(extracted_data: dict) -> dict:
             expected_iva = neto * (expected_rate / Decimal('100'))
             if abs(calculated_iva - expected_iva) < 2:
                 iva = calculated_iva
+                escenario = "iva = total - neto - exento"
+            else:
+                escenario = f"iva no inferido: {calculated_iva} no calza con tasa {expected_rate}%"
 
     # Escenario 3: Falta el NETO, pero tenemos TOTAL e IVA.
     elif neto is None and total is not None and iva is not None:
         neto = total - iva - exento
+        escenario = "neto = total - iva - exento"
+
+    trace.record("reconciliacion", escenario=escenario or "sin cambios")
 
     # --- Asignación Final ---
     return {
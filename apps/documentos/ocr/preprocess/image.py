@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Preprocesamiento común de imágenes antes de Tesseract (fotos y páginas de PDF
+rasterizadas).
+
+Pipeline 'adaptive':
+  1. Gris + binarización Otsu de trabajo (texto en blanco).
+  2. Altura típica de caracteres (mediana de componentes conexas) -> factor de
+     escala si queda fuera de TEXT_HEIGHT_RANGE. Reduce fotos de celular
+     sobredimensionadas en vez de solo agrandar.
+  3. Enderezado por perfil de proyección (ángulo con filas más contrastadas).
+  4. Recorte de márgenes vacíos.
+  5. Reescalado, mediana 3x3 y umbral adaptativo (media local).
+
+Tesseract recibe menos pixeles y menos ruido. 'legacy' reproduce el pipeline
+original de engines/image.py (para comparar en bench_ocr_engine).
+"""
+import cv2
+import numpy as np
+
+PREPROCESS_ADAPTIVE = "adaptive"
+PREPROCESS_LEGACY = "legacy"
+PREPROCESS_NONE = "none"
+PREPROCESS_MODES = (PREPROCESS_ADAPTIVE, PREPROCESS_LEGACY, PREPROCESS_NONE)
+
+# Altura típica de caracter (px, mediana de componentes). Dentro del rango no se
+# reescala; fuera de él se lleva a TARGET_TEXT_HEIGHT.
+TEXT_HEIGHT_RANGE = (16, 40)
+TARGET_TEXT_HEIGHT = 24
+MIN_SCALE, MAX_SCALE = 0.25, 4.0
+# Con menos componentes "tipo letra" la estimación no es confiable
+MIN_GLYPHS = 15
+
+# Búsqueda del ángulo: pasada gruesa cada 1° y fina cada 0.25° alrededor del mejor
+MAX_SKEW_DEG = 5.0
+SKEW_STEP_DEG = 0.25
+# Ancho de la copia reducida donde se busca el ángulo
+SKEW_WORK_WIDTH = 800
+
+MARGIN_PAD = 12
+
+def to_gray(image) -> np.ndarray:
+    """Acepta PIL o numpy (gris, BGR, BGRA) y devuelve un arreglo uint8 de un canal."""
+    arr = np.asarray(image)
+    if arr.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if arr.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        arr = cv2.cvtColor(arr, code)
+    if arr.dtype != np.uint8:
+        arr = arr.astype(np.uint8)
+    return arr
+
+def _binarize_inv(gray: np.ndarray) -> np.ndarray:
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return binary
+
+def _glyph_stats(binary_inv: np.ndarray) -> np.ndarray:
+    """Estadísticas (x, y, w, h, área) de las componentes con forma de caracter."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary_inv, connectivity=8)
+    stats = stats[1:]  # la 0 es el fondo
+    w, h, area = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT], stats[:, cv2.CC_STAT_AREA]
+    img_h = binary_inv.shape[0]
+    keep = (
+        (h >= 4) & (h <= img_h // 8)
+        & (w <= h * 4) & (h <= w * 6)
+        & (area >= 0.1 * w * h)
+    )
+    return stats[keep]
+
+def estimate_text_height(binary_inv: np.ndarray) -> float | None:
+    glyphs = _glyph_stats(binary_inv)
+    if len(glyphs) < MIN_GLYPHS:
+        return None
+    return float(np.median(glyphs[:, cv2.CC_STAT_HEIGHT]))
+
+def estimate_skew(binary_inv: np.ndarray) -> float:
+    """
+    Ángulo (grados) que maximiza la varianza del perfil horizontal: con el
+    texto derecho las filas alternan entre llenas y vacías.
+    """
+    h, w = binary_inv.shape
+    if w > SKEW_WORK_WIDTH:
+        f = SKEW_WORK_WIDTH / w
+        small = cv2.resize(binary_inv, (SKEW_WORK_WIDTH, max(1, int(h * f))), interpolation=cv2.INTER_AREA)
+    else:
+        small = binary_inv
+    center = (small.shape[1] / 2, small.shape[0] / 2)
+
+    def score(angle: float) -> float:
+        m = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(small, m, (small.shape[1], small.shape[0]), flags=cv2.INTER_NEAREST)
+        return float(np.var(rotated.sum(axis=1, dtype=np.int64)))
+
+    coarse = np.arange(-MAX_SKEW_DEG, MAX_SKEW_DEG + 0.5, 1.0)
+    best_angle = max(coarse, key=score)
+    fine = np.arange(best_angle - 0.75, best_angle + 0.76, SKEW_STEP_DEG)
+    best_angle = max(fine, key=score)
+    return float(best_angle)
+
+def _rotate(gray: np.ndarray, angle: float) -> np.ndarray:
+    h, w = gray.shape
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, m, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+
+def _content_box(binary_inv: np.ndarray):
+    """Caja (y0, y1, x0, x1) que contiene los caracteres, con un margen."""
+    glyphs = _glyph_stats(binary_inv)
+    if not len(glyphs):
+        return None
+    x0 = glyphs[:, cv2.CC_STAT_LEFT].min()
+    y0 = glyphs[:, cv2.CC_STAT_TOP].min()
+    x1 = (glyphs[:, cv2.CC_STAT_LEFT] + glyphs[:, cv2.CC_STAT_WIDTH]).max()
+    y1 = (glyphs[:, cv2.CC_STAT_TOP] + glyphs[:, cv2.CC_STAT_HEIGHT]).max()
+    h, w = binary_inv.shape
+    return (max(0, y0 - MARGIN_PAD), min(h, y1 + MARGIN_PAD), max(0, x0 - MARGIN_PAD), min(w, x1 + MARGIN_PAD))
+
+def preprocess_adaptive(image, info: dict | None = None) -> np.ndarray:
+    gray = to_gray(image)
+    binary = _binarize_inv(gray)
+
+    # --- 1. Escala según la altura del texto ---
+    text_h = estimate_text_height(binary)
+    if text_h:
+        lo, hi = TEXT_HEIGHT_RANGE
+        scale = 1.0 if lo <= text_h <= hi else float(np.clip(TARGET_TEXT_HEIGHT / text_h, MIN_SCALE, MAX_SCALE))
+    else:
+        # Sin texto reconocible: criterio antiguo (altura ~1200px, sin reducir)
+        scale = max(1.0, 1200 / gray.shape[0])
+
+    # --- 2. Enderezado ---
+    angle = estimate_skew(binary)
+    if abs(angle) >= SKEW_STEP_DEG:
+        gray = _rotate(gray, angle)
+        binary = _binarize_inv(gray)
+
+    # --- 3. Recorte de márgenes ---
+    box = _content_box(binary)
+    if box:
+        y0, y1, x0, x1 = box
+        gray = gray[y0:y1, x0:x1]
+
+    # --- 4. Reescalado + limpieza + binarización adaptativa ---
+    if abs(scale - 1.0) > 0.05:
+        interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interp)
+    gray = cv2.medianBlur(gray, 3)
+    # Ventana del orden de un caracter y medio: corrige sombras e iluminación despareja.
+    # Media local (filtro de caja, costo constante por pixel) en vez de gaussiana.
+    block = max(15, int((text_h or TARGET_TEXT_HEIGHT) * scale * 1.5) | 1)
+    out = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, 15)
+
+    if info is not None:
+        info.update({
+            "altura_texto": text_h,
+            "escala": round(scale, 3),
+            "angulo": angle,
+            "recorte": [int(v) for v in box] if box else None,
+            "tamano": [int(out.shape[1]), int(out.shape[0])],
+        })
+    return out
+
+def preprocess_legacy(image, info: dict | None = None) -> np.ndarray:
+    """Pipeline original: agrandar a ~1200px de alto, mediana y Otsu."""
+    gray = to_gray(image)
+    scale_factor = 1200 / gray.shape[0]
+    if scale_factor > 1:
+        gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_CUBIC)
+    denoised = cv2.medianBlur(gray, 3)
+    _, binary_img = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if info is not None:
+        info["tamano"] = [int(binary_img.shape[1]), int(binary_img.shape[0])]
+    return binary_img
+
+def preprocess(image, mode: str = PREPROCESS_ADAPTIVE, info: dict | None = None):
+    """Aplica el pipeline indicado. 'none' devuelve la imagen sin tocar."""
+    if mode == PREPROCESS_ADAPTIVE:
+        return preprocess_adaptive(image, info)
+    if mode == PREPROCESS_LEGACY:
+        return preprocess_legacy(image, info)
+    return image
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import date
 from decimal import Decimal
 from typing import Optional, Any, Dict
 
+# Campos mínimos para dar por buena una extracción (y para validar con el SII)
+REQUIRED_FIELDS = ("rut_proveedor", "folio", "total", "fecha_emision", "tipo_documento")
+
 @dataclass
 class OCRResult:
     raw_text: str
@@ -18,6 +21,19 @@ class OCRResult:
     iva: Optional[Decimal] = None
     total: Optional[Decimal] = None
     fuente_texto: str = "desconocido"
+    # XML del timbre electrónico (TED) leído del PDF417; vacío si no se encontró
+    ted: str = ""
+    # Confianza (0 a 1) de cada campo extraído: tipo_documento, folio, fecha_emision, rut_proveedor, total
+    confianza: Dict[str, float] = field(default_factory=dict)
+    # Metadatos de la extracción (memoria, páginas, etc.) que se guardan en Documento.ocr_json
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def missing_fields(self) -> list[str]:
+        """Campos de REQUIRED_FIELDS que quedaron vacíos (tipo 'desconocido' cuenta como vacío)."""
+        return [
+            f for f in REQUIRED_FIELDS
+            if not getattr(self, f) or (f == "tipo_documento" and self.tipo_documento == "desconocido")
+        ]
 
     def to_dict(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -26,3 +42,12 @@ class OCRResult:
             if isinstance(v, Decimal):
                 data[k] = str(v)
         return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OCRResult":
+        data = dict(data)
+        for k in ("iva_tasa", "monto_neto", "monto_exento", "iva", "total"):
+            v = data.get(k)
+            if v is not None and not isinstance(v, Decimal):
+                data[k] = Decimal(str(v))
+        return cls(**data)
@@ -0,0 +1,68 @@
+# apps/documentos/ocr/utils/disk_lru.py
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Escrituras de este proceso entre dos recorridos completos del directorio: otros
+# procesos escriben en el mismo caché y el total estimado se va desfasando
+RESYNC_WRITES = 200
+
+# directorio -> [bytes estimados, escrituras desde el último recorrido]
+_estimado: dict[str, list[int]] = {}
+
+def touch(path: str):
+    """Marca una entrada como usada recién (el mtime hace de reloj LRU)."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def record_write(directory: str, size: int, max_bytes: int) -> int:
+    """
+    Registra una entrada nueva de `size` bytes y poda solo si hace falta: el
+    directorio se recorre la primera vez, cuando el total estimado supera
+    `max_bytes` o cada RESYNC_WRITES escrituras. Devuelve los bytes liberados.
+    """
+    estado = _estimado.get(directory)
+    if estado is not None:
+        estado[0] += size
+        estado[1] += 1
+        if estado[0] <= max_bytes and estado[1] < RESYNC_WRITES:
+            return 0
+    return prune(directory, max_bytes)
+
+def prune(directory: str, max_bytes: int, keep_ratio: float = 0.9) -> int:
+    """
+    Si el directorio supera `max_bytes`, borra las entradas menos usadas
+    (mtime más antiguo) hasta quedar bajo `max_bytes * keep_ratio`.
+    Devuelve la cantidad de bytes liberados.
+    """
+    entries, total = [], 0
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # otro proceso la borró entremedio
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    if total <= max_bytes:
+        _estimado[directory] = [total, 0]
+        return 0
+
+    target = int(max_bytes * keep_ratio)
+    freed = 0
+    for _mtime, size, path in sorted(entries):
+        if total - freed <= target:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            pass
+    _estimado[directory] = [total - freed, 0]
+    logger.info(f"Caché {directory}: liberados {freed} bytes ({total} > {max_bytes})")
+    return freed
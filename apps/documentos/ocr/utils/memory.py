@@ -0,0 +1,52 @@
+# apps/documentos/ocr/utils/memory.py
+import os
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_kb() -> int | None:
+    """RSS actual del proceso en kB (o el pico histórico si no hay /proc)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+class MemoryPeak:
+    """
+    Registra el pico de memoria de un documento muestreando el RSS en los
+    puntos de mayor consumo (p.ej. justo después de rasterizar una página).
+    Es seguro usarlo desde varios hilos.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rss_inicio_kb = current_rss_kb()
+        self.rss_pico_kb = self.rss_inicio_kb
+        self.imagen_pico_bytes = 0
+
+    def sample(self, image_bytes: int = 0):
+        rss = current_rss_kb()
+        with self._lock:
+            if rss is not None and (self.rss_pico_kb is None or rss > self.rss_pico_kb):
+                self.rss_pico_kb = rss
+            if image_bytes > self.imagen_pico_bytes:
+                self.imagen_pico_bytes = image_bytes
+
+    def as_dict(self) -> dict:
+        data = {
+            "rss_inicio_kb": self.rss_inicio_kb,
+            "rss_pico_kb": self.rss_pico_kb,
+            "imagen_pico_bytes": self.imagen_pico_bytes,
+        }
+        if resource is not None:
+            # pdftoppm/tesseract corren como subprocesos: su pico se reporta aparte
+            data["rss_pico_subprocesos_kb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return data
@@ -1,13 +1,24 @@
 # apps/documentos/ocr/utils/numbers.py
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-import re
+from .patterns import IVA_RATE
+
+class _SoloDigitos(dict):
+    """
+    Tabla para str.translate que conserva los dígitos (los mismos que `\\d`) y
+    borra el resto. Cada carácter se clasifica la primera vez que aparece.
+    """
+    def __missing__(self, code: int):
+        self[code] = code if chr(code).isdecimal() else None
+        return self[code]
+
+_SOLO_DIGITOS = _SoloDigitos()
 
 def clean_and_parse_amount(text: str) -> Decimal | None:
     """Convierte un texto de monto a un objeto Decimal, eliminando símbolos y puntos."""
     if not text:
         return None
     
-    cleaned_text = re.sub(r'[^\d]', '', text)
+    cleaned_text = text.translate(_SOLO_DIGITOS)
     if not cleaned_text:
         return None
         
@@ -23,8 +34,8 @@ def extract_iva_rate(text: str) -> Decimal | None:
     """
     Extrae una tasa de IVA (ej: '19%' o '(1 9%)') y la devuelve como Decimal (19.00).
     """
-    # Regex MEJORADA: Tolera espacios opcionales entre los dígitos y el '%'
-    match = re.search(r'\(?\s*(\d{1,2})\s*(\d?)\s*%\s*\)?', text, re.I)
+    # Regex MEJORADA (patterns.IVA_RATE): tolera espacios entre los dígitos y el '%'
+    match = IVA_RATE.search(text)
     if match:
         # Une los dígitos si están separados por un espacio (ej: '1' y '9')
         rate_str = match.group(1) + (match.group(2) or '')
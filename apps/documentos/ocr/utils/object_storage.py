@@ -0,0 +1,28 @@
+# apps/documentos/ocr/utils/object_storage.py
+"""
+Acceso directo al bucket de un S3Storage (django-storages) sin pasar por su
+API privada: la subida firmada, la verificación de objetos y la descarga al
+caché local hablan con el cliente boto3 y necesitan la clave real del objeto.
+"""
+import posixpath
+
+from django.core.exceptions import SuspiciousOperation
+
+def es_s3(storage) -> bool:
+    """True si el storage guarda en un bucket S3/MinIO."""
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+def cliente(storage):
+    """Cliente boto3 con las credenciales y el endpoint del storage."""
+    return storage.connection.meta.client
+
+def clave(storage, nombre: str) -> str:
+    """
+    Nombre del storage -> clave en el bucket: antepone `location` (AWS_LOCATION)
+    como lo hace el storage al guardar. Rechaza nombres que salgan de ella.
+    """
+    nombre = posixpath.normpath(nombre.replace("\\", "/")).lstrip("/")
+    if nombre == ".." or nombre.startswith("../"):
+        raise SuspiciousOperation(f"Nombre fuera del storage: {nombre}")
+    location = (getattr(storage, "location", "") or "").strip("/")
+    return f"{location}/{nombre}" if location else nombre
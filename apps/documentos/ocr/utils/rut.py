@@ -1,6 +1,6 @@
 # apps/documentos/ocr/utils/rut.py
 # -*- coding: utf-8 -*-
-import re
+from .patterns import RUT_LIMPIO
 
 def clean_rut(rut: str) -> str:
     if not rut: return ""
@@ -20,7 +20,7 @@ def dv_calc(num: int) -> str:
 
 def is_valid(rut: str) -> bool:
     rut = clean_rut(rut)
-    m = re.match(r"^(\d+)-([0-9K])$", rut)
+    m = RUT_LIMPIO.match(rut)
     if not m: return False
     num, dv = int(m.group(1)), m.group(2)
     return dv == dv_calc(num)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Índice del texto de un documento, compartido por todos los extractores.
+
+Antes cada extractor volvía a partir el texto en líneas y corría sus propias
+regex sobre el documento completo (proveedor recorría RUT_PATTERNS hasta tres
+veces y validaba el mismo RUT varias veces). TextIndex parte el texto una sola
+vez y comparte:
+
+- las líneas (`splitlines()` y `split('\\n')`, que no son iguales: pdfminer
+  separa páginas con '\\f') con sus offsets;
+- los aciertos de las anclas (FACTURA, FECHA, SEÑOR(ES)...) por línea, en un
+  recorrido perezoso del texto completo que se corta en la primera línea útil;
+- los spans de RUT (un recorrido por patrón) y los montos de la sección de totales;
+- el texto normalizado para los detectores.
+
+Todo se calcula a pedido y queda en caché. Los extractores piden los
+aciertos de una sección (`matches(patron, inicio, fin)`); si algún acierto
+del texto completo cruza el borde de la sección, se vuelve a buscar solo en
+ella, así el resultado es idéntico a correr la regex sobre la sección cortada.
+"""
+import re
+from bisect import bisect_right
+from functools import cached_property
+from itertools import accumulate
+
+from . import patterns
+from .text_norm import normalize_text
+
+# Separadores de str.splitlines() (además de '\n')
+_SPLITLINES = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+_NEWLINE = re.compile("\n")
+
+class TextIndex:
+    def __init__(self, text: str):
+        self.text = text or ""
+        self._spans: dict = {}
+
+    @classmethod
+    def of(cls, text) -> "TextIndex":
+        """Acepta un TextIndex ya construido o un str."""
+        return text if isinstance(text, TextIndex) else cls(text)
+
+    # --- Líneas ---
+    @cached_property
+    def lines(self) -> list[str]:
+        """Equivale a `text.splitlines()`."""
+        return self.text.splitlines()
+
+    @cached_property
+    def line_starts(self) -> list[int]:
+        """Offset de inicio de cada elemento de `lines`."""
+        return [0, *accumulate(map(len, self.text.splitlines(keepends=True)[:-1]))]
+
+    @cached_property
+    def nl_lines(self) -> list[str]:
+        """Equivale a `text.split('\\n')`."""
+        return self.text.split("\n")
+
+    @cached_property
+    def nl_line_starts(self) -> list[int]:
+        """Offset de inicio de cada elemento de `nl_lines`."""
+        return [0, *accumulate(len(ln) + 1 for ln in self.nl_lines[:-1])]
+
+    @cached_property
+    def normalized(self) -> str:
+        """`normalize_text` del documento completo (mayúsculas, sin acentos, espacios colapsados)."""
+        return normalize_text(self.text)
+
+    # --- Aciertos de patrones ---
+    def spans(self, pattern: re.Pattern) -> list[re.Match]:
+        """Todos los aciertos de `pattern` en el texto completo (un solo recorrido, cacheado)."""
+        found = self._spans.get(pattern)
+        if found is None:
+            found = self._spans[pattern] = list(pattern.finditer(self.text))
+        return found
+
+    def matches(self, pattern: re.Pattern, start: int = 0, end: int | None = None) -> list[re.Match]:
+        """
+        Aciertos de `pattern` como si se buscara en `text[start:end]`. `start` y
+        `end` deben caer en bordes de línea, donde `pos/endpos` equivalen a cortar.
+        """
+        end = len(self.text) if end is None else end
+        all_spans = self.spans(pattern)
+        if start == 0 and end == len(self.text):
+            return all_spans
+        inside = []
+        for m in all_spans:
+            s, e = m.span()
+            if s < start < e or s < end < e:
+                # Un acierto cruza el borde de la sección: resultado distinto al cortar
+                return list(pattern.finditer(self.text, start, end))
+            if start <= s and e <= end:
+                inside.append(m)
+        return inside
+
+    def scan(self, pattern: re.Pattern, start: int = 0, end: int | None = None) -> list[re.Match]:
+        """
+        Como `matches`, pero recorre solo la sección (cacheado por sección). Para
+        patrones que ningún otro extractor busca en el resto del texto.
+        """
+        key = (pattern, start, end)
+        found = self._spans.get(key)
+        if found is None:
+            found = self._spans[key] = list(pattern.finditer(self.text, start, len(self.text) if end is None else end))
+        return found
+
+    def search(self, pattern: re.Pattern, start: int = 0, end: int | None = None) -> re.Match | None:
+        """Primer acierto en la sección; solo recorre todo el texto si ya estaba indexado."""
+        if pattern in self._spans:
+            found = self.matches(pattern, start, end)
+            return found[0] if found else None
+        return pattern.search(self.text, start, len(self.text) if end is None else end)
+
+    def _hit_lines(self, name: str, lines: list[str], starts: list[int], sep: re.Pattern):
+        """
+        Entrega cada línea con al menos un acierto del ancla `name`. Es perezoso
+        (el extractor puede cortar en la primera línea útil) y equivale a buscar
+        el patrón del ancla línea por línea; si un acierto cruza un salto, sigue
+        línea por línea.
+        """
+        pattern = patterns.ANCHOR_PATTERNS[name]
+        last = -1
+        for m in pattern.finditer(self.text):
+            if sep.search(m.group()):
+                for i in range(last + 1, len(lines)):
+                    if pattern.search(lines[i]):
+                        yield i
+                return
+            line = bisect_right(starts, m.start()) - 1
+            if line != last:
+                yield line
+                last = line
+
+    def anchor_lines(self, name: str):
+        """Índices (en `lines`, de `splitlines()`) de las líneas con el ancla `name`, en orden."""
+        return self._hit_lines(name, self.lines, self.line_starts, _SPLITLINES)
+
+    def first_nl_line(self, name: str) -> int:
+        """Primer índice en `nl_lines` cuya línea tiene el ancla `name` (-1 si no hay)."""
+        return next(self._hit_lines(name, self.nl_lines, self.nl_line_starts, _NEWLINE), -1)
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import unicodedata
-import re
 
 def preprocess_text(text: str) -> str:
     text = (text or "")
@@ -25,9 +24,12 @@ def normalize_text(text: str) -> str:
         return ""
     # Quita acentos
     t = unicodedata.normalize("NFKD", text)
-    t = "".join([c for c in t if not unicodedata.combining(c)])
+    # Se revisan solo los caracteres distintos y se borran con translate (en C)
+    if not t.isascii():
+        marks = {ord(c): None for c in set(t) if unicodedata.combining(c)}
+        if marks:
+            t = t.translate(marks)
     # Pone todo en mayúsculas
     t = t.upper()
-    # Reemplaza múltiples espacios y limpia caracteres no deseados
-    t = re.sub(r"\s+", " ", t)
-    return t.strip()
\ No newline at end of file
+    # Colapsa espacios: split() usa los mismos espacios Unicode que `\s` y ya recorta los bordes
+    return " ".join(t.split())
\ No newline at end of file
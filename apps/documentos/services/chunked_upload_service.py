@@ -0,0 +1,454 @@
+# apps/documentos/services/chunked_upload_service.py
+"""
+Subida reanudable por partes, para lotes grandes y la app móvil.
+
+Protocolo (api/v1/documentos/cargas/):
+  1. POST cargas/                 {nombre, tamano, sha256} -> sesión (o el
+                                  documento existente, si el hash ya está cargado)
+  2. PUT  cargas/<id>/            cuerpo = un trozo; Content-Range: bytes a-b/total.
+                                  Los trozos van en orden; tras un corte, GET
+                                  cargas/<id>/ dice desde qué byte seguir.
+  3. POST cargas/<id>/finalizar/  202, estado "ensamblando": un worker arma el
+                                  archivo, verifica tamaño y SHA-256 y crea el
+                                  Documento. GET cargas/<id>/ muestra cuando queda
+                                  "finalizada" (documento_id) o "cancelada" (no coincidió).
+
+Cada trozo se escribe en el storage tal como llega del socket (cargas/<id>/<inicio>),
+sin pasar por request.body, y se hashea en la misma pasada (SesionCarga.trozos):
+un worker web nunca tiene el archivo completo en memoria ni lo relee. El archivo
+se arma en la tarea ensamblar_carga: con S3 los trozos se copian dentro del
+bucket (UploadPartCopy) y el worker solo los lee para el SHA-256 del total; con
+otro storage se concatenan en el destino en esa misma lectura.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import uuid
+from datetime import date, timedelta
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Documento, SesionCarga
+from ..ocr.utils import object_storage
+from ..tasks.cargas import ensamblar_carga
+from .upload_service import create_document_from_storage
+
+log = logging.getLogger(__name__)
+
+EXTENSIONES = (".pdf", ".png", ".jpg", ".jpeg", ".xml")
+TAMANO_MAX = 500 * 1024 * 1024        # por archivo
+TROZO_MAX = 16 * 1024 * 1024          # por PUT
+LECTURA = 64 * 1024                   # bloque de lectura del socket y de los trozos
+PARTE_MIN_S3 = 5 * 1024 * 1024        # parte mínima de una subida multiparte S3 (salvo la última)
+# Sesiones abiertas sin actividad se cancelan y se borran sus trozos
+HORAS_ABANDONO = 48
+
+class CargaError(Exception):
+    """Error del cliente en la subida por partes; `status` es el código HTTP a devolver."""
+
+    def __init__(self, mensaje: str, status: int = 400, **extra):
+        super().__init__(mensaje)
+        self.status = status
+        self.extra = extra
+
+def _dir_trozos(sesion: SesionCarga) -> str:
+    return f"cargas/{sesion.id}"
+
+def _ruta_trozo(sesion: SesionCarga, inicio: int) -> str:
+    # Con ceros a la izquierda el orden alfabético es el de los bytes; el sufijo
+    # aleatorio separa dos intentos del mismo trozo que llegan a la vez
+    return f"{_dir_trozos(sesion)}/{inicio:015d}-{uuid.uuid4().hex[:8]}"
+
+def ruta_documento(empresa, nombre: str) -> str:
+    # Misma ruta que doc_upload_to; el prefijo aleatorio evita pisar otro objeto
+    hoy = date.today()
+    rut = empresa.rut.replace(".", "")
+    return f"documentos/{rut}/{hoy.year}/{hoy.month:02d}/{uuid.uuid4().hex[:12]}-{nombre}"
+
+def validar_archivo(nombre: str, tamano: int, sha256: str) -> tuple[str, str]:
+    """Valida lo que declara el cliente al abrir una subida; devuelve (nombre, sha256) normalizados."""
+    nombre = os.path.basename(nombre or "")
+    sha256 = (sha256 or "").lower()
+    if not nombre.lower().endswith(EXTENSIONES):
+        raise CargaError(f"Extensión no soportada: {nombre or '(sin nombre)'}")
+    if not 0 < tamano <= TAMANO_MAX:
+        raise CargaError(f"Tamaño fuera de rango (1 a {TAMANO_MAX} bytes).")
+    if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+        raise CargaError("sha256 debe ser el hash hexadecimal del archivo completo.")
+    return nombre, sha256
+
+def iniciar_carga(empresa, usuario, nombre: str, tamano: int, sha256: str, origen: str = "api") -> dict:
+    """
+    Abre una sesión de subida. Si la empresa ya tiene un documento con ese
+    hash no hace falta subir nada: se devuelve ese documento como duplicado.
+    """
+    nombre, sha256 = validar_archivo(nombre, tamano, sha256)
+    existente = Documento.objects.filter(empresa=empresa, hash_sha256=sha256).values_list("id", flat=True).first()
+    if existente:
+        return {"estado": "duplicado", "documento_id": existente}
+
+    sesion = SesionCarga.objects.create(
+        empresa=empresa, usuario=usuario, origen=origen,
+        nombre_archivo=nombre, tamano_bytes=tamano, hash_sha256=sha256,
+    )
+    return estado_carga(sesion)
+
+def estado_carga(sesion: SesionCarga) -> dict:
+    return {
+        "id": str(sesion.id),
+        "estado": sesion.estado,
+        "nombre": sesion.nombre_archivo,
+        "tamano": sesion.tamano_bytes,
+        "recibido": sesion.recibido_bytes,
+        "trozo_max": TROZO_MAX,
+        "documento_id": sesion.documento_id,
+    }
+
+class _Trozo(io.RawIOBase):
+    """
+    El cuerpo del request acotado a `longitud` bytes, para guardarlo con el
+    storage. Cuenta y hashea lo leído en read(), que es lo que usan todos los
+    backends (FileSystemStorage vía chunks(), S3Storage vía upload_fileobj), y
+    no se puede rebobinar: el socket no se vuelve a leer.
+    """
+
+    def __init__(self, stream, longitud: int):
+        super().__init__()
+        self.stream = stream
+        self.restante = longitud
+        self.leidos = 0
+        self.sha = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(min(len(buffer), self.restante, LECTURA)) if self.restante > 0 else b""
+        n = len(data)
+        buffer[:n] = data
+        self.restante -= n
+        self.leidos += n
+        self.sha.update(data)
+        return n
+
+def recibir_trozo(sesion_id, empresa_ids, inicio: int, fin: int, total: int, stream) -> dict:
+    """
+    Guarda el trozo [inicio, fin] (inclusive, como en Content-Range) de la sesión.
+
+    - inicio == recibido: se escribe y avanza `recibido`.
+    - fin < recibido: reintento de un trozo ya guardado (se perdió la
+      respuesta); no se escribe nada y se devuelve el estado.
+    - cualquier otro inicio: 409 con el byte desde el que hay que seguir.
+
+    El trozo se lee del socket sin transacción ni lock abiertos (un cliente
+    móvil lento no retiene una conexión a la base): va a una ruta propia del
+    intento y al final un UPDATE condicionado a que `recibido` siga en
+    `inicio` lo registra. Si otro intento ganó, el archivo se borra.
+    """
+    longitud = fin - inicio + 1
+    if longitud <= 0 or longitud > TROZO_MAX:
+        raise CargaError(f"Trozo de {longitud} bytes; máximo {TROZO_MAX}.")
+
+    sesion = _sesion_abierta(sesion_id, empresa_ids)
+    if total != sesion.tamano_bytes or fin >= sesion.tamano_bytes:
+        raise CargaError("El rango no corresponde al tamaño declarado.", **estado_carga(sesion))
+    if fin < sesion.recibido_bytes:
+        return estado_carga(sesion)
+    if inicio != sesion.recibido_bytes:
+        raise CargaError(f"Se esperaba el byte {sesion.recibido_bytes}.", status=409, **estado_carga(sesion))
+
+    trozo = _Trozo(stream, longitud)
+    ruta = default_storage.save(_ruta_trozo(sesion, inicio), File(trozo))
+    if trozo.leidos != longitud:
+        default_storage.delete(ruta)
+        raise CargaError(f"Se recibieron {trozo.leidos} de {longitud} bytes.", **estado_carga(sesion))
+
+    # `trozos` no cambió desde la lectura: cada trozo que se agrega también avanza `recibido`
+    registrado = SesionCarga.objects.filter(id=sesion.id, estado="abierta", recibido_bytes=inicio).update(
+        recibido_bytes=fin + 1,
+        trozos=sesion.trozos + [{"inicio": inicio, "ruta": ruta, "sha256": trozo.sha.hexdigest()}],
+        actualizado_en=timezone.now(),
+    )
+    if not registrado:
+        default_storage.delete(ruta)
+        sesion = _sesion_abierta(sesion_id, empresa_ids)
+        if fin < sesion.recibido_bytes:
+            return estado_carga(sesion)  # el mismo trozo llegó por otro intento
+        raise CargaError(f"Se esperaba el byte {sesion.recibido_bytes}.", status=409, **estado_carga(sesion))
+    sesion.refresh_from_db()
+    return estado_carga(sesion)
+
+def _sesion_abierta(sesion_id, empresa_ids) -> SesionCarga:
+    """La sesión por partes de las empresas dadas, sin lock; 409 si ya no recibe trozos."""
+    sesion = SesionCarga.objects.filter(id=sesion_id, empresa_id__in=empresa_ids, object_key="").first()
+    if sesion is None:
+        raise CargaError("Sesión de carga no encontrada.", status=404)
+    if sesion.estado != "abierta":
+        raise CargaError(f"La sesión está {sesion.estado}.", status=409, **estado_carga(sesion))
+    return sesion
+
+def _sesion_bloqueada(sesion_id, empresa_ids) -> SesionCarga:
+    """La sesión por partes de las empresas dadas, con su fila bloqueada (dentro de un atomic)."""
+    sesion = (
+        SesionCarga.objects.select_for_update()
+        .filter(id=sesion_id, empresa_id__in=empresa_ids, object_key="")
+        .first()
+    )
+    if sesion is None:
+        raise CargaError("Sesión de carga no encontrada.", status=404)
+    return sesion
+
+def _borrar_trozos(sesion: SesionCarga):
+    try:
+        _dirs, archivos = default_storage.listdir(_dir_trozos(sesion))
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for nombre in archivos:
+        default_storage.delete(f"{_dir_trozos(sesion)}/{nombre}")
+    # En disco local queda el directorio vacío (los storages remotos no tienen directorios)
+    try:
+        os.rmdir(default_storage.path(_dir_trozos(sesion)))
+    except (NotImplementedError, OSError):
+        pass
+
+def _trozos_registrados(sesion: SesionCarga) -> list[dict]:
+    """
+    Los trozos de la sesión en orden ({inicio, ruta, sha256}). En el storage
+    puede haber además archivos de intentos que no quedaron registrados.
+    """
+    if sesion.trozos and all(isinstance(t, dict) for t in sesion.trozos):
+        return sesion.trozos
+    # Sesiones anteriores al registro de rutas (sin `trozos` o solo con el hash de
+    # cada uno): los archivos del directorio, con su hash si la cuenta calza
+    try:
+        _dirs, archivos = default_storage.listdir(_dir_trozos(sesion))
+    except FileNotFoundError:
+        return []
+    digests = [t if isinstance(t, str) else t["sha256"] for t in sesion.trozos]
+    if len(digests) != len(archivos):
+        digests = [""] * len(archivos)
+    return [
+        {"inicio": int(nombre.split("-")[0]), "ruta": f"{_dir_trozos(sesion)}/{nombre}", "sha256": digest}
+        for nombre, digest in zip(sorted(archivos), digests)
+    ]
+
+def finalizar_carga(sesion_id, empresa_ids) -> dict:
+    """
+    Cierra la subida con todos sus bytes recibidos: la sesión pasa a
+    "ensamblando" y, al confirmar, se encola ensamblar_carga, que arma el
+    archivo, lo verifica y crea el Documento. Aquí no se lee ningún trozo.
+    """
+    with transaction.atomic():
+        sesion = _sesion_bloqueada(sesion_id, empresa_ids)
+        if sesion.estado in ("ensamblando", "finalizada"):
+            return estado_carga(sesion)
+        if sesion.estado != "abierta":
+            raise CargaError(f"La sesión está {sesion.estado}.", status=409, **estado_carga(sesion))
+        if sesion.recibido_bytes != sesion.tamano_bytes:
+            raise CargaError(
+                f"Faltan bytes: recibidos {sesion.recibido_bytes} de {sesion.tamano_bytes}.",
+                status=409, **estado_carga(sesion),
+            )
+        sesion.estado = "ensamblando"
+        sesion.save(update_fields=["estado", "actualizado_en"])
+        transaction.on_commit(lambda: ensamblar_carga.delay(str(sesion.id)))
+    return estado_carga(sesion)
+
+class _Ensamblado(io.RawIOBase):
+    """
+    Los trozos de una sesión leídos en orden como un solo archivo. Calcula el
+    SHA-256 del total y compara el de cada trozo con el registrado al recibirlo:
+    `alterados` son los que cambiaron en el storage desde entonces.
+    """
+
+    def __init__(self, rutas: list[str], digests: list[str]):
+        super().__init__()
+        self.pendientes = list(zip(rutas, digests))
+        self.actual = None
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.alterados = []
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer) -> int:
+        while True:
+            if self.actual is None:
+                if not self.pendientes:
+                    return 0
+                self.ruta, self.digest = self.pendientes.pop(0)
+                self.actual = default_storage.open(self.ruta, "rb")
+                self.sha_trozo = hashlib.sha256()
+            data = self.actual.read(min(len(buffer), LECTURA))
+            if data:
+                n = len(data)
+                buffer[:n] = data
+                self.sha.update(data)
+                self.sha_trozo.update(data)
+                self.size += n
+                return n
+            self.actual.close()
+            self.actual = None
+            # Sesiones anteriores a SesionCarga.trozos no tienen el hash de cada trozo
+            if self.digest and self.sha_trozo.hexdigest() != self.digest:
+                self.alterados.append(self.ruta)
+
+    def close(self):
+        if self.actual is not None:
+            self.actual.close()
+            self.actual = None
+        super().close()
+
+def _motivo_rechazo(sesion: SesionCarga, lector: _Ensamblado) -> str | None:
+    if lector.alterados:
+        return f"trozos alterados en el storage: {', '.join(lector.alterados)}"
+    if lector.size != sesion.tamano_bytes:
+        return f"tamaño {lector.size} distinto del declarado"
+    if lector.sha.hexdigest() != sesion.hash_sha256:
+        return "sha256 distinto del declarado"
+    return None
+
+def _copiable_en_s3(trozos: list[dict]) -> bool:
+    """Con S3, y si cada trozo salvo el último alcanza la parte mínima, se copian dentro del bucket."""
+    if not object_storage.es_s3(default_storage):
+        return False
+    inicios = [t["inicio"] for t in trozos]
+    return all(fin - inicio >= PARTE_MIN_S3 for inicio, fin in zip(inicios, inicios[1:]))
+
+def _copiar_en_s3(rutas: list[str], destino: str):
+    """Arma `destino` con UploadPartCopy, un trozo por parte: los bytes no salen del bucket."""
+    cliente, bucket = object_storage.cliente(default_storage), default_storage.bucket_name
+    clave = object_storage.clave(default_storage, destino)
+    subida = cliente.create_multipart_upload(
+        Bucket=bucket, Key=clave, ContentType=mimetypes.guess_type(destino)[0] or "application/octet-stream",
+    )
+    try:
+        partes = []
+        for numero, ruta in enumerate(rutas, start=1):
+            copia = cliente.upload_part_copy(
+                Bucket=bucket, Key=clave, UploadId=subida["UploadId"], PartNumber=numero,
+                CopySource={"Bucket": bucket, "Key": object_storage.clave(default_storage, ruta)},
+            )
+            partes.append({"PartNumber": numero, "ETag": copia["CopyPartResult"]["ETag"]})
+        cliente.complete_multipart_upload(
+            Bucket=bucket, Key=clave, UploadId=subida["UploadId"], MultipartUpload={"Parts": partes},
+        )
+    except Exception:
+        cliente.abort_multipart_upload(Bucket=bucket, Key=clave, UploadId=subida["UploadId"])
+        raise
+
+def _armar(sesion: SesionCarga) -> tuple[str | None, str | None]:
+    """Escribe el archivo completo en el storage; devuelve (nombre, motivo de rechazo)."""
+    trozos = _trozos_registrados(sesion)
+    rutas = [t["ruta"] for t in trozos]
+    destino = ruta_documento(sesion.empresa, sesion.nombre_archivo)
+    with _Ensamblado(rutas, [t["sha256"] for t in trozos]) as lector:
+        if _copiable_en_s3(trozos):
+            # Solo para el hash: se verifica antes de copiar
+            while lector.read(LECTURA):
+                pass
+            motivo = _motivo_rechazo(sesion, lector)
+            if not motivo:
+                _copiar_en_s3(rutas, destino)
+            return (None if motivo else destino), motivo
+        try:
+            destino = default_storage.save(destino, File(lector))
+        except Exception:
+            default_storage.delete(destino)
+            raise
+        motivo = _motivo_rechazo(sesion, lector)
+        if motivo:
+            default_storage.delete(destino)
+            return None, motivo
+        return destino, None
+
+def ensamblar(sesion_id) -> dict | None:
+    """
+    Tarea ensamblar_carga: arma el archivo de una sesión en "ensamblando", lo
+    verifica contra el tamaño y SHA-256 declarados y crea el Documento que lo
+    apunta (create_document_from_storage: no se vuelve a escribir; el OCR se
+    encola al confirmar). Si no coincide, la sesión se cancela; si algo falla,
+    vuelve a "abierta" para que el cliente reintente el finalizar.
+    """
+    sesion = SesionCarga.objects.select_related("empresa").filter(id=sesion_id, estado="ensamblando").first()
+    if sesion is None:
+        return None
+    destino = None
+    try:
+        destino, motivo = _armar(sesion)
+        with transaction.atomic():
+            sesion = SesionCarga.objects.select_for_update().select_related("empresa", "usuario").get(id=sesion.id)
+            if sesion.estado != "ensamblando":
+                if destino:
+                    transaction.on_commit(lambda: default_storage.delete(destino), robust=True)
+                return estado_carga(sesion)
+            if motivo:
+                log.warning("Carga %s cancelada: %s.", sesion.id, motivo)
+                sesion.estado = "cancelada"
+            else:
+                detalle = create_document_from_storage(
+                    destino, sesion.nombre_archivo, sesion.hash_sha256, sesion.tamano_bytes,
+                    sesion.empresa, subido_por=sesion.usuario, origen=sesion.origen,
+                )["resultados"][0]
+                if detalle["estado"] == "duplicado":
+                    # El mismo contenido llegó por otra vía mientras se armaba: este archivo sobra
+                    detalle["id"] = Documento.objects.filter(
+                        empresa=sesion.empresa, hash_sha256=sesion.hash_sha256
+                    ).values_list("id", flat=True).first()
+                    transaction.on_commit(lambda: default_storage.delete(destino), robust=True)
+                sesion.estado = "finalizada"
+                sesion.documento_id = detalle["id"]
+            sesion.save(update_fields=["estado", "documento", "actualizado_en"])
+            transaction.on_commit(lambda: _borrar_trozos(sesion), robust=True)
+    except Exception:
+        # Si la sesión no quedó finalizada, nada apunta al archivo armado
+        if not SesionCarga.objects.filter(id=sesion.id, estado="finalizada").exists():
+            if destino:
+                default_storage.delete(destino)
+            SesionCarga.objects.filter(id=sesion.id, estado="ensamblando").update(
+                estado="abierta", actualizado_en=timezone.now()
+            )
+        raise
+    return estado_carga(sesion)
+
+def cancelar_carga(sesion_id, empresa_ids) -> dict:
+    with transaction.atomic():
+        sesion = _sesion_bloqueada(sesion_id, empresa_ids)
+        if sesion.estado == "abierta":
+            sesion.estado = "cancelada"
+            sesion.save(update_fields=["estado", "actualizado_en"])
+            transaction.on_commit(lambda: _borrar_trozos(sesion))
+    return estado_carga(sesion)
+
+def limpiar_abandonadas(horas: int = HORAS_ABANDONO) -> int:
+    """
+    Cancela las sesiones abiertas sin actividad en `horas` y borra sus trozos
+    (u objeto). También las que quedaron "ensamblando" porque se perdió la tarea.
+    """
+    limite = timezone.now() - timedelta(hours=horas)
+    cantidad = 0
+    pendientes = SesionCarga.objects.filter(estado__in=("abierta", "ensamblando"), actualizado_en__lt=limite)
+    for sesion in pendientes.iterator():
+        if sesion.object_key:
+            # Subida directa con URL firmada que nunca se finalizó
+            default_storage.delete(sesion.object_key)
+        else:
+            _borrar_trozos(sesion)
+        sesion.estado = "cancelada"
+        sesion.save(update_fields=["estado", "actualizado_en"])
+        cantidad += 1
+    if cantidad:
+        log.info("Sesiones de carga abandonadas canceladas: %s", cantidad)
+    return cantidad
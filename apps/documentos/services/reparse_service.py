@@ -0,0 +1,205 @@
+# apps/documentos/services/reparse_service.py
+"""
+Re-parseo de documentos desde el texto ya guardado (Documento.texto_plano).
+
+Cuando cambia un extractor (y con él PARSER_VERSION) no hace falta volver a
+pasar los archivos por pdfminer/Tesseract: basta con correr parse_text (que
+incluye la reconciliación de montos) sobre el texto almacenado.
+
+- La tabla se recorre por id (keyset: `id > último`) en lotes, sin OFFSET.
+- Cada lote se parsea y se escribe con bulk_update (solo los campos que
+  cambiaron) en un pool de procesos (`workers`); el proceso principal solo
+  lee los lotes.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Documento
+from ..ocr.config import PARSER_VERSION
+from ..ocr.engines.ted import parse_ted
+from ..ocr.parsing import parse_text
+
+log = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+
+# Campos que reescribe el re-parseo (el texto, la fuente y el estado no cambian)
+REPARSE_FIELDS = [
+    "tipo_documento", "folio", "fecha_emision", "rut_proveedor", "razon_social_proveedor",
+    "monto_neto", "monto_exento", "iva", "total", "iva_tasa", "ocr_json",
+    "parser_version", "confianza_folio", "confianza_fecha",
+]
+
+def documentos_a_reparsear(empresa_id: int | None = None, desde=None, hasta=None,
+                           version_menor: int | None = PARSER_VERSION, confianza_menor: float | None = None):
+    """
+    Documentos con texto extraído (los XML no tienen: sus campos vienen del DTE).
+    `desde`/`hasta` filtran por fecha de carga. `version_menor` y
+    `confianza_menor` se combinan con OR: parseados con una versión anterior
+    (o sin versión registrada), o con folio o fecha de confianza menor. Ambos
+    en None = todos. Usan las columnas indexadas parser_version y confianza_*.
+    """
+    qs = Documento.objects.exclude(texto_plano="").exclude(ocr_fuente="xml")
+    if empresa_id:
+        qs = qs.filter(empresa_id=empresa_id)
+    if desde:
+        qs = qs.filter(creado_en__date__gte=desde)
+    if hasta:
+        qs = qs.filter(creado_en__date__lte=hasta)
+    criterio = Q()
+    if version_menor is not None:
+        criterio |= Q(parser_version__lt=version_menor) | Q(parser_version__isnull=True)
+    if confianza_menor is not None:
+        criterio |= Q(confianza_folio__lt=confianza_menor) | Q(confianza_fecha__lt=confianza_menor)
+    return qs.filter(criterio)
+
+def iter_lotes(qs, tamano: int = TAMANO_LOTE, despues_de: int = 0):
+    """
+    Lotes de filas (dicts con id, texto_plano, ted_xml y los valores actuales
+    de REPARSE_FIELDS) en orden de id, paginando por clave.
+    """
+    ultimo = despues_de
+    while True:
+        filas = list(
+            qs.filter(id__gt=ultimo).order_by("id")
+            .values("id", "texto_plano", "ted_xml", *REPARSE_FIELDS)[:tamano]
+        )
+        if not filas:
+            return
+        ultimo = filas[-1]["id"]
+        yield filas
+
+def _parsear(filas: list[dict]) -> list[tuple[int, dict]]:
+    """Corre parse_text sobre el texto guardado de cada fila y devuelve (id, campos)."""
+    resultados = []
+    for fila in filas:
+        ted = parse_ted(fila["ted_xml"]) if fila["ted_xml"] else None
+        try:
+            r = parse_text(fila["texto_plano"], ted=ted)
+        except Exception as e:
+            log.warning("No se pudo re-parsear el Documento %s: %s", fila["id"], e)
+            continue
+        resultados.append((fila["id"], {
+            "tipo_documento": r.tipo_documento or "desconocido",
+            "folio": r.folio,
+            "fecha_emision": r.fecha_emision,
+            "rut_proveedor": r.rut_proveedor,
+            "razon_social_proveedor": r.proveedor_nombre,
+            # Igual que _apply_parsed_data: los montos no encontrados quedan en 0
+            "monto_neto": Decimal(str(r.monto_neto or 0)),
+            "monto_exento": Decimal(str(r.monto_exento or 0)),
+            "iva": Decimal(str(r.iva or 0)),
+            "total": Decimal(str(r.total or 0)),
+            "iva_tasa": r.iva_tasa,
+            "parser_version": PARSER_VERSION,
+            "confianza_folio": r.confianza.get("folio"),
+            "confianza_fecha": r.confianza.get("fecha_emision"),
+            "confianza": r.confianza,
+        }))
+    return resultados
+
+def _guardar(resultados: list[tuple[int, dict]], actuales: dict) -> int:
+    """
+    Escribe el lote con bulk_update, solo los campos que cambiaron: bulk_update
+    arma un CASE por campo y fila, así que agrupar por campos cambiados lo
+    abarata mucho (lo común es que un ajuste de extractor toque uno o dos).
+    ocr_json siempre se escribe (fecha del re-parseo y confianza por campo).
+    Si un grupo choca con una restricción única se guarda de a uno y se omite el que choca.
+    """
+    ahora = timezone.now().isoformat()
+    grupos = {}
+    for doc_id, campos in resultados:
+        actual = actuales[doc_id]
+        ocr_json = actual["ocr_json"] or {}
+        confianza = campos.pop("confianza")
+        cambios = {f: v for f, v in campos.items() if v != actual[f]}
+        cambios["ocr_json"] = {
+            **ocr_json,
+            "parser_version": PARSER_VERSION,
+            "confianza": confianza,
+            "reparseo": {"en": ahora, "version_anterior": actual["parser_version"]},
+        }
+        grupos.setdefault(tuple(sorted(cambios)), []).append(Documento(pk=doc_id, **cambios))
+
+    guardados = 0
+    for fields, docs in grupos.items():
+        try:
+            with transaction.atomic():
+                Documento.objects.bulk_update(docs, fields, batch_size=TAMANO_LOTE)
+            guardados += len(docs)
+            continue
+        except IntegrityError:
+            log.warning("Conflicto de unicidad al re-parsear; guardando documentos de a uno.")
+        for doc in docs:
+            try:
+                with transaction.atomic():
+                    Documento.objects.filter(pk=doc.pk).update(**{f: getattr(doc, f) for f in fields})
+                guardados += 1
+            except IntegrityError as e:
+                log.error("Documento %s duplicaría otro tras re-parsear; se conserva como estaba: %s", doc.pk, e)
+    return guardados
+
+def reparsear_lote(filas: list[dict]) -> int:
+    """Parsea y guarda un lote de iter_lotes; devuelve cuántos documentos se actualizaron."""
+    return _guardar(_parsear(filas), {f["id"]: f for f in filas})
+
+def _init_worker():
+    import django
+    django.setup()
+
+def reparsear(qs, workers: int = 1, tamano: int = TAMANO_LOTE, despues_de: int = 0,
+              max_lotes: int | None = None, progreso=None) -> dict:
+    """
+    Re-parsea los documentos de `qs` desde `despues_de` (id exclusivo).
+
+    Con `workers` > 1 cada lote (parseo y bulk_update, ambos CPU de Python)
+    va a un pool de procesos con su propia conexión; el principal solo lee
+    los lotes, con a lo más dos en vuelo por proceso (la tabla nunca se
+    carga entera en memoria).
+    Los hijos daemon de Celery no pueden abrir procesos: la tarea usa workers=1.
+    `max_lotes` corta después de esa cantidad de lotes; `progreso(stats)` se
+    llama tras guardar cada lote. Devuelve totales y el último id procesado.
+    """
+    stats = {"leidos": 0, "actualizados": 0, "lotes": 0, "ultimo_id": despues_de, "completo": False}
+    lotes = iter_lotes(qs, tamano, despues_de)
+
+    def _registrar(filas, actualizados):
+        stats["leidos"] += len(filas)
+        stats["actualizados"] += actualizados
+        stats["lotes"] += 1
+        stats["ultimo_id"] = filas[-1]["id"]
+        if progreso:
+            progreso(stats)
+
+    def _siguiente():
+        if max_lotes is not None and stats["lotes"] + len(pendientes) >= max_lotes:
+            return None
+        filas = next(lotes, None)
+        if filas is None:
+            stats["completo"] = True
+        return filas
+
+    pendientes = deque()
+    if workers <= 1:
+        while filas := _siguiente():
+            _registrar(filas, reparsear_lote(filas))
+    else:
+        # Cada hijo abre su conexión; la del padre se cierra para que no la hereden abierta
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            while True:
+                while len(pendientes) < workers * 2 and (filas := _siguiente()):
+                    pendientes.append((filas, pool.submit(reparsear_lote, filas)))
+                if not pendientes:
+                    break
+                # En orden de id: ultimo_id solo deja atrás lotes ya guardados
+                filas, futuro = pendientes.popleft()
+                _registrar(filas, futuro.result())
+
+    return stats
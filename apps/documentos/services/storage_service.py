@@ -1,8 +1,174 @@
 # apps/documentos/services/storage_service.py
-def make_presigned_url(user, filename, content_type):
+"""
+Subida directa al object storage (S3 / MinIO) con URL firmada.
+
+El cliente pide una URL de PUT firmada (make_presigned_url), sube el archivo
+directo al bucket y llama a finalizar (finalize_presigned_upload). Los bytes
+nunca pasan por gunicorn: el web solo firma y después consulta el objeto.
+
+- La firma incluye ContentLength y ChecksumSHA256 (el sha256 declarado): el
+  storage rechaza un cuerpo de otro tamaño o contenido (BadDigest).
+- Al finalizar se verifica con HEAD (ChecksumMode=ENABLED) tamaño y checksum.
+  Si el proveedor no devuelve checksum la subida se rechaza: verificarla
+  obligaría a leer el objeto entero desde el web (queda cargas/ como alternativa).
+- La clave del objeto es la ruta definitiva del Documento.archivo
+  (documentos/<rut>/<año>/<mes>/...): finalizar no copia nada.
+
+Requiere STORAGES["default"] = S3Storage (AWS_STORAGE_BUCKET_NAME en el entorno).
+"""
+import base64
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from ..models import SesionCarga, Documento
+from ..ocr.utils import object_storage
+from .chunked_upload_service import CargaError, estado_carga, ruta_documento, validar_archivo
+from .upload_service import _empresa_del_usuario, create_document_from_storage
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # solo hace falta con object storage
+    boto3 = None
+
+log = logging.getLogger(__name__)
+
+def presign_habilitado() -> bool:
+    return boto3 is not None and object_storage.es_s3(default_storage)
+
+def _cliente():
+    """Cliente S3 con las credenciales y el endpoint del storage por defecto."""
+    return object_storage.cliente(default_storage)
+
+def _cliente_firma():
     """
-    Genera datos para URL firmada (S3/MinIO). Implementa con boto3/minio cuando quieras.
+    Cliente para firmar URLs. AWS_S3_PRESIGN_ENDPOINT_URL permite firmar con la
+    dirección que ve el cliente (p. ej. MinIO publicado fuera de docker) cuando
+    difiere de la que usa el servidor; sin ella se usa el mismo cliente.
     """
-    object_key = f"uploads/{user.id}/{filename}"
-    upload_url = "https://presigned-url-pendiente"  # TODO: reemplazar
-    return {"upload_url": upload_url, "object_key": object_key, "finalize_url": "/api/v1/documentos/"}
+    endpoint = getattr(settings, "AWS_S3_PRESIGN_ENDPOINT_URL", "")
+    if not endpoint:
+        return _cliente()
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        region_name=default_storage.region_name,
+        aws_access_key_id=default_storage.access_key,
+        aws_secret_access_key=default_storage.secret_key,
+        config=Config(signature_version="s3v4", s3={"addressing_style": default_storage.addressing_style or "path"}),
+    )
+
+def _s3_key(nombre: str) -> str:
+    return object_storage.clave(default_storage, nombre)
+
+def make_presigned_url(user, filename, content_type, tamano: int, sha256: str) -> dict:
+    """
+    Abre una subida directa: valida lo declarado, descarta duplicados por hash
+    y devuelve la URL de PUT firmada con los headers que el cliente debe enviar.
+    """
+    if not presign_habilitado():
+        raise CargaError("El storage no es S3/MinIO: use la subida por partes (cargas/).", status=501)
+    empresa = _empresa_del_usuario(user)
+    if not empresa:
+        raise CargaError("Debes crear primero una empresa o no tienes permisos en ninguna.")
+    nombre, sha256 = validar_archivo(filename, tamano, sha256)
+
+    existente = Documento.objects.filter(empresa=empresa, hash_sha256=sha256).values_list("id", flat=True).first()
+    if existente:
+        return {"estado": "duplicado", "documento_id": existente}
+
+    sesion = SesionCarga.objects.create(
+        empresa=empresa, usuario=user, origen="api",
+        nombre_archivo=nombre, tamano_bytes=tamano, hash_sha256=sha256,
+        object_key=ruta_documento(empresa, nombre),
+    )
+    checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+    content_type = content_type or "application/octet-stream"
+    expira = getattr(settings, "PRESIGNED_UPLOAD_EXPIRE", 900)
+    upload_url = _cliente_firma().generate_presigned_url(
+        "put_object",
+        Params={
+            "Bucket": default_storage.bucket_name,
+            "Key": _s3_key(sesion.object_key),
+            "ContentType": content_type,
+            "ContentLength": tamano,
+            "ChecksumSHA256": checksum,
+        },
+        ExpiresIn=expira,
+    )
+    return {
+        **estado_carga(sesion),
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": content_type, "x-amz-checksum-sha256": checksum},
+        "expira_en": expira,
+        "object_key": sesion.object_key,
+        "finalize_url": f"/api/v1/documentos/presign-upload/{sesion.id}/finalizar/",
+    }
+
+def _verificar_objeto(sesion: SesionCarga) -> str | None:
+    """Compara el objeto subido con lo declarado; devuelve el motivo si no coincide."""
+    try:
+        head = _cliente().head_object(Bucket=default_storage.bucket_name, Key=_s3_key(sesion.object_key), ChecksumMode="ENABLED")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            raise CargaError("El archivo aún no está en el storage.", status=409, **estado_carga(sesion))
+        raise
+    if head["ContentLength"] != sesion.tamano_bytes:
+        return f"tamaño {head['ContentLength']} distinto del declarado"
+
+    checksum = head.get("ChecksumSHA256") or ""
+    if not checksum or "-" in checksum:  # "-N" = checksum compuesto de una subida multiparte
+        log.warning("El storage no informó el ChecksumSHA256 de %s; se rechaza la subida.", sesion.object_key)
+        return "el storage no informó su sha256 (use la subida por partes, cargas/)"
+    return None if base64.b64decode(checksum).hex() == sesion.hash_sha256 else "sha256 distinto del declarado"
+
+def finalize_presigned_upload(sesion_id, empresa_ids) -> dict:
+    """
+    Verifica el objeto subido con la URL firmada y crea el Documento que lo
+    apunta (sin copiarlo); el OCR se encola al confirmar. Si no coincide con
+    lo declarado, el objeto se borra y la sesión se cancela.
+    """
+    error = None
+    with transaction.atomic():
+        sesion = (
+            SesionCarga.objects.select_for_update()
+            .filter(id=sesion_id, empresa_id__in=empresa_ids).exclude(object_key="")
+            .first()
+        )
+        if sesion is None:
+            raise CargaError("Subida no encontrada.", status=404)
+        if sesion.estado == "finalizada":
+            return estado_carga(sesion)
+        if sesion.estado != "abierta":
+            raise CargaError(f"La subida está {sesion.estado}.", status=409, **estado_carga(sesion))
+
+        motivo = _verificar_objeto(sesion)
+        if motivo:
+            sesion.estado = "cancelada"
+            error = CargaError(f"El archivo subido no coincide: {motivo}.", status=422)
+            transaction.on_commit(lambda: default_storage.delete(sesion.object_key))
+        else:
+            detalle = create_document_from_storage(
+                sesion.object_key, sesion.nombre_archivo, sesion.hash_sha256, sesion.tamano_bytes,
+                sesion.empresa, subido_por=sesion.usuario, origen=sesion.origen,
+            )["resultados"][0]
+            if detalle["estado"] == "duplicado":
+                # Otra subida del mismo archivo ganó la carrera: este objeto sobra
+                detalle["id"] = Documento.objects.filter(
+                    empresa=sesion.empresa, hash_sha256=sesion.hash_sha256
+                ).values_list("id", flat=True).first()
+                transaction.on_commit(lambda: default_storage.delete(sesion.object_key))
+            sesion.estado = "finalizada"
+            sesion.documento_id = detalle["id"]
+            sesion.recibido_bytes = sesion.tamano_bytes
+        sesion.save(update_fields=["estado", "documento", "recibido_bytes", "actualizado_en"])
+
+    if error:
+        error.extra = estado_carga(sesion)
+        raise error
+    return {**estado_carga(sesion), "resultado": detalle["estado"]}
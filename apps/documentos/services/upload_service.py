@@ -1,12 +1,29 @@
 # apps/documentos/services/upload_service.py
+import logging
+
 from django.db import transaction, IntegrityError
 from django.core.files.base import File
 from apps.empresas.models import Empresa, EmpresaUsuario
 from ..models import Documento
-from ..tasks.extract import extract_document
+from ..ocr.detectors.tipo_pdf import probe_pdf_kind
+from ..tasks.extract import enqueue_extract, enqueue_extract_batch
+
+log = logging.getLogger(__name__)
+
+# Filas por INSERT en la carga masiva
+BULK_SIZE = 500
+
+def ya_cargado(uploaded_file, empresa: Empresa) -> bool:
+    """
+    True si la empresa ya tiene un documento con el mismo contenido. Solo para
+    archivos con `sha256` calculado al recibirlos (ver uploadhandler.py): así
+    el duplicado se descarta sin escribirlo en el storage ni encolar el OCR.
+    """
+    sha256 = getattr(uploaded_file, "sha256", None)
+    return bool(sha256) and Documento.objects.filter(empresa=empresa, hash_sha256=sha256).exists()
 
 # -------------------- NUEVA FUNCIÓN REUTILIZABLE --------------------
-def handle_uploaded_file(uploaded_file: File, empresa: Empresa, subido_por=None, origen: str = "web"):
+def handle_uploaded_file(uploaded_file: File, empresa: Empresa, subido_por=None, origen: str = "web", encolar: bool = True):
     """
     Crea un objeto Documento a partir de un archivo subido.
     Esta función es genérica y puede ser usada por cualquier servicio.
@@ -15,8 +32,19 @@ def handle_uploaded_file(uploaded_file: File, empresa: Empresa, subido_por=None,
     :param empresa: La empresa a la que pertenece el documento.
     :param subido_por: (Opcional) El usuario que subió el archivo.
     :param origen: (Opcional) De dónde vino el archivo ('web', 'email', 'api').
-    :return: El objeto Documento creado.
+    :param encolar: (Opcional) Si es False no se encola el OCR; el llamador lo
+                    despacha en lote con enqueue_extract_batch.
+    :return: El objeto Documento creado, o None si ya existía.
     """
+    if ya_cargado(uploaded_file, empresa):
+        return None
+
+    # Sonda barata de las primeras páginas: decide motor (y cola) antes de encolar el OCR
+    tipo_pdf = ""
+    if (getattr(uploaded_file, "name", "") or "").lower().endswith(".pdf"):
+        uploaded_file.open("rb")
+        tipo_pdf = probe_pdf_kind(uploaded_file)
+
     try:
         with transaction.atomic():
             doc = Documento(
@@ -24,10 +52,14 @@ def handle_uploaded_file(uploaded_file: File, empresa: Empresa, subido_por=None,
                 subido_por=subido_por,
                 archivo=uploaded_file,
                 estado="pendiente",
-                origen=origen # Añadimos el origen para trazabilidad
+                origen=origen, # Añadimos el origen para trazabilidad
+                tipo_pdf=tipo_pdf,
+                # Hash calculado al recibir el archivo; si no viene, lo calcula save()
+                hash_sha256=getattr(uploaded_file, "sha256", ""),
             )
             doc.save()
-            extract_document.delay(doc.id)  # Lanza la tarea de OCR
+            if encolar:
+                enqueue_extract(doc)  # Lanza la tarea de OCR en su cola
             return doc
     except IntegrityError:
         # Podrías querer loggear esto. Significa que un archivo con el mismo nombre ya existe.
@@ -43,10 +75,136 @@ def _empresa_del_usuario(user):
     eu = EmpresaUsuario.objects.filter(usuario=user).select_related("empresa").first()
     return eu.empresa if eu else None
 
+def create_documents_bulk(files, empresa: Empresa, subido_por=None, origen: str = "web") -> dict:
+    """
+    Carga masiva: crea los documentos de muchos archivos con unas pocas
+    consultas en vez de varias por archivo.
+
+    - Hash de cada archivo (el que trae del upload handler, o se calcula).
+    - Duplicados (en la empresa o repetidos en la misma subida) con un solo IN.
+    - Inserción con bulk_create; el storage escribe cada archivo al insertarlo.
+      bulk_create no dispara post_save: se dejan en SII EN_PROCESO como lo
+      haría la señal, y la validación la lanza el lote de extracción.
+    - OCR despachado como un único group (enqueue_extract_batch).
+
+    Devuelve los totales y el resultado de cada archivo, en el orden recibido:
+    {"archivo", "estado": creado|duplicado|error, "id"?, "detalle"?}.
+    """
+    resultados = [{"archivo": getattr(f, "name", "archivo")} for f in files]
+    candidatos = []  # (índice, Documento)
+    for i, f in enumerate(files):
+        try:
+            tipo_pdf = ""
+            if (getattr(f, "name", "") or "").lower().endswith(".pdf"):
+                f.open("rb")
+                tipo_pdf = probe_pdf_kind(f)
+            doc = Documento(
+                empresa=empresa,
+                subido_por=subido_por,
+                archivo=f,
+                estado="pendiente",
+                origen=origen,
+                tipo_pdf=tipo_pdf,
+                hash_sha256=getattr(f, "sha256", ""),
+                sii_estado="EN_PROCESO",
+            )
+            doc.completar_metadatos()
+            candidatos.append((i, doc))
+        except Exception as e:
+            log.warning("No se pudo preparar %s: %s", resultados[i]["archivo"], e)
+            resultados[i].update(estado="error", detalle=str(e))
+    return _crear_candidatos(candidatos, resultados, empresa)
+
+def create_document_from_storage(nombre: str, nombre_original: str, sha256: str, tamano: int,
+                                 empresa: Empresa, subido_por=None, origen: str = "api") -> dict:
+    """
+    Crea el Documento de un archivo que ya está en el storage (subida directa
+    con URL firmada): no se escribe nada, solo se inserta la fila apuntando a
+    `nombre`, con el hash y tamaño ya verificados. Sin sonda de PDF (leer el
+    objeto aquí traería sus bytes al web); el worker la hace al extraer.
+    Devuelve el mismo formato que create_documents_bulk (un resultado).
+    """
+    doc = Documento(
+        empresa=empresa,
+        subido_por=subido_por,
+        archivo=nombre,
+        nombre_archivo_original=nombre_original,
+        estado="pendiente",
+        origen=origen,
+        hash_sha256=sha256,
+        tamano_bytes=tamano,
+        sii_estado="EN_PROCESO",
+    )
+    doc.completar_metadatos()
+    return _crear_candidatos([(0, doc)], [{"archivo": nombre_original}], empresa)
+
+def _crear_candidatos(candidatos: list[tuple[int, Documento]], resultados: list[dict], empresa: Empresa) -> dict:
+    """Descarta duplicados (un IN), inserta el resto y encola su OCR en un group."""
+    existentes = set(
+        Documento.objects.filter(empresa=empresa, hash_sha256__in={d.hash_sha256 for _i, d in candidatos})
+        .values_list("hash_sha256", flat=True)
+    )
+    crear = []
+    for i, doc in candidatos:
+        if doc.hash_sha256 in existentes:
+            resultados[i]["estado"] = "duplicado"
+            continue
+        existentes.add(doc.hash_sha256)
+        crear.append((i, doc))
+
+    creados = _insertar(crear, resultados)
+    # Si el llamador está dentro de una transacción, el OCR se encola al confirmarla
+    transaction.on_commit(lambda: enqueue_extract_batch(creados))
+
+    return {
+        "created": len(creados),
+        "skipped": sum(1 for r in resultados if r["estado"] == "duplicado"),
+        "errors": [f"{r['archivo']}: {r['detalle']}" for r in resultados if r["estado"] == "error"],
+        "created_ids": [d.id for d in creados],
+        "resultados": resultados,
+    }
+
+def _insertar(crear: list[tuple[int, Documento]], resultados: list[dict]) -> list[Documento]:
+    """
+    bulk_create de los nuevos; si otro proceso insertó alguno entretanto, se crean de a uno.
+    bulk_create escribe los archivos en el storage antes del INSERT (FileField.pre_save):
+    los que terminan como duplicado se borran para no dejarlos huérfanos. Los que ya
+    estaban en el storage (subida directa) los limpia quien los subió.
+    """
+    if not crear:
+        return []
+    docs = [d for _i, d in crear]
+    escritos = {id(d) for d in docs if not d.archivo._committed}
+    try:
+        with transaction.atomic():
+            Documento.objects.bulk_create(docs, batch_size=BULK_SIZE)
+        creados = crear
+    except IntegrityError:
+        log.warning("Conflicto de unicidad en la carga masiva; se crean de a uno.")
+        creados = []
+        for i, doc in crear:
+            try:
+                with transaction.atomic():
+                    Documento.objects.bulk_create([doc])
+                creados.append((i, doc))
+            except IntegrityError:
+                resultados[i]["estado"] = "duplicado"
+                if id(doc) in escritos:
+                    _borrar_archivo(doc)
+    for i, doc in creados:
+        resultados[i].update(estado="creado", id=doc.id)
+    return [d for _i, d in creados]
+
+def _borrar_archivo(doc: Documento) -> None:
+    try:
+        doc.archivo.delete(save=False)
+    except Exception as e:
+        log.warning("No se pudo borrar el archivo duplicado %s: %s", doc.archivo.name, e)
+
 def create_documents_from_files(user, FILES):
     """
-    Función original, ahora utiliza nuestro nuevo handler reutilizable.
-    Procesa archivos subidos desde una vista web por un usuario.
+    Procesa archivos subidos desde una vista web por un usuario, con la carga
+    masiva (create_documents_bulk).
     """
     empresa = _empresa_del_usuario(user)
     if not empresa:
@@ -56,16 +214,4 @@ def create_documents_from_files(user, FILES):
     if not files:
         return {"created": 0, "skipped": 0, "errors": ["No se recibieron archivos"]}
 
-    created, skipped, errors = 0, 0, []
-    for f in files:
-        try:
-            # Ahora llamamos a la nueva función centralizada
-            doc = handle_uploaded_file(f, empresa, subido_por=user, origen="web")
-            if doc:
-                created += 1
-            else:
-                skipped += 1
-        except Exception as e:
-            errors.append(f"{getattr(f,'name','archivo')}: {e}")
-
-    return {"created": created, "skipped": skipped, "errors": errors}
\ No newline at end of file
+    return create_documents_bulk(files, empresa, subido_por=user, origen="web")
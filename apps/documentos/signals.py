@@ -3,18 +3,11 @@ from django.dispatch import receiver
 from django.utils import timezone
 
 from .models import Documento
+from .ocr.schema import REQUIRED_FIELDS
 from apps.sii.tasks import check_and_kickoff_sii  # la definimos abajo
 
-REQUIRED_FIELDS = ("rut_proveedor", "folio", "total", "fecha_emision", "tipo_documento")
-
 def _has_required_fields(doc: Documento) -> bool:
-    return all([
-        bool(getattr(doc, "rut_proveedor", None)),
-        bool(getattr(doc, "folio", None)),
-        bool(getattr(doc, "total", None)),
-        bool(getattr(doc, "fecha_emision", None)),
-        bool(getattr(doc, "tipo_documento", None)),
-    ])
+    return all(getattr(doc, f, None) for f in REQUIRED_FIELDS)
 
 @receiver(post_save, sender=Documento)
 def documento_post_save(sender, instance: Documento, created: bool, **kwargs):
@@ -1,3 +1,5 @@
 # apps/documentos/tasks/__init__.py
 from .extract import *
-from .alerts import *
\ No newline at end of file
+from .alerts import *
+from .reparse import *
+from .cargas import *
@@ -0,0 +1,19 @@
+# apps/documentos/tasks/cargas.py
+
+from celery import shared_task
+import logging
+
+log = logging.getLogger(__name__)
+
+@shared_task(name="documentos.limpiar_cargas_abandonadas")
+def limpiar_cargas_abandonadas():
+    """Cancela las subidas por partes sin actividad y borra sus trozos del storage."""
+    # Import local: el servicio depende de upload_service, que importa las tareas
+    from apps.documentos.services.chunked_upload_service import limpiar_abandonadas
+    return {"canceladas": limpiar_abandonadas()}
+
+@shared_task(name="documentos.ensamblar_carga")
+def ensamblar_carga(sesion_id: str):
+    """Arma el archivo de una subida por partes finalizada, lo verifica y crea su Documento."""
+    from apps.documentos.services.chunked_upload_service import ensamblar
+    return ensamblar(sesion_id)
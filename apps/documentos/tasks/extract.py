@@ -1,19 +1,322 @@
 # apps/documentos/tasks/extract.py
 
-from celery import shared_task
-from django.db import transaction
+from celery import shared_task, group
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+import hashlib
 import logging
+from datetime import timedelta
 from decimal import Decimal
+from itertools import islice
 
 from apps.documentos.models import Documento
-from apps.sii.tasks import check_and_kickoff_sii
+from apps.sii.tasks import check_and_kickoff_sii, start_sii_validation_core
 
 # Importamos los dos motores de extracción
 from apps.documentos.ocr import parse_document  # Este es tu orquestador de OCR para PDFs
-from apps.documentos.ocr.engines.xml import extract_data_from_xml # El nuevo parser de XML
+from apps.documentos.ocr.cache import engine_stamp
+from apps.documentos.ocr.config import PARSER_VERSION
+from apps.documentos.ocr.schema import REQUIRED_FIELDS
+from apps.documentos.ocr.file_cache import local_path
+from apps.documentos.ocr.engines.xml import iter_dtes # Parser XML en streaming (un dict por DTE)
 
 log = logging.getLogger(__name__)
 
+# Colas de OCR (ver CELERY_TASK_ROUTES): XML y PDFs digitales son rápidos;
+# imágenes y PDFs escaneados/mixtos pasan por Tesseract y van aparte.
+OCR_FAST_QUEUE = "ocr-fast"
+OCR_HEAVY_QUEUE = "ocr-heavy"
+
+# Prioridad Redis (0 = más urgente): el usuario esperando en la web va primero
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_MASIVA = 6
+
+# Documentos por invocación de extract_documents_batch
+BATCH_SIZE = 25
+
+# Un documento en 'procesando' hace más que esto quedó huérfano (su worker murió) y el
+# barrido lo reclama. Mayor que el --time-limit del worker ocr-heavy (30 min).
+PROCESANDO_VENCIDO_MIN = 45
+
+# DTEs de un sobre EnvioDTE/EnvioBOLETA insertados por bulk_create
+XML_BULK_SIZE = 500
+
+# Campos que escribe la extracción (bulk_update del lote)
+EXTRACTED_FIELDS = [
+    "tipo_documento", "folio", "fecha_emision", "rut_proveedor", "razon_social_proveedor",
+    "monto_neto", "monto_exento", "iva", "total", "iva_tasa",
+    "texto_plano", "ocr_fuente", "ocr_engine", "ocr_version", "ocr_lang", "ocr_nivel", "ocr_json", "tipo_pdf", "estado", "ted_xml",
+    "parser_version", "confianza_folio", "confianza_fecha", "dte_sha256",
+]
+
+class UnsupportedFormat(Exception):
+    pass
+
+def ocr_queue_for(doc: Documento) -> str:
+    ext = (doc.extension or "").lower()
+    if ext == "xml" or (ext == "pdf" and doc.tipo_pdf == "digital"):
+        return OCR_FAST_QUEUE
+    return OCR_HEAVY_QUEUE
+
+def _prioridad(doc: Documento) -> int:
+    return PRIORIDAD_INTERACTIVA if doc.origen == "web" else PRIORIDAD_MASIVA
+
+def enqueue_extract(doc: Documento):
+    """
+    Encola extract_document en la cola que corresponde al documento, con
+    prioridad alta si viene de una subida web y baja si llegó en lote (correo).
+    """
+    return extract_document.apply_async(args=[doc.id], queue=ocr_queue_for(doc), priority=_prioridad(doc))
+
+def enqueue_extract_batch(docs):
+    """
+    Encola los documentos en lotes de BATCH_SIZE, uno por cola/prioridad,
+    en vez de un mensaje por documento. Todos los lotes salen en un único group.
+    """
+    grupos = {}
+    for doc in docs:
+        grupos.setdefault((ocr_queue_for(doc), _prioridad(doc)), []).append(doc.id)
+    firmas = [
+        extract_documents_batch.si(documento_ids=ids[i:i + BATCH_SIZE]).set(queue=queue, priority=prioridad)
+        for (queue, prioridad), ids in grupos.items()
+        for i in range(0, len(ids), BATCH_SIZE)
+    ]
+    if firmas:
+        group(firmas).apply_async()
+
+def _extract_fields(doc: Documento) -> tuple[dict | None, str]:
+    """
+    Determina si el archivo es PDF/imagen o XML, corre el motor que
+    corresponde y devuelve (datos extraídos, texto plano).
+    """
+    # DTE creado desde un sobre (ver _insertar_dtes): el archivo es el del sobre
+    xml_sobre = (doc.ocr_json or {}).get("xml") or {}
+    archivo_sha256 = xml_sobre.get("archivo_sha256")
+    # Storage remoto: copia local en el caché del host (por el hash del archivo)
+    path = local_path(doc.archivo, archivo_sha256 or doc.hash_sha256)
+    documento_id = doc.id
+
+    # --- NUEVA LÓGICA DE SELECCIÓN DE MOTOR ---
+    if path.lower().endswith('.xml'):
+        log.info("Detectado archivo XML para Documento %s. Usando parser XML.", documento_id)
+        dtes = iter_dtes(path)
+        if archivo_sha256:
+            # Se relee solo su DTE: los demás del sobre ya tienen su Documento
+            parsed_data = next((d for d in dtes if d["xml"]["indice"] == xml_sobre["indice"]), None)
+            dtes = None
+        else:
+            parsed_data = next(dtes, None)
+        if not parsed_data:
+            return None, ""
+        # El primer DTE llena este Documento; el resto de un sobre se lee después
+        # (en streaming) con _crear_documentos_dte. El XML no se copia a texto_plano:
+        # queda en el archivo y ocr_json["xml"] apunta al DTE dentro de él.
+        parsed_data["ocr_json"] = {"xml": parsed_data.pop("xml")}
+        if archivo_sha256:
+            parsed_data["ocr_json"]["xml"]["archivo_sha256"] = archivo_sha256
+        parsed_data["dtes_restantes"] = dtes
+        return parsed_data, ""
+
+    if path.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg')):
+        log.info("Detectado archivo PDF/Imagen para Documento %s. Usando motor OCR.", documento_id)
+        # parse_document devuelve un objeto y el texto plano
+        parsed_result_obj, raw_text = parse_document(
+            path, sha256=doc.hash_sha256, tipo_pdf=doc.tipo_pdf or None
+        )
+        if not parsed_result_obj:
+            return None, raw_text
+        # Convertimos el objeto a un diccionario para unificar el manejo
+        return {
+            "tipo_documento": parsed_result_obj.tipo_documento,
+            "folio": parsed_result_obj.folio,
+            "fecha_emision": parsed_result_obj.fecha_emision,
+            "rut_proveedor": parsed_result_obj.rut_proveedor,
+            "proveedor_nombre": parsed_result_obj.proveedor_nombre,
+            "monto_neto": parsed_result_obj.monto_neto,
+            "monto_exento": parsed_result_obj.monto_exento,
+            "iva": parsed_result_obj.iva,
+            "total": parsed_result_obj.total,
+            "iva_tasa": parsed_result_obj.iva_tasa,
+            "fuente_texto": parsed_result_obj.fuente_texto,
+            "ted": parsed_result_obj.ted,
+            "confianza": parsed_result_obj.confianza,
+            "ocr_json": parsed_result_obj.meta or None,
+        }, raw_text
+
+    raise UnsupportedFormat(path)
+
+def _apply_parsed_data(doc: Documento, parsed_data: dict, raw_text: str):
+    """Asigna al Documento (sin guardar) los campos desde el diccionario 'parsed_data'."""
+    doc.tipo_documento = parsed_data.get('tipo_documento', 'desconocido')
+    doc.folio = parsed_data.get('folio')
+    doc.fecha_emision = parsed_data.get('fecha_emision')
+    doc.rut_proveedor = parsed_data.get('rut_proveedor')
+    doc.razon_social_proveedor = parsed_data.get('proveedor_nombre')
+
+    # Convertir a Decimal de forma segura
+    doc.monto_neto = Decimal(str(parsed_data.get('monto_neto') or 0))
+    doc.monto_exento = Decimal(str(parsed_data.get('monto_exento') or 0))
+    doc.iva = Decimal(str(parsed_data.get('iva') or 0))
+    doc.total = Decimal(str(parsed_data.get('total') or 0))
+
+    iva_tasa = parsed_data.get('iva_tasa')
+    doc.iva_tasa = Decimal(str(iva_tasa)) if iva_tasa is not None else None
+    doc.ted_xml = parsed_data.get('ted') or ""
+
+    # Guardar campos de auditoría
+    doc.texto_plano = raw_text
+    doc.ocr_fuente = parsed_data.get('fuente_texto', 'desconocido')
+    doc.ocr_engine, doc.ocr_version, doc.ocr_lang = engine_stamp(doc.ocr_fuente)
+    doc.ocr_json = parsed_data.get('ocr_json')
+    # Nivel de la extracción escalonada en que terminó (los XML no escalan)
+    doc.ocr_nivel = "xml" if doc.ocr_fuente == "xml" else (doc.ocr_json or {}).get('ocr_nivel', '')
+
+    # Versión del parser y confianza por campo: permiten elegir qué re-extraer
+    confianza = parsed_data.get('confianza') or {}
+    doc.parser_version = PARSER_VERSION
+    doc.confianza_folio = confianza.get('folio')
+    doc.confianza_fecha = confianza.get('fecha_emision')
+    if confianza:
+        doc.ocr_json = {**(doc.ocr_json or {}), "confianza": confianza}
+    if not doc.tipo_pdf:
+        doc.tipo_pdf = (parsed_data.get('ocr_json') or {}).get('tipo_pdf', '')
+    # DTE de un XML: hash de su forma canónica, para reconocerlo suelto o dentro de un sobre
+    doc.dte_sha256 = ((parsed_data.get('ocr_json') or {}).get('xml') or {}).get('sha256', '')
+
+    doc.estado = "procesado"
+
+def hash_dte_en_sobre(archivo_sha256: str, indice: int) -> str:
+    """
+    hash_sha256 de un Documento creado desde el DTE `indice` de un sobre. El
+    archivo es el del sobre, cuyo hash ya lleva el Documento de origen (y es
+    único por empresa): se deriva uno del hash del archivo y la posición, que
+    nunca calza con el de un archivo subido. El del archivo queda en
+    ocr_json["xml"]["archivo_sha256"]; el DTE se reconoce por dte_sha256.
+    """
+    return hashlib.sha256(f"{archivo_sha256}:{indice}".encode()).hexdigest()
+
+def _insertar_dtes(origen: Documento, lote: list[dict]) -> list[Documento]:
+    """
+    Crea un Documento por DTE del lote con bulk_create. Todos apuntan al mismo
+    archivo que `origen` (el sobre); se omiten los que ya existen para la empresa
+    (mismo DTE, suelto o de otro sobre, o mismo folio/proveedor/tipo) o se repiten
+    dentro del sobre.
+    """
+    nuevos = []
+    for data in lote:
+        xml = {**data.pop("xml"), "archivo_sha256": origen.hash_sha256}
+        data["ocr_json"] = {"xml": xml}
+        doc = Documento(
+            empresa_id=origen.empresa_id,
+            subido_por_id=origen.subido_por_id,
+            archivo=origen.archivo.name,
+            nombre_archivo_original=origen.nombre_archivo_original,
+            extension=origen.extension,
+            es_pdf=False,
+            origen=origen.origen,
+            mime_type=origen.mime_type,
+            tamano_bytes=origen.tamano_bytes,
+            hash_sha256=hash_dte_en_sobre(origen.hash_sha256, xml["indice"]),
+            # bulk_create no dispara post_save: se deja como lo dejaría la señal
+            sii_estado="EN_PROCESO",
+        )
+        _apply_parsed_data(doc, data, "")
+        nuevos.append(doc)
+
+    hashes = set(
+        Documento.objects.filter(empresa_id=origen.empresa_id, dte_sha256__in=[d.dte_sha256 for d in nuevos])
+        .values_list("dte_sha256", flat=True)
+    )
+    folios = set(
+        Documento.objects.filter(empresa_id=origen.empresa_id, folio__in=[d.folio for d in nuevos if d.folio])
+        .values_list("rut_proveedor", "tipo_documento", "folio")
+    )
+    crear = []
+    for doc in nuevos:
+        clave = (doc.rut_proveedor, doc.tipo_documento, doc.folio)
+        if doc.dte_sha256 in hashes or (doc.folio and clave in folios):
+            continue
+        hashes.add(doc.dte_sha256)
+        if doc.folio:
+            folios.add(clave)
+        crear.append(doc)
+    if not crear:
+        return []
+
+    try:
+        with transaction.atomic():
+            return Documento.objects.bulk_create(crear, batch_size=XML_BULK_SIZE)
+    except IntegrityError:
+        # Otro proceso insertó alguno entre la consulta y el insert
+        log.warning("Conflicto de unicidad al crear DTEs del sobre %s; se crean de a uno.", origen.id)
+    creados = []
+    for doc in crear:
+        try:
+            with transaction.atomic():
+                creados.extend(Documento.objects.bulk_create([doc]))
+        except IntegrityError:
+            log.info("DTE %s ya existía para la empresa %s; se omite.", doc.dte_sha256, origen.empresa_id)
+    return creados
+
+def _crear_documentos_dte(origen: Documento, dtes) -> list[Documento]:
+    """
+    Recorre los DTE restantes de un sobre (iterador de iter_dtes) y los inserta
+    en lotes de XML_BULK_SIZE. Anota en el Documento de origen cuántos DTE traía el archivo.
+    """
+    if dtes is None:
+        return []
+    creados, leidos = [], 1
+    while lote := list(islice(dtes, XML_BULK_SIZE)):
+        leidos += len(lote)
+        creados.extend(_insertar_dtes(origen, lote))
+    if leidos > 1:
+        ocr_json = origen.ocr_json or {}
+        origen.ocr_json = {**ocr_json, "xml": {**ocr_json.get("xml", {}), "dtes_en_archivo": leidos}}
+        Documento.objects.filter(pk=origen.pk).update(ocr_json=origen.ocr_json)
+        log.info("Sobre XML del Documento %s: %s DTE, %s documentos nuevos.", origen.id, leidos, len(creados))
+    return creados
+
+def _validar_sii(docs: list[Documento]) -> int:
+    """
+    Lanza la validación SII de los documentos con los campos mínimos, como un
+    único group, al confirmar la transacción (antes los workers SII no los verían).
+    """
+    validar = [
+        doc.id for doc in docs
+        if doc.estado == "procesado" and all(getattr(doc, f, None) for f in REQUIRED_FIELDS)
+    ]
+    if validar:
+        transaction.on_commit(lambda: group(start_sii_validation_core.s(doc_id) for doc_id in validar).apply_async())
+    return len(validar)
+
+def _separar_duplicados(docs: list[Documento]) -> list[Documento]:
+    """
+    Marca 'duplicado' (sin guardar) los DTE XML que la empresa ya tiene, suelto o
+    dentro de un sobre (mismo dte_sha256), o que se repiten en `docs`. Esos
+    Documentos no reciben los campos del DTE; ocr_json["duplicado_de"] apunta al
+    existente. Devuelve los marcados.
+    """
+    con_dte = [d for d in docs if d.dte_sha256]
+    if not con_dte:
+        return []
+    existentes = {
+        (empresa_id, sha): doc_id
+        for empresa_id, sha, doc_id in Documento.objects.filter(
+            empresa_id__in={d.empresa_id for d in con_dte}, dte_sha256__in={d.dte_sha256 for d in con_dte}
+        ).exclude(id__in=[d.id for d in con_dte]).values_list("empresa_id", "dte_sha256", "id")
+    }
+    duplicados = []
+    for doc in con_dte:
+        clave = (doc.empresa_id, doc.dte_sha256)
+        if clave in existentes:
+            doc.estado = "duplicado"
+            doc.ocr_json = {**(doc.ocr_json or {}), "duplicado_de": existentes[clave]}
+            duplicados.append(doc)
+        else:
+            existentes[clave] = doc.id
+    return duplicados
+
 @shared_task(bind=True, max_retries=0, default_retry_delay=10)
 def extract_document(self, documento_id: int):
     """
@@ -23,91 +326,153 @@ def extract_document(self, documento_id: int):
     try:
         doc = Documento.objects.get(pk=documento_id)
         doc.estado = "procesando"
-        doc.save(update_fields=['estado'])
+        doc.procesando_desde = timezone.now()
+        doc.save(update_fields=['estado', 'procesando_desde'])
     except Documento.DoesNotExist:
         log.error("Documento %s no existe al iniciar la tarea.", documento_id)
         return
 
-    path = doc.archivo.path
-    parsed_data = None
-    raw_text = ""
-
     try:
-        # --- NUEVA LÓGICA DE SELECCIÓN DE MOTOR ---
-        if path.lower().endswith('.xml'):
-            log.info("Detectado archivo XML para Documento %s. Usando parser XML.", documento_id)
-            parsed_data = extract_data_from_xml(path)
-            # El raw_text ya viene dentro del diccionario de datos del XML
-            raw_text = parsed_data.get("raw_text", "") if parsed_data else ""
-
-        elif path.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg')):
-            log.info("Detectado archivo PDF/Imagen para Documento %s. Usando motor OCR.", documento_id)
-            # parse_document devuelve un objeto y el texto plano
-            parsed_result_obj, raw_text = parse_document(path)
-            
-            # Convertimos el objeto a un diccionario para unificar el manejo
-            if parsed_result_obj:
-                parsed_data = {
-                    "tipo_documento": parsed_result_obj.tipo_documento,
-                    "folio": parsed_result_obj.folio,
-                    "fecha_emision": parsed_result_obj.fecha_emision,
-                    "rut_proveedor": parsed_result_obj.rut_proveedor,
-                    "proveedor_nombre": parsed_result_obj.proveedor_nombre,
-                    "monto_neto": parsed_result_obj.monto_neto,
-                    "monto_exento": parsed_result_obj.monto_exento,
-                    "iva": parsed_result_obj.iva,
-                    "total": parsed_result_obj.total,
-                    "iva_tasa": parsed_result_obj.iva_tasa,
-                    "fuente_texto": parsed_result_obj.fuente_texto,
-                }
-        else:
-            log.warning("Formato de archivo no soportado para Documento %s: %s", documento_id, path)
+        try:
+            parsed_data, raw_text = _extract_fields(doc)
+        except UnsupportedFormat:
+            log.warning("Formato de archivo no soportado para Documento %s: %s", documento_id, doc.archivo.name)
             doc.estado = "error_formato"
             doc.save(update_fields=['estado'])
             return
-        
-        # --- FIN DE LA NUEVA LÓGICA ---
 
         if not parsed_data:
             raise ValueError("La extracción de datos no devolvió resultados.")
 
         with transaction.atomic():
             doc_to_update = Documento.objects.get(pk=documento_id)
-            
-            # Asignar campos desde el diccionario 'parsed_data'
-            doc_to_update.tipo_documento = parsed_data.get('tipo_documento', 'desconocido')
-            doc_to_update.folio = parsed_data.get('folio')
-            doc_to_update.fecha_emision = parsed_data.get('fecha_emision')
-            doc_to_update.rut_proveedor = parsed_data.get('rut_proveedor')
-            doc_to_update.razon_social_proveedor = parsed_data.get('proveedor_nombre')
-            
-            # Convertir a Decimal de forma segura
-            doc_to_update.monto_neto = Decimal(str(parsed_data.get('monto_neto') or 0))
-            doc_to_update.monto_exento = Decimal(str(parsed_data.get('monto_exento') or 0))
-            doc_to_update.iva = Decimal(str(parsed_data.get('iva') or 0))
-            doc_to_update.total = Decimal(str(parsed_data.get('total') or 0))
-            
-            iva_tasa = parsed_data.get('iva_tasa')
-            doc_to_update.iva_tasa = Decimal(str(iva_tasa)) if iva_tasa is not None else None
-
-            # Guardar campos de auditoría
-            doc_to_update.texto_plano = raw_text
-            doc_to_update.ocr_fuente = parsed_data.get('fuente_texto', 'desconocido')
-            doc_to_update.ocr_engine = "lxml" if doc_to_update.ocr_fuente == "xml" else "Tesseract"
-            
-            doc_to_update.estado = "procesado"
-            doc_to_update.save()
-
-            log.info(
-                "Documento %s procesado y GUARDADO CORRECTAMENTE (Fuente: %s, Total: %s)",
-                documento_id, doc_to_update.ocr_fuente, doc_to_update.total
-            )
-
-            # Lanzar la siguiente tarea en la cadena: la validación con el SII
-            check_and_kickoff_sii.apply_async(args=[doc_to_update.id], countdown=1)
+            _apply_parsed_data(doc_to_update, parsed_data, raw_text)
+
+            if _separar_duplicados([doc_to_update]):
+                # Sin save(): los campos del DTE ya están en el otro Documento
+                Documento.objects.filter(pk=documento_id).update(estado=doc_to_update.estado, ocr_json=doc_to_update.ocr_json)
+                log.info("Documento %s: el DTE ya estaba cargado (Documento %s).",
+                         documento_id, doc_to_update.ocr_json["duplicado_de"])
+            else:
+                doc_to_update.save()
+                log.info(
+                    "Documento %s procesado y GUARDADO CORRECTAMENTE (Fuente: %s, Total: %s)",
+                    documento_id, doc_to_update.ocr_fuente, doc_to_update.total
+                )
+                # Lanzar la siguiente tarea en la cadena: la validación con el SII
+                transaction.on_commit(lambda: check_and_kickoff_sii.apply_async(args=[documento_id], countdown=1))
+
+        # Sobre EnvioDTE/EnvioBOLETA: un Documento más por cada DTE restante. Fuera de la
+        # transacción del primero: un DTE con problemas no revierte lo ya guardado.
+        try:
+            _validar_sii(_crear_documentos_dte(doc_to_update, parsed_data.get("dtes_restantes")))
+        except Exception as e:
+            log.exception("Error al crear los DTE del sobre XML %s: %s", documento_id, e)
 
     except Exception as e:
         log.exception("Error CRÍTICO al procesar o guardar el documento %s: %s", documento_id, e)
         # Revertir el estado a 'error'
         doc.estado = "error_extraccion"
-        doc.save(update_fields=['estado'])
\ No newline at end of file
+        doc.save(update_fields=['estado'])
+
+def _claim_pending(documento_ids, limit: int, antiguedad_min: int) -> list[Documento]:
+    """
+    Reclama documentos pendientes con SELECT ... FOR UPDATE SKIP LOCKED y los
+    marca 'procesando': dos workers nunca toman el mismo documento.
+
+    El barrido (sin `documento_ids`) toma además los que siguen en 'procesando'
+    hace más de PROCESANDO_VENCIDO_MIN: su worker murió sin terminarlos.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        qs = Documento.objects.select_for_update(skip_locked=True)
+        if documento_ids:
+            qs = qs.filter(estado="pendiente", id__in=documento_ids)
+        else:
+            vencido = Q(procesando_desde__lt=ahora - timedelta(minutes=PROCESANDO_VENCIDO_MIN)) | Q(procesando_desde__isnull=True)
+            qs = qs.filter(Q(estado="pendiente") | (Q(estado="procesando") & vencido))
+        if antiguedad_min:
+            qs = qs.filter(creado_en__lt=ahora - timedelta(minutes=antiguedad_min))
+        docs = list(qs.order_by("id")[:limit])
+        Documento.objects.filter(id__in=[d.id for d in docs]).update(estado="procesando", procesando_desde=ahora)
+    return docs
+
+def _write_batch(docs: list[Documento]):
+    """bulk_update del lote; si un documento choca con una restricción única, se guardan de a uno."""
+    try:
+        with transaction.atomic():
+            Documento.objects.bulk_update(docs, EXTRACTED_FIELDS, batch_size=BATCH_SIZE)
+        return
+    except IntegrityError:
+        log.warning("Conflicto de unicidad en el lote; guardando documentos de a uno.")
+    for doc in docs:
+        try:
+            with transaction.atomic():
+                Documento.objects.filter(pk=doc.pk).update(**{f: getattr(doc, f) for f in EXTRACTED_FIELDS})
+        except IntegrityError as e:
+            log.error("Documento %s duplicado tras la extracción: %s", doc.id, e)
+            doc.estado = "error_extraccion"
+            Documento.objects.filter(pk=doc.pk).update(estado=doc.estado)
+
+@shared_task(bind=True, max_retries=0)
+def extract_documents_batch(self, documento_ids: list[int] | None = None, limit: int = BATCH_SIZE, antiguedad_min: int = 0):
+    """
+    Extrae varios documentos en una sola invocación del worker.
+
+    - Reclama hasta `limit` documentos pendientes (de `documento_ids`, o los
+      pendientes hace más de `antiguedad_min` minutos) sin bloquear a otros workers.
+    - Los extrae uno tras otro reutilizando el estado ya cargado de los motores.
+    - Escribe los resultados con bulk_update (sin señales por documento).
+    - Lanza la validación SII de todos los listos como un único group.
+    """
+    if documento_ids:
+        limit = max(limit, len(documento_ids))
+    docs = _claim_pending(documento_ids, limit, antiguedad_min)
+    if not docs:
+        return {"ok": True, "procesados": 0}
+
+    listos, fallidos, sobres = [], [], []
+    for doc in docs:
+        try:
+            parsed_data, raw_text = _extract_fields(doc)
+            if not parsed_data:
+                raise ValueError("La extracción de datos no devolvió resultados.")
+            _apply_parsed_data(doc, parsed_data, raw_text)
+            listos.append(doc)
+            if parsed_data.get("dtes_restantes") is not None:
+                sobres.append((doc, parsed_data["dtes_restantes"]))
+        except UnsupportedFormat:
+            log.warning("Formato de archivo no soportado para Documento %s: %s", doc.id, doc.archivo.name)
+            doc.estado = "error_formato"
+            fallidos.append(doc)
+        except Exception as e:
+            log.exception("Error CRÍTICO al procesar el documento %s: %s", doc.id, e)
+            doc.estado = "error_extraccion"
+            fallidos.append(doc)
+
+    # DTE XML que la empresa ya tenía: solo se guarda el estado
+    duplicados = _separar_duplicados(listos)
+    listos = [doc for doc in listos if doc.estado == "procesado"]
+    if listos:
+        _write_batch(listos)
+    if fallidos:
+        Documento.objects.bulk_update(fallidos, ["estado"])
+    if duplicados:
+        Documento.objects.bulk_update(duplicados, ["estado", "ocr_json"])
+
+    # Los DTE restantes de cada sobre XML, una vez guardado el Documento de origen
+    nuevos = []
+    for doc, dtes in sobres:
+        if doc.estado not in ("procesado", "duplicado"):
+            continue
+        try:
+            nuevos.extend(_crear_documentos_dte(doc, dtes))
+        except Exception as e:
+            log.exception("Error al crear los DTE del sobre XML %s: %s", doc.id, e)
+
+    validar = _validar_sii(listos + nuevos)
+
+    log.info("Lote de extracción: %s procesados, %s con error, %s duplicados, %s DTE de sobres XML, %s a validación SII",
+             len(listos), len(fallidos), len(duplicados), len(nuevos), validar)
+    return {"ok": True, "procesados": len(listos), "errores": len(fallidos), "duplicados": len(duplicados),
+            "dtes": len(nuevos), "sii": validar}
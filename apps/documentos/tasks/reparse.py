@@ -0,0 +1,38 @@
+# apps/documentos/tasks/reparse.py
+
+from celery import shared_task
+import logging
+
+from apps.documentos.ocr.config import PARSER_VERSION
+from apps.documentos.services.reparse_service import documentos_a_reparsear, reparsear
+
+log = logging.getLogger(__name__)
+
+# Lotes por invocación; luego la tarea se re-encola desde el último id. Sin ruta
+# propia va a la cola por defecto (worker general), no a las colas de OCR.
+LOTES_POR_TAREA = 20
+
+@shared_task(bind=True, max_retries=0)
+def reparse_documents(self, empresa_id: int | None = None, desde: str | None = None, hasta: str | None = None,
+                      version_menor: int | None = None, confianza_menor: float | None = None,
+                      todas: bool = False, despues_de: int = 0):
+    """
+    Re-parsea desde texto_plano (sin OCR) los documentos del filtro, de a
+    LOTES_POR_TAREA lotes. Si quedan más, se vuelve a encolar con el último id
+    procesado: ninguna invocación queda corriendo horas y un worker caído
+    solo repite su tramo. Ver services/reparse_service.py.
+    """
+    qs = documentos_a_reparsear(
+        empresa_id=empresa_id, desde=desde, hasta=hasta,
+        version_menor=None if todas else (version_menor or PARSER_VERSION),
+        confianza_menor=None if todas else confianza_menor,
+    )
+    stats = reparsear(qs, despues_de=despues_de, max_lotes=LOTES_POR_TAREA)
+    log.info("Re-parseo: %s documentos actualizados hasta el id %s.", stats["actualizados"], stats["ultimo_id"])
+    if not stats["completo"]:
+        reparse_documents.apply_async(kwargs={
+            "empresa_id": empresa_id, "desde": desde, "hasta": hasta,
+            "version_menor": version_menor, "confianza_menor": confianza_menor,
+            "todas": todas, "despues_de": stats["ultimo_id"],
+        })
+    return stats
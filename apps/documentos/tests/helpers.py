@@ -0,0 +1,60 @@
+import itertools
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from apps.documentos.models import Documento
+from apps.empresas.models import Empresa
+
+_secuencia = itertools.count(1)
+
+def crear_empresa(rut: str = "76000000-0") -> Empresa:
+    return Empresa.objects.create(rut=rut, razon_social=f"Empresa {rut}")
+
+def crear_documento(empresa: Empresa, **campos) -> Documento:
+    """
+    Inserta un Documento con bulk_create, como la carga masiva, para no disparar
+    la señal post_save (encola SII). Sin `archivo` queda un nombre sin archivo
+    real en el storage; con un File se guarda en MEDIA_ROOT.
+    """
+    n = next(_secuencia)
+    campos.setdefault("archivo", f"documentos/test/{n}.pdf")
+    campos.setdefault("hash_sha256", f"{n:064x}")
+    doc = Documento(empresa=empresa, **campos)
+    doc.extension = doc.archivo.name.rsplit(".", 1)[-1]
+    doc.es_pdf = doc.extension == "pdf"
+    return Documento.objects.bulk_create([doc])[0]
+
+class MediaTemporal:
+    """Mixin de TestCase: MEDIA_ROOT en un directorio temporal que se borra al terminar."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+def _dte(folio: int, total: int = 1190) -> str:
+    neto = round(total / 1.19)
+    return (
+        '<DTE version="1.0"><Documento ID="F{f}T33"><Encabezado>'
+        "<IdDoc><TipoDTE>33</TipoDTE><Folio>{f}</Folio><FchEmis>2024-05-0{d}</FchEmis></IdDoc>"
+        "<Emisor><RUTEmisor>76123456-0</RUTEmisor><RznSoc>COMERCIAL LOS ANDES SPA</RznSoc></Emisor>"
+        "<Totales><MntNeto>{n}</MntNeto><TasaIVA>19</TasaIVA><IVA>{i}</IVA><MntTotal>{t}</MntTotal></Totales>"
+        '</Encabezado><TED version="1.0"><DD><RE>76123456-0</RE><F>{f}</F></DD></TED></Documento></DTE>'
+    ).format(f=folio, d=folio % 9 + 1, n=neto, i=total - neto, t=total)
+
+def sobre(*folios: int) -> bytes:
+    dtes = "".join(_dte(f) for f in folios)
+    return (
+        '<?xml version="1.0" encoding="ISO-8859-1"?>'
+        '<EnvioDTE xmlns="http://www.sii.cl/SiiDte" version="1.0">'
+        f'<SetDTE ID="SetDoc"><Caratula version="1.0"><RutEmisor>76123456-0</RutEmisor></Caratula>{dtes}</SetDTE>'
+        "</EnvioDTE>"
+    ).encode("latin-1")
+
+def dte_suelto(folio: int) -> bytes:
+    return _dte(folio).replace("<DTE ", '<DTE xmlns="http://www.sii.cl/SiiDte" ', 1).encode()
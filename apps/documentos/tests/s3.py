@@ -0,0 +1,33 @@
+"""Bucket S3 falso (moto) para los tests del storage; se omiten si moto no está instalado."""
+import unittest
+
+try:
+    import boto3
+    from moto import mock_aws
+    from storages.backends.s3 import S3Storage
+except ImportError:  # moto / django-storages solo hacen falta para estos tests
+    mock_aws = None
+
+BUCKET = "sgidt-test"
+
+requiere_moto = unittest.skipUnless(mock_aws, "moto y django-storages no están instalados")
+
+class BucketFalso:
+    """Mixin de TestCase: self.storage es un S3Storage sobre un bucket moto, con AWS_LOCATION."""
+
+    location = "media"
+
+    def setUp(self):
+        super().setUp()
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        self.storage = S3Storage(
+            bucket_name=BUCKET, location=self.location, region_name="us-east-1",
+            access_key="test", secret_key="test", file_overwrite=False,
+        )
+
+    def claves(self) -> list[str]:
+        respuesta = boto3.client("s3", region_name="us-east-1").list_objects_v2(Bucket=BUCKET)
+        return [o["Key"] for o in respuesta.get("Contents", [])]
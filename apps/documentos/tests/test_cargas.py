@@ -0,0 +1,348 @@
+import hashlib
+import io
+import os
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.documentos.api.v1.views import CargaViewSet
+from apps.documentos.models import Documento, SesionCarga
+from apps.empresas.models import EmpresaUsuario
+from apps.documentos.services import chunked_upload_service as cargas
+from apps.documentos.services.chunked_upload_service import CargaError
+
+from .helpers import MediaTemporal, crear_empresa
+from .s3 import BucketFalso, requiere_moto
+
+CONTENIDO = bytes(range(256)) * 40  # 10240 bytes
+
+class _Stream(io.RawIOBase):
+    """Cuerpo de request que entrega a lo más `bloque` bytes por read(), como un socket."""
+
+    def __init__(self, data: bytes, bloque: int = 1000):
+        self.data, self.bloque = io.BytesIO(data), bloque
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        return self.data.read(self.bloque if n is None or n < 0 else min(n, self.bloque))
+
+class _RecibirTrozo:
+    """Casos de recibir_trozo; cada subclase fija el storage (self.storage)."""
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa()
+        self.sesion = SesionCarga.objects.create(
+            empresa=self.empresa, nombre_archivo="a.pdf", tamano_bytes=len(CONTENIDO),
+            hash_sha256=hashlib.sha256(CONTENIDO).hexdigest(),
+        )
+
+    def _trozo(self, inicio: int, fin: int, data: bytes | None = None):
+        data = CONTENIDO[inicio:fin + 1] if data is None else data
+        return cargas.recibir_trozo(
+            self.sesion.id, [self.empresa.id], inicio, fin, len(CONTENIDO), _Stream(data)
+        )
+
+    def _otro_request_mientras_lee(self, fn):
+        """Corre fn (otro request sobre la sesión) justo antes de que se lea el cuerpo."""
+        save, pendiente = cargas.default_storage.save, [fn]
+
+        def guardar(*args, **kwargs):
+            if pendiente:
+                pendiente.pop()()
+            return save(*args, **kwargs)
+
+        return mock.patch.object(cargas.default_storage, "save", side_effect=guardar)
+
+    def _leer(self, inicio: int) -> bytes:
+        self.sesion.refresh_from_db()
+        ruta = next(t["ruta"] for t in self.sesion.trozos if t["inicio"] == inicio)
+        with self.storage.open(ruta, "rb") as fh:
+            return fh.read()
+
+    def _archivos_trozos(self) -> list[str]:
+        try:
+            return self.storage.listdir(cargas._dir_trozos(self.sesion))[1]
+        except FileNotFoundError:
+            return []
+
+    def test_guarda_el_trozo_leyendo_con_read(self):
+        estado = self._trozo(0, 4095)
+        self.assertEqual(estado["recibido"], 4096)
+        self.assertEqual(self._leer(0), CONTENIDO[:4096])
+        [registrado] = self.sesion.trozos
+        self.assertEqual(registrado["inicio"], 0)
+        self.assertEqual(registrado["sha256"], hashlib.sha256(CONTENIDO[:4096]).hexdigest())
+
+    def test_no_abre_transaccion(self):
+        # Un cliente lento no debe retener una transacción (ni el lock de la fila)
+        with CaptureQueriesContext(connection) as consultas:
+            self._trozo(0, 4095)
+        self.assertFalse([q["sql"] for q in consultas if "SAVEPOINT" in q["sql"]])
+
+    def test_intento_simultaneo_del_mismo_trozo(self):
+        # Otro PUT del mismo rango se registra mientras este aún lee el cuerpo
+        with self._otro_request_mientras_lee(lambda: self._trozo(0, 4095)):
+            estado = self._trozo(0, 4095)
+        self.assertEqual(estado["recibido"], 4096)
+        self.sesion.refresh_from_db()
+        self.assertEqual(len(self.sesion.trozos), 1)
+        self.assertEqual(self._archivos_trozos(), [self.sesion.trozos[0]["ruta"].rsplit("/", 1)[1]])
+
+    def test_sesion_cancelada_mientras_se_leia_409(self):
+        def cancelar():
+            with self.captureOnCommitCallbacks(execute=True):
+                cargas.cancelar_carga(self.sesion.id, [self.empresa.id])
+
+        with self._otro_request_mientras_lee(cancelar), self.assertRaises(CargaError) as ctx:
+            self._trozo(0, 4095)
+        self.assertEqual(ctx.exception.status, 409)
+        self.assertEqual(self._archivos_trozos(), [])
+
+    def test_no_lee_mas_alla_del_rango(self):
+        # El cuerpo trae bytes de más: se guarda solo el rango declarado
+        self._trozo(0, 99, CONTENIDO[:300])
+        self.assertEqual(self._leer(0), CONTENIDO[:100])
+
+    def test_cuerpo_corto_no_avanza(self):
+        with self.assertRaises(CargaError) as ctx:
+            self._trozo(0, 4095, CONTENIDO[:1000])
+        self.assertIn("1000 de 4096", str(ctx.exception))
+        self.assertEqual(ctx.exception.extra["recibido"], 0)
+        self.assertEqual(self._archivos_trozos(), [])
+
+    def test_reintento_de_trozo_ya_guardado(self):
+        self._trozo(0, 4095)
+        estado = self._trozo(0, 4095)
+        self.assertEqual(estado["recibido"], 4096)
+
+    def test_fuera_de_orden_409(self):
+        self._trozo(0, 4095)
+        with self.assertRaises(CargaError) as ctx:
+            self._trozo(8192, len(CONTENIDO) - 1)
+        self.assertEqual(ctx.exception.status, 409)
+        self.assertEqual(ctx.exception.extra["recibido"], 4096)
+
+    def test_rango_invalido(self):
+        with self.assertRaises(CargaError) as ctx:
+            cargas.recibir_trozo(self.sesion.id, [self.empresa.id], 0, 99, len(CONTENIDO) + 1, _Stream(b""))
+        self.assertEqual(ctx.exception.status, 400)
+        with self.assertRaises(CargaError):
+            self._trozo(0, cargas.TROZO_MAX)
+
+    def test_otra_empresa_404(self):
+        otra = crear_empresa("77000000-0")
+        with self.assertRaises(CargaError) as ctx:
+            cargas.recibir_trozo(self.sesion.id, [otra.id], 0, 99, len(CONTENIDO), _Stream(CONTENIDO))
+        self.assertEqual(ctx.exception.status, 404)
+
+class RecibirTrozoDiscoTests(_RecibirTrozo, MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = default_storage
+
+@requiere_moto
+class RecibirTrozoS3Tests(_RecibirTrozo, BucketFalso, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(cargas, "default_storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class SubirTrozoVistaTests(MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        empresa = crear_empresa()
+        self.usuario = get_user_model().objects.create_user(username="u", password="x", rut="11111111-1")
+        EmpresaUsuario.objects.create(usuario=self.usuario, empresa=empresa)
+        self.sesion = SesionCarga.objects.create(
+            empresa=empresa, nombre_archivo="a.pdf", tamano_bytes=len(CONTENIDO), hash_sha256="0" * 64,
+        )
+
+    def _put(self, **headers):
+        request = APIRequestFactory().put(
+            "/", CONTENIDO[:100], content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 0-99/{len(CONTENIDO)}", **headers,
+        )
+        force_authenticate(request, self.usuario)
+        return CargaViewSet.as_view({"put": "update"})(request, pk=str(self.sesion.id))
+
+    def test_guarda_el_trozo(self):
+        respuesta = self._put()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["recibido"], 100)
+
+    def test_content_length_invalido_400(self):
+        for longitud in ("abc", "99"):
+            with self.subTest(longitud=longitud):
+                self.assertEqual(self._put(CONTENT_LENGTH=longitud).status_code, 400)
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.recibido_bytes, 0)
+
+class _Ensamblar:
+    """Finalizar y la tarea que arma el archivo; cada subclase fija el storage (self.storage)."""
+
+    contenido = CONTENIDO
+    trozo = 4096
+
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa()
+        patcher = mock.patch("apps.documentos.services.upload_service.enqueue_extract_batch")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _subir(self, sha256: str | None = None) -> SesionCarga:
+        sesion = SesionCarga.objects.create(
+            empresa=self.empresa, nombre_archivo="a.pdf", tamano_bytes=len(self.contenido),
+            hash_sha256=sha256 or hashlib.sha256(self.contenido).hexdigest(),
+        )
+        for inicio in range(0, len(self.contenido), self.trozo):
+            data = self.contenido[inicio:inicio + self.trozo]
+            cargas.recibir_trozo(
+                sesion.id, [self.empresa.id], inicio, inicio + len(data) - 1, len(self.contenido), _Stream(data, 1 << 20)
+            )
+        return sesion
+
+    def _finalizar(self, sesion: SesionCarga) -> dict:
+        with mock.patch.object(cargas, "ensamblar_carga") as tarea, self.captureOnCommitCallbacks(execute=True):
+            estado = cargas.finalizar_carga(sesion.id, [self.empresa.id])
+        tarea.delay.assert_called_once_with(str(sesion.id))
+        return estado
+
+    def _ensamblar(self, sesion: SesionCarga) -> dict:
+        self._finalizar(sesion)
+        with self.captureOnCommitCallbacks(execute=True):
+            return cargas.ensamblar(sesion.id)
+
+    def _trozos_en_storage(self, sesion: SesionCarga) -> list[str]:
+        try:
+            return self.storage.listdir(cargas._dir_trozos(sesion))[1]
+        except FileNotFoundError:
+            return []
+
+    def test_finalizar_no_lee_los_trozos(self):
+        sesion = self._subir()
+        with mock.patch.object(cargas, "_Ensamblado") as lector:
+            estado = self._finalizar(sesion)
+        lector.assert_not_called()
+        self.assertEqual(estado["estado"], "ensamblando")
+        # Repetir el finalizar no encola otra tarea
+        self.assertEqual(cargas.finalizar_carga(sesion.id, [self.empresa.id])["estado"], "ensamblando")
+
+    def test_finalizar_con_bytes_faltantes_409(self):
+        sesion = SesionCarga.objects.create(
+            empresa=self.empresa, nombre_archivo="a.pdf", tamano_bytes=len(self.contenido), hash_sha256="0" * 64,
+        )
+        with self.assertRaises(CargaError) as ctx:
+            cargas.finalizar_carga(sesion.id, [self.empresa.id])
+        self.assertEqual(ctx.exception.status, 409)
+
+    def test_crea_el_documento_con_el_archivo_armado(self):
+        sesion = self._subir()
+        estado = self._ensamblar(sesion)
+        self.assertEqual(estado["estado"], "finalizada")
+        doc = Documento.objects.get(id=estado["documento_id"])
+        self.assertEqual(doc.hash_sha256, sesion.hash_sha256)
+        with self.storage.open(doc.archivo.name, "rb") as fh:
+            self.assertEqual(fh.read(), self.contenido)
+        self.assertEqual(self._trozos_en_storage(sesion), [])
+
+    def test_sha256_distinto_cancela(self):
+        sesion = self._subir(sha256="0" * 64)
+        with self.assertLogs(cargas.log, "WARNING"):
+            estado = self._ensamblar(sesion)
+        self.assertEqual(estado["estado"], "cancelada")
+        self.assertFalse(Documento.objects.exists())
+        self.assertEqual(self._archivos_documento(), [])
+        self.assertEqual(self._trozos_en_storage(sesion), [])
+
+    def test_trozo_alterado_cancela(self):
+        sesion = self._subir()
+        sesion.refresh_from_db()
+        ruta = sesion.trozos[0]["ruta"]
+        self.storage.delete(ruta)
+        self.storage.save(ruta, io.BytesIO(bytes(self.trozo)))
+        with self.assertLogs(cargas.log, "WARNING") as logs:
+            estado = self._ensamblar(sesion)
+        self.assertEqual(estado["estado"], "cancelada")
+        self.assertIn(ruta, logs.output[0])
+
+    def test_duplicado_mientras_se_armaba(self):
+        sesion = self._subir()
+        existente = Documento.objects.bulk_create([Documento(
+            empresa=self.empresa, archivo="documentos/otro.pdf", hash_sha256=sesion.hash_sha256,
+        )])[0]
+        estado = self._ensamblar(sesion)
+        self.assertEqual(estado["estado"], "finalizada")
+        self.assertEqual(estado["documento_id"], existente.id)
+        self.assertEqual(self._archivos_documento(), [])
+
+    def test_error_reabre_la_sesion_y_borra_el_archivo(self):
+        sesion = self._subir()
+        with mock.patch.object(cargas, "create_document_from_storage", side_effect=RuntimeError("db")), \
+                self.assertRaises(RuntimeError):
+            self._ensamblar(sesion)
+        sesion.refresh_from_db()
+        self.assertEqual(sesion.estado, "abierta")
+        self.assertEqual(self._archivos_documento(), [])
+        self.assertEqual(len(self._trozos_en_storage(sesion)), len(sesion.trozos))
+
+    def test_sesion_con_solo_el_hash_de_cada_trozo(self):
+        # Sesiones abiertas antes de registrar la ruta de cada trozo
+        sesion = self._subir()
+        sesion.refresh_from_db()
+        rutas = []
+        for t in sesion.trozos:
+            with self.storage.open(t["ruta"], "rb") as fh:
+                rutas.append(self.storage.save(f"{cargas._dir_trozos(sesion)}/{t['inicio']:015d}", fh))
+            self.storage.delete(t["ruta"])
+        SesionCarga.objects.filter(id=sesion.id).update(trozos=[t["sha256"] for t in sesion.trozos])
+        estado = self._ensamblar(sesion)
+        self.assertEqual(estado["estado"], "finalizada")
+        with self.storage.open(Documento.objects.get(id=estado["documento_id"]).archivo.name, "rb") as fh:
+            self.assertEqual(fh.read(), self.contenido)
+
+class EnsamblarDiscoTests(_Ensamblar, MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = default_storage
+
+    def _archivos_documento(self) -> list[str]:
+        return [nombre for _r, _d, archivos in os.walk(self.storage.path("documentos")) for nombre in archivos]
+
+class _EnsamblarS3(_Ensamblar, BucketFalso):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(cargas, "default_storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _archivos_documento(self) -> list[str]:
+        return [clave for clave in self.claves() if clave.startswith("media/documentos/")]
+
+@requiere_moto
+class EnsamblarS3CopiaTests(_EnsamblarS3, TestCase):
+    # Trozos de la parte mínima: se arma con UploadPartCopy, sin volver a subir los bytes
+    contenido = os.urandom(cargas.PARTE_MIN_S3 + 1000)
+    trozo = cargas.PARTE_MIN_S3
+
+    def test_copia_dentro_del_bucket(self):
+        sesion = self._subir()
+        with mock.patch.object(cargas, "_copiar_en_s3", wraps=cargas._copiar_en_s3) as copiar, \
+                mock.patch.object(self.storage, "save", wraps=self.storage.save) as save:
+            self.assertEqual(self._ensamblar(sesion)["estado"], "finalizada")
+        copiar.assert_called_once()
+        save.assert_not_called()
+
+@requiere_moto
+class EnsamblarS3TrozosChicosTests(_EnsamblarS3, TestCase):
+    # Trozos bajo la parte mínima de S3: se concatenan leyéndolos
+    pass
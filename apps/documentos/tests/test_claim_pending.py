@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.documentos.models import Documento
+from apps.documentos.tasks.extract import _claim_pending, PROCESANDO_VENCIDO_MIN
+
+from .helpers import crear_documento, crear_empresa
+
+class ClaimPendingTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+
+    def test_reclama_pendientes_y_los_marca(self):
+        pendiente = crear_documento(self.empresa)
+        crear_documento(self.empresa, estado="procesado")
+
+        docs = _claim_pending(None, limit=10, antiguedad_min=0)
+
+        self.assertEqual([d.id for d in docs], [pendiente.id])
+        pendiente.refresh_from_db()
+        self.assertEqual(pendiente.estado, "procesando")
+        self.assertIsNotNone(pendiente.procesando_desde)
+        # Ya tomado: otro worker no lo vuelve a reclamar
+        self.assertEqual(_claim_pending(None, limit=10, antiguedad_min=0), [])
+
+    def test_respeta_limite_e_ids(self):
+        a, b, c = (crear_documento(self.empresa) for _ in range(3))
+        docs = _claim_pending([b.id, c.id], limit=1, antiguedad_min=0)
+        self.assertEqual([d.id for d in docs], [b.id])
+        a.refresh_from_db()
+        self.assertEqual(a.estado, "pendiente")
+
+    def test_antiguedad_minima(self):
+        reciente = crear_documento(self.empresa)
+        viejo = crear_documento(self.empresa)
+        Documento.objects.filter(pk=viejo.pk).update(creado_en=timezone.now() - timedelta(minutes=30))
+
+        docs = _claim_pending(None, limit=10, antiguedad_min=10)
+
+        self.assertEqual([d.id for d in docs], [viejo.id])
+        reciente.refresh_from_db()
+        self.assertEqual(reciente.estado, "pendiente")
+
+    def test_barrido_reclama_procesando_huerfanos(self):
+        vencido = timezone.now() - timedelta(minutes=PROCESANDO_VENCIDO_MIN + 5)
+        huerfano = crear_documento(self.empresa, estado="procesando", procesando_desde=vencido)
+        sin_marca = crear_documento(self.empresa, estado="procesando")
+        en_curso = crear_documento(self.empresa, estado="procesando", procesando_desde=timezone.now())
+
+        docs = _claim_pending(None, limit=10, antiguedad_min=0)
+
+        self.assertEqual({d.id for d in docs}, {huerfano.id, sin_marca.id})
+        huerfano.refresh_from_db()
+        self.assertGreater(huerfano.procesando_desde, vencido)
+        en_curso.refresh_from_db()
+        self.assertEqual(en_curso.estado, "procesando")
+
+    def test_por_ids_no_toma_procesando(self):
+        vencido = timezone.now() - timedelta(minutes=PROCESANDO_VENCIDO_MIN + 5)
+        huerfano = crear_documento(self.empresa, estado="procesando", procesando_desde=vencido)
+        self.assertEqual(_claim_pending([huerfano.id], limit=10, antiguedad_min=0), [])
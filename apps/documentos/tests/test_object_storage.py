@@ -0,0 +1,43 @@
+import dataclasses
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from apps.documentos.ocr import file_cache
+from apps.documentos.ocr.utils import object_storage
+
+from .s3 import BucketFalso, requiere_moto
+
+@requiere_moto
+class ClaveTests(BucketFalso, SimpleTestCase):
+    def test_coincide_con_la_del_storage(self):
+        nombre = self.storage.save("documentos/76000000-0/2024/05/a.pdf", ContentFile(b"%PDF"))
+        self.assertEqual(self.claves(), [object_storage.clave(self.storage, nombre)])
+        self.assertEqual(object_storage.clave(self.storage, nombre), f"media/{nombre}")
+
+    def test_sin_location(self):
+        self.storage.location = ""
+        self.assertEqual(object_storage.clave(self.storage, "/a/./b.xml"), "a/b.xml")
+
+    def test_rechaza_salir_de_location(self):
+        with self.assertRaises(SuspiciousOperation):
+            object_storage.clave(self.storage, "../otra/a.pdf")
+
+    def test_descarga_al_cache_local(self):
+        contenido = b"%PDF-1.4 prueba"
+        nombre = self.storage.save("documentos/a.pdf", ContentFile(contenido))
+        archivo = mock.Mock(storage=self.storage)
+        archivo.name = nombre
+        type(archivo).path = mock.PropertyMock(side_effect=NotImplementedError)
+        sha256 = hashlib.sha256(contenido).hexdigest()
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(file_cache, "settings", dataclasses.replace(file_cache.settings, OCR_FILE_CACHE_DIR=cache_dir)):
+            path = file_cache.local_path(archivo, sha256)
+            self.assertEqual(os.path.basename(path), f"{sha256}.pdf")
+            with open(path, "rb") as fh:
+                self.assertEqual(fh.read(), contenido)
@@ -0,0 +1,102 @@
+import dataclasses
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.documentos.ocr import cache
+from apps.documentos.ocr.schema import OCRResult
+from apps.documentos.ocr.utils import disk_lru
+
+SHA = "ab" * 32
+
+class OCRCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        for patcher in (
+            mock.patch.object(cache, "settings", dataclasses.replace(cache.settings, OCR_CACHE_DIR=self.dir)),
+            mock.patch.object(cache, "engine_version", return_value="tesseract-test"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _resultado(self):
+        return OCRResult(raw_text="FACTURA ELECTRONICA N° 123", folio="123", total=Decimal("11900"),
+                         tipo_documento="factura_afecta", confianza={"folio": 0.9})
+
+    def test_ida_y_vuelta(self):
+        cache.put(SHA, self._resultado())
+        leido = cache.get(SHA)
+        self.assertEqual(leido, self._resultado())
+        self.assertIsInstance(leido.total, Decimal)
+
+    def test_sin_entrada(self):
+        self.assertIsNone(cache.get(SHA))
+        self.assertIsNone(cache.get(""))
+
+    def test_otra_version_de_parser_invalida(self):
+        cache.put(SHA, self._resultado())
+        with mock.patch.object(cache, "PARSER_VERSION", cache.PARSER_VERSION + 1):
+            self.assertIsNone(cache.get(SHA))
+
+    def test_otra_version_de_motor_invalida(self):
+        cache.put(SHA, self._resultado())
+        with mock.patch.object(cache, "engine_version", return_value="tesseract-otra"):
+            self.assertIsNone(cache.get(SHA))
+
+    def test_entrada_ilegible(self):
+        cache.put(SHA, self._resultado())
+        with open(cache._entry_path(SHA), "w") as fh:
+            fh.write("{no es json")
+        self.assertIsNone(cache.get(SHA))
+
+class DiskLRUTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.addCleanup(disk_lru._estimado.pop, self.dir, None)
+
+    def _escribir(self, nombre, tamano, antiguedad):
+        path = os.path.join(self.dir, nombre)
+        with open(path, "wb") as fh:
+            fh.write(b"x" * tamano)
+        t = time.time() - antiguedad
+        os.utime(path, (t, t))
+        return path
+
+    def test_desaloja_las_menos_usadas(self):
+        vieja = self._escribir("vieja", 400, 300)
+        usada = self._escribir("usada", 400, 200)
+        disk_lru.touch(usada)
+        nueva = self._escribir("nueva", 400, 0)
+        liberados = disk_lru.prune(self.dir, 1000)
+        self.assertEqual(liberados, 400)
+        self.assertFalse(os.path.exists(vieja))
+        self.assertTrue(os.path.exists(usada))
+        self.assertTrue(os.path.exists(nueva))
+
+    def test_record_write_no_recorre_bajo_el_limite(self):
+        self._escribir("a", 100, 0)
+        disk_lru.record_write(self.dir, 100, 1000)  # primer registro: recorre
+        with mock.patch.object(disk_lru.os, "walk", wraps=os.walk) as walk:
+            for i in range(5):
+                self._escribir(f"b{i}", 100, 0)
+                disk_lru.record_write(self.dir, 100, 1000)
+            self.assertEqual(walk.call_count, 0)
+            self._escribir("c", 500, 0)
+            disk_lru.record_write(self.dir, 500, 1000)  # 1100 > 1000
+            self.assertEqual(walk.call_count, 1)
+        self.assertLessEqual(sum(os.path.getsize(os.path.join(self.dir, n)) for n in os.listdir(self.dir)), 900)
+
+    def test_record_write_recorre_cada_n_escrituras(self):
+        disk_lru.record_write(self.dir, 0, 10**9)
+        with mock.patch.object(disk_lru, "RESYNC_WRITES", 3), \
+             mock.patch.object(disk_lru.os, "walk", wraps=os.walk) as walk:
+            for _ in range(3):
+                disk_lru.record_write(self.dir, 1, 10**9)
+            self.assertEqual(walk.call_count, 1)
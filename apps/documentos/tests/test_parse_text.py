@@ -0,0 +1,109 @@
+import json
+import os
+import re
+
+from django.test import SimpleTestCase
+
+from apps.documentos.management.commands.bench_parse_text import _snapshot
+from apps.documentos.ocr.parsing import parse_text
+from apps.documentos.ocr.utils import patterns
+from apps.documentos.ocr.utils.numbers import _SOLO_DIGITOS, clean_and_parse_amount
+from apps.documentos.ocr.utils.text_index import TextIndex
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "parse_text")
+
+def _fixtures():
+    for nombre in sorted(os.listdir(FIXTURES)):
+        if nombre.endswith(".txt"):
+            yield os.path.join(FIXTURES, nombre)
+
+class ParseTextGoldenTests(SimpleTestCase):
+    """
+    Cada <nombre>.txt con su <nombre>.parse.json: los campos que devolvía
+    parse_text antes del índice compartido (TextIndex) y del registro de
+    patrones. Congelan el comportamiento, no su corrección: un cambio
+    intencional del parser se regraba con `bench_parse_text --save`.
+    """
+
+    def test_campos_sin_cambios(self):
+        for path in _fixtures():
+            with self.subTest(os.path.basename(path)):
+                with open(path, encoding="utf-8") as fh:
+                    actual = _snapshot(parse_text(fh.read()))
+                with open(os.path.splitext(path)[0] + ".parse.json", encoding="utf-8") as fh:
+                    self.assertEqual(actual, json.load(fh))
+
+class TextIndexTests(SimpleTestCase):
+    def _textos(self):
+        for path in _fixtures():
+            with open(path, encoding="utf-8") as fh:
+                yield os.path.basename(path), fh.read()
+
+    def test_lineas_equivalen_a_split(self):
+        for nombre, texto in self._textos():
+            with self.subTest(nombre):
+                idx = TextIndex(texto)
+                self.assertEqual(idx.lines, texto.splitlines())
+                self.assertEqual(idx.nl_lines, texto.split("\n"))
+                for i, inicio in enumerate(idx.line_starts):
+                    self.assertTrue(texto.startswith(idx.lines[i], inicio))
+                for i, inicio in enumerate(idx.nl_line_starts):
+                    self.assertTrue(texto.startswith(idx.nl_lines[i], inicio))
+
+    def test_matches_equivale_a_cortar_la_seccion(self):
+        for nombre, texto in self._textos():
+            idx = TextIndex(texto)
+            for inicio in idx.nl_line_starts:
+                for patron in (patterns.AMOUNT, patterns.RE_RUT_STRICT):
+                    with self.subTest(nombre, inicio=inicio, patron=patron.pattern):
+                        esperado = [m.group() for m in patron.finditer(texto[inicio:])]
+                        self.assertEqual([m.group() for m in idx.matches(patron, inicio)], esperado)
+
+    def test_acierto_que_cruza_el_borde(self):
+        # El RUT completo cruza el inicio de la sección: hay que volver a buscar dentro de ella
+        texto = "RUT 76.123.\n456-0\nTOTAL $ 1.190"
+        idx = TextIndex(texto)
+        idx.spans(patterns.AMOUNT)
+        inicio = idx.nl_line_starts[1]
+        self.assertEqual(
+            [m.group() for m in idx.matches(patterns.AMOUNT, inicio)],
+            [m.group() for m in patterns.AMOUNT.finditer(texto[inicio:])],
+        )
+
+    def test_anchor_lines_equivale_a_buscar_por_linea(self):
+        for nombre, texto in self._textos():
+            idx = TextIndex(texto)
+            for ancla, patron in patterns.ANCHOR_PATTERNS.items():
+                with self.subTest(nombre, ancla=ancla):
+                    esperado = [i for i, ln in enumerate(texto.splitlines()) if patron.search(ln)]
+                    self.assertEqual(list(idx.anchor_lines(ancla)), esperado)
+
+class PatternsTests(SimpleTestCase):
+    def test_anchors_combinado_equivale_a_las_anclas_separadas(self):
+        textos = [open(p, encoding="utf-8").read() for p in _fixtures()]
+        textos.append("Monto Neto\nneto iva I.V.A exento EXENTO total Factura FECHA emision Señor(es) receptor cliente")
+        for texto in textos:
+            combinado = {(m.lastgroup, m.start(), m.end()) for m in patterns.ANCHORS.finditer(texto)}
+            separadas = {
+                (nombre, m.start(), m.end())
+                for nombre, patron in patterns.ANCHOR_PATTERNS.items()
+                for m in patron.finditer(texto)
+            }
+            self.assertEqual(combinado, separadas)
+
+    def test_iniciales_cubren_todas_las_anclas(self):
+        for nombre, patron in patterns.ANCHOR_PATTERNS.items():
+            for alternativa in re.sub(r"\\b|[()]", "", patron.pattern).split("|"):
+                with self.subTest(nombre, alternativa=alternativa):
+                    self.assertIn(alternativa[0].upper(), patterns._ANCHOR_INICIALES)
+
+    def test_solo_digitos_equivale_a_borrar_no_digitos(self):
+        for texto in ("$ 1.234.567", "12,50", " 9.646.073-", "١٢٣2.154.562", "N° 0001542", "", "$", "x²³½"):
+            with self.subTest(texto=texto):
+                self.assertEqual(texto.translate(_SOLO_DIGITOS), re.sub(r"\D", "", texto))
+
+    def test_clean_and_parse_amount(self):
+        self.assertEqual(str(clean_and_parse_amount("$ 1.190.000")), "1190000")
+        self.assertIsNone(clean_and_parse_amount("$ 0"))
+        self.assertIsNone(clean_and_parse_amount("sin monto"))
+        self.assertIsNone(clean_and_parse_amount(""))
@@ -0,0 +1,26 @@
+import dataclasses
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.documentos.ocr.engines import pdf
+
+def _ocr_falla_en_la_2(path, page, *args):
+    if page == 2:
+        raise RuntimeError("pdftoppm falló")
+    return f"texto {page}"
+
+@mock.patch.object(pdf, "_ocr_pdf_page", side_effect=_ocr_falla_en_la_2)
+class OcrPdfWithTesseractTests(SimpleTestCase):
+    def _ocr(self, workers: int) -> dict[int, str]:
+        with mock.patch.object(pdf, "settings", dataclasses.replace(pdf.settings, OCR_PDF_WORKERS=workers)), \
+                self.assertLogs(pdf.logger, "ERROR") as logs:
+            textos = pdf.ocr_pdf_with_tesseract("a.pdf", [1, 2, 3])
+        self.assertIn("página 2", logs.output[0])
+        return textos
+
+    def test_pagina_que_falla_queda_fuera_en_paralelo(self, _ocr_page):
+        self.assertEqual(self._ocr(3), {1: "texto 1", 3: "texto 3"})
+
+    def test_pagina_que_falla_queda_fuera_en_serie(self, _ocr_page):
+        self.assertEqual(self._ocr(1), {1: "texto 1", 3: "texto 3"})
@@ -0,0 +1,60 @@
+import hashlib
+from unittest import mock
+
+import boto3
+from django.test import TestCase
+
+from apps.documentos.models import Documento, SesionCarga
+from apps.documentos.services import storage_service
+from apps.documentos.services.chunked_upload_service import CargaError
+
+from .helpers import crear_empresa
+from .s3 import BUCKET, BucketFalso, requiere_moto
+
+CONTENIDO = b"%PDF-1.4 subida directa"
+SHA256 = hashlib.sha256(CONTENIDO).hexdigest()
+
+@requiere_moto
+class FinalizarPresignTests(BucketFalso, TestCase):
+    def setUp(self):
+        super().setUp()
+        for patcher in (
+            mock.patch.object(storage_service, "default_storage", self.storage),
+            # Activo también cuando corren los on_commit (ahí se encola el OCR)
+            mock.patch("apps.documentos.services.upload_service.enqueue_extract_batch"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.empresa = crear_empresa()
+        self.sesion = SesionCarga.objects.create(
+            empresa=self.empresa, nombre_archivo="a.pdf", tamano_bytes=len(CONTENIDO),
+            hash_sha256=SHA256, object_key="documentos/76000000-0/2024/05/abc-a.pdf",
+        )
+
+    def _subir(self, **extra):
+        boto3.client("s3", region_name="us-east-1").put_object(
+            Bucket=BUCKET, Key=f"media/{self.sesion.object_key}", Body=CONTENIDO, **extra
+        )
+
+    def _finalizar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return storage_service.finalize_presigned_upload(self.sesion.id, [self.empresa.id])
+
+    def test_con_checksum_crea_el_documento(self):
+        # Como el PUT firmado con x-amz-checksum-sha256: el storage guarda el checksum
+        self._subir(ChecksumAlgorithm="SHA256")
+        data = self._finalizar()
+        self.assertEqual(data["resultado"], "creado")
+        doc = Documento.objects.get(id=data["documento_id"])
+        self.assertEqual(doc.archivo.name, self.sesion.object_key)
+
+    def test_sin_checksum_se_rechaza_sin_leer_el_objeto(self):
+        self._subir()
+        with mock.patch.object(self.storage.connection.meta.client, "get_object") as get_object, \
+                self.assertLogs(storage_service.log, "WARNING"), self.assertRaises(CargaError) as ctx:
+            self._finalizar()
+        get_object.assert_not_called()
+        self.assertEqual(ctx.exception.status, 422)
+        self.assertEqual(SesionCarga.objects.get(id=self.sesion.id).estado, "cancelada")
+        self.assertEqual(self.claves(), [])
+        self.assertFalse(Documento.objects.exists())
@@ -0,0 +1,93 @@
+import os
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.documentos.models import Documento
+from apps.documentos.ocr.config import PARSER_VERSION
+from apps.documentos.services.reparse_service import documentos_a_reparsear, iter_lotes, reparsear
+
+from .helpers import crear_documento, crear_empresa
+from .test_parse_text import FIXTURES
+
+def _texto(nombre: str) -> str:
+    with open(os.path.join(FIXTURES, nombre), encoding="utf-8") as fh:
+        return fh.read()
+
+class SeleccionTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+
+    def _ids(self, **filtros):
+        return set(documentos_a_reparsear(**filtros).values_list("id", flat=True))
+
+    def test_por_version(self):
+        vieja = crear_documento(self.empresa, texto_plano="x", parser_version=PARSER_VERSION - 1)
+        sin_version = crear_documento(self.empresa, texto_plano="x")
+        crear_documento(self.empresa, texto_plano="x", parser_version=PARSER_VERSION)
+        self.assertEqual(self._ids(), {vieja.id, sin_version.id})
+
+    def test_excluye_xml_y_sin_texto(self):
+        crear_documento(self.empresa, texto_plano="", parser_version=1)
+        crear_documento(self.empresa, texto_plano="x", ocr_fuente="xml", parser_version=1)
+        self.assertEqual(self._ids(version_menor=None), set())
+
+    def test_version_o_confianza(self):
+        actual = dict(texto_plano="x", parser_version=PARSER_VERSION)
+        vieja = crear_documento(self.empresa, texto_plano="x", parser_version=1, confianza_folio=0.9)
+        folio_dudoso = crear_documento(self.empresa, **actual, confianza_folio=0.5, confianza_fecha=0.9)
+        fecha_dudosa = crear_documento(self.empresa, **actual, confianza_folio=0.9, confianza_fecha=0.4)
+        crear_documento(self.empresa, **actual, confianza_folio=0.9, confianza_fecha=0.9)
+
+        self.assertEqual(self._ids(confianza_menor=0.7), {vieja.id, folio_dudoso.id, fecha_dudosa.id})
+        self.assertEqual(self._ids(version_menor=None, confianza_menor=0.7), {folio_dudoso.id, fecha_dudosa.id})
+        self.assertEqual(len(self._ids(version_menor=None, confianza_menor=None)), 4)
+
+    def test_empresa_y_fechas(self):
+        otra = crear_empresa("77000000-K")
+        propio = crear_documento(self.empresa, texto_plano="x")
+        crear_documento(otra, texto_plano="x")
+        antiguo = crear_documento(self.empresa, texto_plano="x")
+        Documento.objects.filter(pk=antiguo.pk).update(creado_en=timezone.now() - timedelta(days=40))
+
+        self.assertEqual(self._ids(empresa_id=self.empresa.id), {propio.id, antiguo.id})
+        hoy = timezone.now().date()
+        self.assertEqual(self._ids(empresa_id=self.empresa.id, desde=hoy - timedelta(days=7)), {propio.id})
+        self.assertEqual(self._ids(empresa_id=self.empresa.id, hasta=hoy - timedelta(days=7)), {antiguo.id})
+
+    def test_lotes_por_clave(self):
+        docs = [crear_documento(self.empresa, texto_plano="x") for _ in range(5)]
+        lotes = list(iter_lotes(documentos_a_reparsear(), tamano=2, despues_de=docs[0].id))
+        self.assertEqual([[f["id"] for f in lote] for lote in lotes],
+                         [[docs[1].id, docs[2].id], [docs[3].id, docs[4].id]])
+
+class ReparsearTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_empresa()
+
+    def test_actualiza_campos_desde_el_texto(self):
+        doc = crear_documento(self.empresa, texto_plano=_texto("factura_digital.txt"), folio="1", parser_version=1)
+
+        stats = reparsear(documentos_a_reparsear())
+
+        self.assertEqual((stats["leidos"], stats["actualizados"], stats["completo"]), (1, 1, True))
+        self.assertEqual(stats["ultimo_id"], doc.id)
+        doc.refresh_from_db()
+        self.assertEqual(doc.folio, "45821")
+        self.assertEqual(doc.rut_proveedor, "76.123.456-0")
+        self.assertEqual(doc.parser_version, PARSER_VERSION)
+        self.assertEqual(doc.ocr_json["reparseo"]["version_anterior"], 1)
+        self.assertIn("folio", doc.ocr_json["confianza"])
+        # Ya no se selecciona por versión
+        self.assertFalse(documentos_a_reparsear().exists())
+
+    def test_max_lotes_y_reanudar(self):
+        docs = [crear_documento(self.empresa, texto_plano=_texto("boleta.txt"), parser_version=1) for _ in range(3)]
+        # Mismo texto: el folio chocaría con la restricción única; se conservan como estaban
+        stats = reparsear(documentos_a_reparsear(), tamano=2, max_lotes=1)
+        self.assertEqual((stats["leidos"], stats["ultimo_id"], stats["completo"]), (2, docs[1].id, False))
+
+        stats = reparsear(documentos_a_reparsear(), tamano=2, despues_de=stats["ultimo_id"])
+        self.assertEqual((stats["leidos"], stats["completo"]), (1, True))
+        self.assertEqual(Documento.objects.filter(folio="998877").count(), 1)
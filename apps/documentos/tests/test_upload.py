@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from apps.documentos.models import Documento
+from apps.documentos.services.upload_service import _insertar
+
+from .helpers import MediaTemporal, crear_documento, crear_empresa, dte_suelto
+
+def _candidato(empresa, folio: int) -> Documento:
+    contenido = dte_suelto(folio)
+    doc = Documento(
+        empresa=empresa, archivo=ContentFile(contenido, name=f"dte_{folio}.xml"),
+        estado="pendiente", hash_sha256=hashlib.sha256(contenido).hexdigest(),
+    )
+    doc.completar_metadatos()
+    return doc
+
+def _archivos() -> list[str]:
+    return [nombre for _raiz, _dirs, nombres in os.walk(settings.MEDIA_ROOT) for nombre in nombres]
+
+class InsertarTests(MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa()
+
+    def test_duplicado_por_carrera_no_deja_archivo(self):
+        nuevo, repetido = _candidato(self.empresa, 1), _candidato(self.empresa, 2)
+        # Otro proceso insertó el mismo contenido después del IN de duplicados
+        crear_documento(self.empresa, hash_sha256=repetido.hash_sha256)
+        resultados = [{"archivo": "dte_1.xml"}, {"archivo": "dte_2.xml"}]
+
+        creados = _insertar([(0, nuevo), (1, repetido)], resultados)
+
+        self.assertEqual([d.id for d in creados], [nuevo.id])
+        self.assertEqual(resultados[1]["estado"], "duplicado")
+        self.assertEqual(_archivos(), [os.path.basename(nuevo.archivo.name)])
+
+    def test_no_borra_archivo_que_ya_estaba_en_el_storage(self):
+        # Subida directa: el objeto existe antes del INSERT y lo limpia quien lo subió
+        nombre = "documentos/test/subido.xml"
+        default_storage.save(nombre, ContentFile(dte_suelto(3)))
+        doc = Documento(empresa=self.empresa, archivo=nombre, estado="pendiente", hash_sha256="f" * 64)
+        doc.completar_metadatos()
+        crear_documento(self.empresa, hash_sha256="f" * 64)
+
+        _insertar([(0, doc)], [{"archivo": nombre}])
+
+        self.assertTrue(default_storage.exists(nombre))
@@ -0,0 +1,155 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
+
+from apps.documentos.models import Documento
+from apps.documentos.ocr.engines.xml import iter_dtes
+from apps.documentos.tasks import extract
+
+from .helpers import MediaTemporal, crear_documento, crear_empresa, dte_suelto, sobre
+
+class IterDtesTests(SimpleTestCase):
+    def _archivo(self, contenido: bytes) -> str:
+        fd, path = tempfile.mkstemp(suffix=".xml")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(contenido)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_sobre_con_varios_dte(self):
+        dtes = list(iter_dtes(self._archivo(sobre(101, 102, 103))))
+
+        self.assertEqual([d["folio"] for d in dtes], ["101", "102", "103"])
+        self.assertEqual([d["xml"]["indice"] for d in dtes], [0, 1, 2])
+        self.assertEqual([d["xml"]["id"] for d in dtes], ["F101T33", "F102T33", "F103T33"])
+        self.assertEqual(len({d["xml"]["sha256"] for d in dtes}), 3)
+        primero = dtes[0]
+        self.assertEqual(primero["tipo_documento"], "factura_afecta")
+        self.assertEqual(primero["rut_proveedor"], "76123456-0")
+        self.assertEqual(str(primero["total"]), "1190")
+        self.assertEqual(str(primero["iva_tasa"]), "19")
+        # El TED va como en el PDF417: sin el namespace del sobre
+        self.assertTrue(primero["ted"].startswith('<TED version="1.0"><DD>'))
+
+    def test_mismo_hash_suelto_o_en_sobre(self):
+        en_sobre = list(iter_dtes(self._archivo(sobre(101, 102))))
+        suelto = list(iter_dtes(self._archivo(dte_suelto(102))))
+        self.assertEqual(suelto[0]["xml"]["sha256"], en_sobre[1]["xml"]["sha256"])
+
+# extract_document guarda el Documento: la señal post_save también encola el checker SII
+@mock.patch("apps.documentos.signals.check_and_kickoff_sii")
+@mock.patch.object(extract, "start_sii_validation_core")
+@mock.patch.object(extract, "check_and_kickoff_sii")
+class ExtractXmlTests(MediaTemporal, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.empresa = crear_empresa()
+
+    def _documento_xml(self, contenido: bytes, nombre: str) -> Documento:
+        return crear_documento(self.empresa, archivo=ContentFile(contenido, name=nombre))
+
+    def _extraer(self, doc: Documento):
+        with mock.patch.object(extract, "group") as group, self.captureOnCommitCallbacks(execute=True):
+            extract.extract_document(doc.id)
+        return group
+
+    def test_sobre_crea_un_documento_por_dte(self, kickoff, validar, _senal):
+        origen = self._documento_xml(sobre(101, 102, 103), "sobre.xml")
+
+        group = self._extraer(origen)
+
+        origen.refresh_from_db()
+        self.assertEqual(origen.estado, "procesado")
+        self.assertEqual(origen.folio, "101")
+        self.assertEqual(origen.ocr_json["xml"]["dtes_en_archivo"], 3)
+        resto = Documento.objects.exclude(pk=origen.pk).order_by("folio")
+        self.assertEqual([d.folio for d in resto], ["102", "103"])
+        self.assertTrue(all(d.archivo.name == origen.archivo.name for d in resto))
+        # Comparten el archivo del sobre: hash propio derivado y el del archivo en ocr_json
+        for doc in resto:
+            self.assertEqual(doc.ocr_json["xml"]["archivo_sha256"], origen.hash_sha256)
+            self.assertEqual(doc.hash_sha256, extract.hash_dte_en_sobre(origen.hash_sha256, doc.ocr_json["xml"]["indice"]))
+        self.assertEqual(len({origen.dte_sha256, *(d.dte_sha256 for d in resto)}), 3)
+        # El SII recibe los DTE del sobre en un group, y el primero por su checker
+        group.return_value.apply_async.assert_called_once()
+        kickoff.apply_async.assert_called_once_with(args=[origen.id], countdown=1)
+
+    def test_re_extraer_un_dte_del_sobre_lee_el_suyo(self, kickoff, validar, _senal):
+        origen = self._documento_xml(sobre(101, 102, 103), "sobre.xml")
+        self._extraer(origen)
+        tercero = Documento.objects.get(folio="103")
+        Documento.objects.filter(pk=tercero.pk).update(estado="pendiente", folio="")
+
+        with mock.patch.object(extract, "local_path", wraps=extract.local_path) as local_path:
+            self._extraer(tercero)
+
+        local_path.assert_called_once_with(mock.ANY, origen.hash_sha256)
+        tercero.refresh_from_db()
+        self.assertEqual((tercero.estado, tercero.folio), ("procesado", "103"))
+        self.assertEqual(tercero.ocr_json["xml"]["archivo_sha256"], origen.hash_sha256)
+        self.assertEqual(Documento.objects.count(), 3)
+
+    def test_validacion_sii_se_lanza_al_confirmar(self, kickoff, validar, _senal):
+        origen = self._documento_xml(sobre(101, 102), "sobre.xml")
+        with mock.patch.object(extract, "group") as group:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                extract.extract_document(origen.id)
+            group.return_value.apply_async.assert_not_called()
+            kickoff.apply_async.assert_not_called()
+            self.assertEqual(len(callbacks), 2)
+            for callback in callbacks:
+                callback()
+        group.return_value.apply_async.assert_called_once()
+        kickoff.apply_async.assert_called_once()
+
+    def test_error_en_el_sobre_no_revierte_el_primer_dte(self, kickoff, validar, _senal):
+        origen = self._documento_xml(sobre(101, 102), "sobre.xml")
+        with mock.patch.object(extract, "_insertar_dtes", side_effect=RuntimeError("DTE inválido")), \
+             self.assertLogs(extract.log, "ERROR"):
+            self._extraer(origen)
+        origen.refresh_from_db()
+        self.assertEqual((origen.estado, origen.folio), ("procesado", "101"))
+        kickoff.apply_async.assert_called_once()
+
+    def test_dte_suelto_ya_cargado_en_un_sobre(self, kickoff, validar, _senal):
+        self._extraer(self._documento_xml(sobre(101, 102), "sobre.xml"))
+        en_sobre = Documento.objects.get(folio="102")
+
+        suelto = self._documento_xml(dte_suelto(102), "reenvio.xml")
+        self._extraer(suelto)
+
+        suelto.refresh_from_db()
+        self.assertEqual(suelto.estado, "duplicado")
+        self.assertEqual(suelto.ocr_json["duplicado_de"], en_sobre.id)
+        self.assertEqual(suelto.folio, "")
+        self.assertEqual(Documento.objects.filter(folio="102").count(), 1)
+
+    def test_sobre_con_dte_ya_cargado_suelto(self, kickoff, validar, _senal):
+        suelto = self._documento_xml(dte_suelto(101), "dte.xml")
+        self._extraer(suelto)
+
+        origen = self._documento_xml(sobre(101, 102), "sobre.xml")
+        self._extraer(origen)
+
+        origen.refresh_from_db()
+        # El primer DTE del sobre ya existía: el sobre queda duplicado, pero el resto se crea
+        self.assertEqual(origen.estado, "duplicado")
+        self.assertEqual(origen.ocr_json["duplicado_de"], suelto.id)
+        self.assertEqual(sorted(Documento.objects.exclude(folio="").values_list("folio", flat=True)), ["101", "102"])
+
+    def test_lote_marca_duplicados(self, kickoff, validar, _senal):
+        self._extraer(self._documento_xml(dte_suelto(101), "dte.xml"))
+        otro = self._documento_xml(dte_suelto(101), "reenvio.xml")
+        nuevo = self._documento_xml(dte_suelto(103), "nuevo.xml")
+
+        with mock.patch.object(extract, "group"), self.captureOnCommitCallbacks(execute=True):
+            resumen = extract.extract_documents_batch(documento_ids=[otro.id, nuevo.id])
+
+        self.assertEqual((resumen["procesados"], resumen["duplicados"]), (1, 1))
+        otro.refresh_from_db()
+        nuevo.refresh_from_db()
+        self.assertEqual(otro.estado, "duplicado")
+        self.assertEqual((nuevo.estado, nuevo.folio), ("procesado", "103"))
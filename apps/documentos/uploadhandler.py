@@ -0,0 +1,47 @@
+# apps/documentos/uploadhandler.py
+"""
+Upload handlers que calculan el SHA-256 mientras llegan los bytes.
+
+Son los mismos de Django (memoria para archivos chicos, archivo temporal para
+los grandes) pero cada archivo recibido trae `sha256`. Así el chequeo de
+duplicado por (empresa, hash_sha256) se hace antes de escribir en el storage
+y Documento.save no vuelve a leer el archivo para hashearlo.
+
+Deben instalarse antes de que se lea request.POST/FILES (ver
+`instalar_en(request)`); por eso la vista de carga es csrf_exempt por fuera y
+csrf_protect por dentro.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+class _HashMixin:
+    def new_file(self, *args, **kwargs):
+        self._sha = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        restante = super().receive_data_chunk(raw_data, start)
+        # None = este handler se quedó con el trozo (los siguientes no lo ven)
+        if restante is None:
+            self._sha.update(raw_data)
+        return restante
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        if archivo is not None:
+            archivo.sha256 = self._sha.hexdigest()
+        return archivo
+
+class HashingMemoryFileUploadHandler(_HashMixin, MemoryFileUploadHandler):
+    pass
+
+class HashingTemporaryFileUploadHandler(_HashMixin, TemporaryFileUploadHandler):
+    pass
+
+def instalar_en(request):
+    """Reemplaza los upload handlers del request (HttpRequest de Django, no el de DRF)."""
+    request.upload_handlers = [
+        HashingMemoryFileUploadHandler(request),
+        HashingTemporaryFileUploadHandler(request),
+    ]
@@ -2,15 +2,16 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.shortcuts import render
 from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.utils.dateparse import parse_date
-from django.db import IntegrityError, transaction
 from datetime import date, datetime
 from decimal import Decimal
 from .models import Documento
 from apps.empresas.models import Empresa, EmpresaUsuario
 #from apps.documentos import ocr_legacy
 import os
-from apps.documentos.tasks.extract import extract_document
+from apps.documentos.services.upload_service import create_documents_bulk
+from apps.documentos import uploadhandler
 
 # -------------------------------------------------------------------
 # Helpers
@@ -108,6 +109,7 @@ def documentos_list_api(request):
             "validado_sii": d.validado_sii,
             "sii_estado": d.sii_estado,
             "archivo": d.archivo.url if d.archivo else "",
+            "copia_visual": d.copia_visual.url if d.copia_visual else "",
         })
     return JsonResponse({"results": data})
 
@@ -116,7 +118,15 @@ def documentos_list_api(request):
 # -------------------------------------------------------------------
 @login_required
 @require_POST
+@csrf_exempt
 def documentos_upload_api(request):
+    # Los handlers que hashean al recibir se instalan antes de leer el cuerpo;
+    # el chequeo CSRF (que lee request.POST) corre después, en _documentos_upload
+    uploadhandler.instalar_en(request)
+    return _documentos_upload(request)
+
+@csrf_protect
+def _documentos_upload(request):
     # Empresa activa (si está en sesión y el usuario pertenece)
     empresa = None
     eid = request.session.get("empresa_activa_id")
@@ -132,31 +142,8 @@ def documentos_upload_api(request):
     if not files:
         return HttpResponseBadRequest("No se recibieron archivos")
 
-    created = 0; skipped = 0; errors = []
-
-    for f in files:
-        try:
-            with transaction.atomic():
-                doc = Documento(
-                    empresa=empresa,
-                    subido_por=request.user,
-                    archivo=f,
-                    estado="pendiente",  # <- ahora parte pendiente
-                )
-                doc.save()  # calcula hash/mime/size/extension
-
-                # Encolar tarea asíncrona
-                extract_document.delay(doc.id)
-
-                created += 1
-
-        except IntegrityError:
-            skipped += 1
-
-        except Exception as e:
-            errors.append(f"{getattr(f, 'name', 'archivo')}: {str(e)}")
-
-    return JsonResponse({"created": created, "skipped": skipped, "errors": errors})
+    # Carga masiva: duplicados con un solo IN, bulk_create y OCR en un group
+    return JsonResponse(create_documents_bulk(files, empresa, subido_por=request.user, origen="web"))
 
 @login_required
 @require_GET
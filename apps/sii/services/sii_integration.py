@@ -39,7 +39,7 @@ def validar_documento_con_sii(request, documento: Documento) -> dict:
         "folio": int(documento.folio or 0) if (documento.folio or "").isdigit() else 0,
         "monto_total": _dec_to_int_safe(documento.total) or 0,
         "fecha_emision": documento.fecha_emision.isoformat() if documento.fecha_emision else timezone.now().date().isoformat(),
-        "ted": "<TED>MOCK</TED>",   # en mock no exigimos el contenido real
+        "ted": documento.ted_xml or "<TED>MOCK</TED>",   # timbre real si se leyó; en mock no se exige
     }
 
     res = prov.validar_dte(**payload)
@@ -4,20 +4,13 @@ from datetime import timedelta
 from decimal import Decimal
 
 from apps.documentos.models import Documento
+from apps.documentos.ocr.schema import REQUIRED_FIELDS
 from apps.sii.models import SIITransaccion
 from apps.sii.services.client import get_provider
 from apps.sii.services.sii_integration import refrescar_estado_sii_system
 
-REQUIRED_FIELDS = ("rut_proveedor", "folio", "total", "fecha_emision", "tipo_documento")
-
 def _doc_ready(doc: Documento) -> bool:
-    return all([
-        bool(getattr(doc, "rut_proveedor", None)),
-        bool(getattr(doc, "folio", None)),
-        bool(getattr(doc, "total", None)),
-        bool(getattr(doc, "fecha_emision", None)),
-        bool(getattr(doc, "tipo_documento", None)),
-    ])
+    return all(getattr(doc, f, None) for f in REQUIRED_FIELDS)
 
 def _dec_to_int(v):
     try: return int(Decimal(v or 0))
@@ -74,7 +67,8 @@ def start_sii_validation_core(self, documento_id: int):
         "folio": int(doc.folio or 0) if str(doc.folio or "").isdigit() else 0,
         "monto_total": _dec_to_int(doc.total),
         "fecha_emision": (doc.fecha_emision or timezone.now().date()).isoformat(),
-        "ted": "<TED>MOCK</TED>",
+        # Timbre leído del PDF417 o del XML; sin él, el mock acepta cualquier contenido
+        "ted": doc.ted_xml or "<TED>MOCK</TED>",
     }
 
     prov = get_provider()
@@ -31,7 +31,24 @@ app.conf.beat_schedule = {
     'alerta-diaria-test': {
         'task': 'documentos.check_daily_alerts',
         'schedule': crontab(minute='*/5'), 
-        'options': {'queue': 'correos'},
+        'options': {'queue': 'alertas'},
+    },
+
+    # 3. BARRIDO DE PENDIENTES: documentos que quedaron en 'pendiente' (broker caído,
+    # worker reiniciado) o en 'procesando' con su worker muerto (ver PROCESANDO_VENCIDO_MIN)
+    # se reclaman en lote cada 10 minutos.
+    'extract-pendientes-rezagados': {
+        'task': 'apps.documentos.tasks.extract.extract_documents_batch',
+        'schedule': crontab(minute='*/10'),
+        'kwargs': {'antiguedad_min': 10},
+        'options': {'queue': 'ocr-heavy', 'priority': 9},
+    },
+
+    # 4. SUBIDAS POR PARTES ABANDONADAS: cancela las sesiones sin actividad y
+    # borra sus trozos del storage (cola por defecto, worker general).
+    'limpiar-cargas-abandonadas': {
+        'task': 'documentos.limpiar_cargas_abandonadas',
+        'schedule': crontab(minute=0),
     },
 }
 
@@ -195,6 +195,7 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # 20MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+DATA_UPLOAD_MAX_NUMBER_FILES = 500  # carga masiva (create_documents_bulk)
 
 # =====================================================================
 # DEFAULT FIELD
@@ -239,10 +240,31 @@ CELERY_RESULT_BACKEND = "redis://redis:6379/1"
 # En modo desarrollo: True (ejecuta las tareas sin worker)
 CELERY_TASK_ALWAYS_EAGER = False
 
-# Límites y concurrencia
+# Límites y concurrencia (valores por defecto; cada worker de docker-compose
+# los ajusta por cola con -c / --prefetch-multiplier / --time-limit)
 CELERY_TASK_TIME_LIMIT = 60 * 5
 CELERY_TASK_SOFT_TIME_LIMIT = 60 * 4
 CELERY_WORKER_CONCURRENCY = 1
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Colas: un OCR pesado no debe bloquear al SII, a los correos ni a las alertas.
+# extract_document se enruta en tiempo de encolado (ocr-fast / ocr-heavy),
+# ver apps.documentos.tasks.extract.enqueue_extract.
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_ROUTES = {
+    "apps.documentos.tasks.extract.*": {"queue": "ocr-fast"},
+    "apps.sii.tasks.*": {"queue": "sii"},
+    "correo.*": {"queue": "correos"},
+    "documentos.check_daily_alerts": {"queue": "alertas"},
+}
+
+# Prioridades en Redis (0 = más urgente): las subidas web pasan antes que
+# los lotes que llegan por correo dentro de la misma cola.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
 
 # Tareas periódicas
 
@@ -259,4 +281,31 @@ SII_BASE_URL = "https://api.sii.cl"   # placeholder para el real
 # =====================================================================
 load_dotenv(BASE_DIR / ".env")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
-GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
\ No newline at end of file
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+# =====================================================================
+# OBJECT STORAGE (S3 / MinIO)
+# =====================================================================
+# Con AWS_STORAGE_BUCKET_NAME los archivos van al bucket (django-storages) y se
+# habilitan las subidas directas con URL firmada (presign-upload/). Sin él se
+# usa el disco local (MEDIA_ROOT). Para MinIO: AWS_S3_ENDPOINT_URL=http://minio:9000
+AWS_STORAGE_BUCKET_NAME = os.environ.get("AWS_STORAGE_BUCKET_NAME", "")
+if AWS_STORAGE_BUCKET_NAME:
+    AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID", "")
+    AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY", "")
+    AWS_S3_REGION_NAME = os.environ.get("AWS_S3_REGION_NAME", "us-east-1")
+    AWS_S3_ENDPOINT_URL = os.environ.get("AWS_S3_ENDPOINT_URL") or None
+    # Endpoint con que se firman las URLs si el cliente no ve el del servidor (MinIO en docker)
+    AWS_S3_PRESIGN_ENDPOINT_URL = os.environ.get("AWS_S3_PRESIGN_ENDPOINT_URL", "")
+    AWS_S3_ADDRESSING_STYLE = "path" if AWS_S3_ENDPOINT_URL else None
+    AWS_S3_SIGNATURE_VERSION = "s3v4"
+    AWS_DEFAULT_ACL = None
+    AWS_S3_FILE_OVERWRITE = False
+    AWS_QUERYSTRING_EXPIRE = 3600
+    STORAGES = {
+        "default": {"BACKEND": "storages.backends.s3.S3Storage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+
+# Validez de la URL de PUT firmada (segundos)
+PRESIGNED_UPLOAD_EXPIRE = 900